@@ -4,6 +4,9 @@
 set -euo pipefail
 
 DATA_OUTPUT_PID=""
+ALERT_SWEEP_PID=""
+FORECAST_PID=""
+EXPORT_WORKER_PID=""
 SERVER_PID=""
 
 cleanup() {
@@ -17,6 +20,21 @@ cleanup() {
     echo "Stopping data_output listener (PID ${DATA_OUTPUT_PID})"
     kill "${DATA_OUTPUT_PID}" >/dev/null 2>&1 || true
   fi
+
+  if [[ -n "${ALERT_SWEEP_PID}" ]] && kill -0 "${ALERT_SWEEP_PID}" >/dev/null 2>&1; then
+    echo "Stopping alert sweeper (PID ${ALERT_SWEEP_PID})"
+    kill "${ALERT_SWEEP_PID}" >/dev/null 2>&1 || true
+  fi
+
+  if [[ -n "${FORECAST_PID}" ]] && kill -0 "${FORECAST_PID}" >/dev/null 2>&1; then
+    echo "Stopping forecast runner (PID ${FORECAST_PID})"
+    kill "${FORECAST_PID}" >/dev/null 2>&1 || true
+  fi
+
+  if [[ -n "${EXPORT_WORKER_PID}" ]] && kill -0 "${EXPORT_WORKER_PID}" >/dev/null 2>&1; then
+    echo "Stopping export worker (PID ${EXPORT_WORKER_PID})"
+    kill "${EXPORT_WORKER_PID}" >/dev/null 2>&1 || true
+  fi
 }
 
 trap cleanup EXIT INT TERM
@@ -28,6 +46,7 @@ ls -la /code/staticfiles
 
 echo "2. Running migrations..."
 python manage.py migrate
+python manage.py refresh_location_rollups
 
 echo "3. Ensuring Django superuser exists..."
 python manage.py shell <<'PY'
@@ -64,7 +83,22 @@ python manage.py data_output_listener &
 DATA_OUTPUT_PID=$!
 echo "data_output listener running as PID ${DATA_OUTPUT_PID}"
 
-echo "8. Starting Django development server..."
+echo "8. Starting alert sweeper..."
+python manage.py sweep_alerts --loop --interval "${ALERT_SWEEP_INTERVAL:-300}" &
+ALERT_SWEEP_PID=$!
+echo "alert sweeper running as PID ${ALERT_SWEEP_PID}"
+
+echo "9. Starting forecast runner..."
+python manage.py run_forecasts --loop --interval "${FORECAST_INTERVAL:-86400}" &
+FORECAST_PID=$!
+echo "forecast runner running as PID ${FORECAST_PID}"
+
+echo "10. Starting export worker..."
+python manage.py process_export_jobs --loop --interval "${EXPORT_POLL_INTERVAL:-5}" &
+EXPORT_WORKER_PID=$!
+echo "export worker running as PID ${EXPORT_WORKER_PID}"
+
+echo "11. Starting Django development server..."
 python manage.py runserver 0.0.0.0:8000 &
 SERVER_PID=$!
 
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
 from services.data_storage.models import (
+    Alert,
     Product,
     ProductItem,
     Withdrawal,
@@ -89,3 +90,18 @@ class PurchaseOrderAdmin(admin.ModelAdmin):
     )
     list_filter = ("status", "expected_delivery")
     search_fields = ("product_code", "product_name", "lot_number")
+
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    list_display = (
+        "alert_type",
+        "subject",
+        "first_seen_at",
+        "last_seen_at",
+        "resolved_at",
+        "acknowledged_by"
+    )
+    list_filter = ("alert_type", "resolved_at")
+    search_fields = ("subject", "message")
+    raw_id_fields = ("product", "product_item", "purchase_order", "acknowledged_by")
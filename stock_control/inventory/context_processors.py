@@ -1,6 +1,15 @@
+from services.data_storage.models import Alert
 from stock_control.module_loader import module_flags as get_module_flags
 
 
 def module_flags(request):
     flags = get_module_flags()
     return {"module_flags": flags, "flags": flags}
+
+
+def alert_summary(request):
+    def open_alert_count():
+        # Evaluated lazily by the template, so pages without the navbar pay nothing.
+        return Alert.objects.filter(resolved_at__isnull=True, acknowledged_at__isnull=True).count()
+
+    return {"open_alert_count": open_alert_count}
@@ -0,0 +1,87 @@
+from django.apps import apps
+
+from inventory.roles import user_is_inventory_manager
+from services.data_storage.models import Location
+
+ALL_LOCATIONS = "all"
+ASSIGNED_LOCATIONS = "assigned"
+SESSION_KEY = "location_scope"
+
+
+class LocationScope:
+    """The set of locations a page computes over for the current user.
+
+    ``location_ids`` is ``None`` when the page covers the whole inventory.
+    """
+
+    def __init__(self, location_ids, selected, choices):
+        self.location_ids = tuple(sorted(location_ids)) if location_ids is not None else None
+        self.selected = selected
+        self.choices = choices
+
+    @property
+    def is_scoped(self):
+        return self.location_ids is not None
+
+    @property
+    def key(self):
+        if self.location_ids is None:
+            return ALL_LOCATIONS
+        return "-".join(str(location_id) for location_id in self.location_ids)
+
+    @property
+    def label(self):
+        return dict(self.choices).get(self.selected, "All locations")
+
+    @property
+    def can_switch(self):
+        return len(self.choices) > 1
+
+
+def assigned_location_ids(user):
+    if not apps.is_installed("solutions.location_tracking"):
+        return []
+    from solutions.location_tracking.models import UserLocation
+
+    return list(UserLocation.objects.filter(user=user).values_list("location_id", flat=True))
+
+
+def resolve_location_scope(request):
+    """Work out which locations the request covers.
+
+    Managers default to the whole inventory and may pick any location. Staff
+    default to their assigned locations and may narrow to one of them; staff
+    without assignments keep seeing everything. A choice passed as
+    ``?location=`` is remembered in the session.
+    """
+    if user_is_inventory_manager(request.user):
+        locations = Location.objects.order_by("name").values_list("id", "name")
+        choices = [(ALL_LOCATIONS, "All locations")]
+        default = ALL_LOCATIONS
+        default_ids = None
+    else:
+        assigned = assigned_location_ids(request.user)
+        if not assigned:
+            return LocationScope(None, ALL_LOCATIONS, [(ALL_LOCATIONS, "All locations")])
+        locations = Location.objects.filter(id__in=assigned).order_by("name").values_list("id", "name")
+        choices = [(ASSIGNED_LOCATIONS, "My locations")] if len(assigned) > 1 else []
+        default = ASSIGNED_LOCATIONS if len(assigned) > 1 else str(assigned[0])
+        default_ids = assigned
+
+    choices += [(str(location_id), name) for location_id, name in locations]
+    valid = {value for value, _ in choices}
+
+    requested = request.GET.get("location")
+    if requested in valid:
+        request.session[SESSION_KEY] = requested
+    else:
+        requested = request.session.get(SESSION_KEY)
+    selected = requested if requested in valid else default
+
+    if selected == ALL_LOCATIONS:
+        location_ids = None
+    elif selected == ASSIGNED_LOCATIONS:
+        location_ids = default_ids
+    else:
+        location_ids = [int(selected)]
+    return LocationScope(location_ids, selected, choices)
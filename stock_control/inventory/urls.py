@@ -11,6 +11,10 @@ urlpatterns = [
     # Dashboard
     # path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/', views.inventory_dashboard, name='dashboard'),
+    path('dashboard/widgets/<slug:widget_name>/', views.dashboard_widget, name='dashboard_widget'),
+    path('alerts/', views.alert_list, name='alerts'),
+    path('live/stock-events/', views.stock_events, name='stock_events'),
+    path('alerts/<int:alert_id>/acknowledge/', views.acknowledge_alert, name='acknowledge_alert'),
     
     # Stock Admin: no product_id => list/add, with product_id => edit
     # path('stock_admin/', views.stock_admin, name='stock_admin'),
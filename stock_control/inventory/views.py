@@ -1,15 +1,14 @@
 # views.py
-from collections import defaultdict
-
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils.timezone import now
 from django.db import transaction
-from django.http import Http404
+from django.db.models import Q
+from django.http import Http404, JsonResponse
 
 from inventory.access_control import group_required
+from inventory.location_scope import resolve_location_scope
 from inventory.roles import (
     ROLE_INVENTORY_MANAGER,
     ROLE_STAFF,
@@ -18,8 +17,9 @@ from inventory.roles import (
 from stock_control.module_loader import module_flags as get_module_flags
 
 LEGACY_STAFF_ROLE = "Leica Staff"
-from services.analysis.analysis import get_dashboard_data
+from services.analysis.analysis import DASHBOARD_WIDGETS, get_dashboard_widget
 from services.data_collection.data_collection import parse_barcode_data
+from services.data_output.matcher import shared_matcher
 from services.data_collection_1.stock_admin import (
     delete_lot as _delete_lot,
     stock_admin as _stock_admin,
@@ -27,7 +27,9 @@ from services.data_collection_1.stock_admin import (
 from services.data_collection_2.create_withdrawal import (
     create_withdrawal as _create_withdrawal,
 )
-from services.data_storage.models import Product, ProductItem, PurchaseOrder, Supplier, Location
+from services.data_storage.models import Alert, Product, Supplier, Location
+from services.live_feed.live_feed import publish_alert_change, stock_event_stream
+from services.location_rollups.location_rollups import products_in_locations
 try:
     from solutions.quality_control.models import QualityCheck
 except Exception:
@@ -113,51 +115,43 @@ def delete_user(request, user_id):
 @login_required
 @group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
 def inventory_dashboard(request):
-    context = get_dashboard_data()
-
-    # 1. Low stock alerts
-    low_stock_alerts = [
-        p for p in Product.objects.prefetch_related("items").all()
-        if sum(item.current_stock for item in p.items.all()) < p.threshold
-    ]
-    has_low_stock_alerts = len(low_stock_alerts) > 0
-
-    # 2. Expired lots
-    has_expired_lot_alerts = ProductItem.objects.filter(expiry_date__lte=now().date()).exists()
-
-    # 3. Delayed deliveries
-    has_delayed_delivery_alerts = PurchaseOrder.objects.filter(
-        expected_delivery__lt=now()
-    ).exclude(status="Delivered").exists()
-
-    # 4. Products with missing threshold
-    products_with_zero_threshold = Product.objects.filter(threshold=0)
-    has_missing_thresholds = products_with_zero_threshold.exists()
-
-    # 5. Duplicate product names
-    # Normalize names: strip spaces and convert to lowercase
-    raw_names = Product.objects.values_list("name", flat=True)
-    normalized_name_map = defaultdict(list)
-
-    for name in raw_names:
-        normalized = name.strip().lower()
-        normalized_name_map[normalized].append(name)
-
-    # Only consider real duplicates (two or more different entries mapping to same normalized form)
+    # Chart widgets are fetched asynchronously from dashboard_widget, so the
+    # page shell only carries the summary table.
+    location_scope = resolve_location_scope(request)
+    context = {
+        "location_scope": location_scope,
+        "widget_refresh_on": {
+            name: " ".join(widget["invalidated_by"]) for name, widget in DASHBOARD_WIDGETS.items()
+        },
+    }
+
+    # Alerts are maintained by the sweep_alerts command; read the open ones in one indexed query.
+    open_alerts = Alert.objects.filter(resolved_at__isnull=True)
+    products = Product.objects.all()
+    if location_scope.is_scoped:
+        scoped_products = products_in_locations(location_scope.location_ids)
+        # Alerts not tied to a product (e.g. duplicate names) are shown in every scope.
+        open_alerts = open_alerts.filter(Q(product__isnull=True) | Q(product_id__in=scoped_products))
+        products = products.filter(id__in=scoped_products)
+    open_alerts = list(open_alerts.values_list("alert_type", "subject"))
+    open_alert_types = {alert_type for alert_type, _ in open_alerts}
     duplicate_product_names = [
-        names[0] for names in normalized_name_map.values() if len(set(names)) > 1
+        subject for alert_type, subject in open_alerts if alert_type == Alert.TYPE_DUPLICATE_NAME
     ]
 
-    # 6. User count
+    # User count
     total_users = User.objects.count()
-    total_locations = Location.objects.count()
-    total_products = Product.objects.count()
+    if location_scope.is_scoped:
+        total_locations = len(location_scope.location_ids)
+    else:
+        total_locations = Location.objects.count()
+    total_products = products.count()
 
     context.update({
-        "has_low_stock_alerts": has_low_stock_alerts,
-        "has_expired_lot_alerts": has_expired_lot_alerts,
-        "has_delayed_delivery_alerts": has_delayed_delivery_alerts,
-        "has_missing_thresholds": has_missing_thresholds,
+        "has_low_stock_alerts": Alert.TYPE_LOW_STOCK in open_alert_types,
+        "has_expired_lot_alerts": Alert.TYPE_EXPIRED_LOT in open_alert_types,
+        "has_delayed_delivery_alerts": Alert.TYPE_DELAYED_DELIVERY in open_alert_types,
+        "has_missing_thresholds": Alert.TYPE_MISSING_THRESHOLD in open_alert_types,
         "duplicate_product_names": duplicate_product_names,
         "total_users": total_users,
         "total_locations": total_locations,
@@ -166,6 +160,50 @@ def inventory_dashboard(request):
 
     return render(request, "inventory/dashboard.html", context)
 
+
+@login_required
+@group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
+def dashboard_widget(request, widget_name):
+    if widget_name not in DASHBOARD_WIDGETS:
+        raise Http404("Unknown dashboard widget")
+    payload = get_dashboard_widget(widget_name, resolve_location_scope(request).location_ids)
+    response = JsonResponse(payload)
+    response["Server-Timing"] = f"widget;dur={payload['compute_ms']}"
+    return response
+
+@login_required
+@group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
+def stock_events(request):
+    return stock_event_stream(request)
+
+
+ALERT_HISTORY_LIMIT = 100
+
+
+@login_required
+@group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
+def alert_list(request):
+    alerts = Alert.objects.select_related("acknowledged_by")
+    open_alerts = alerts.filter(resolved_at__isnull=True).order_by("alert_type", "-first_seen_at")
+    resolved_alerts = alerts.filter(resolved_at__isnull=False).order_by("-resolved_at")[:ALERT_HISTORY_LIMIT]
+    return render(request, "inventory/alerts.html", {
+        "open_alerts": open_alerts,
+        "resolved_alerts": resolved_alerts,
+        "history_limit": ALERT_HISTORY_LIMIT,
+    })
+
+
+@login_required
+@group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
+def acknowledge_alert(request, alert_id):
+    alert = get_object_or_404(Alert, pk=alert_id)
+    if request.method == "POST" and not alert.acknowledged_at:
+        alert.acknowledge(request.user)
+        publish_alert_change()
+        messages.success(request, f"Alert acknowledged: {alert.subject}")
+    return redirect('inventory:alerts')
+
+
 @login_required
 @user_passes_test(is_admin, login_url='inventory:dashboard')
 def stock_admin(request, product_id=None):
@@ -206,6 +244,10 @@ if QualityCheck:
     ])
 
 
+# Closest matches listed when products are searched by name.
+PRODUCT_NAME_MATCHES = 20
+
+
 @login_required
 @group_required([ROLE_INVENTORY_MANAGER, ROLE_STAFF, LEGACY_STAFF_ROLE])
 def product_list(request):
@@ -215,7 +257,11 @@ def product_list(request):
         filter_key = "all"
 
     barcode_value = (request.GET.get("barcode") or "").strip()
+    name_query = (request.GET.get("name") or "").strip()
+    location_scope = resolve_location_scope(request)
     products_qs = Product.objects.select_related("supplier_ref", "location").prefetch_related("items")
+    if location_scope.is_scoped:
+        products_qs = products_qs.filter(id__in=products_in_locations(location_scope.location_ids))
 
     if barcode_value:
         parsed = parse_barcode_data(barcode_value)
@@ -243,6 +289,15 @@ def product_list(request):
         else:
             products = products_qs
             messages.error(request, "No product matches the scanned barcode.")
+    elif name_query:
+        # Closest names first, ranked by the same matcher the MQTT listener uses.
+        ranks = {
+            suggestion.product.id: rank
+            for rank, suggestion in enumerate(shared_matcher().search(name_query, limit=PRODUCT_NAME_MATCHES))
+        }
+        products = sorted(products_qs.filter(pk__in=ranks), key=lambda product: ranks[product.pk])
+        if not products:
+            messages.error(request, "No product name resembles the search.")
     else:
         products = products_qs
 
@@ -267,6 +322,8 @@ def product_list(request):
         stocks = LocationStockModel.objects.select_related("location", "product_item", "product_item__product").filter(
             product_item__product_id__in=product_ids
         )
+        if location_scope.is_scoped:
+            stocks = stocks.filter(location_id__in=location_scope.location_ids)
         for stock in stocks:
             location_stock_map.setdefault(stock.product_item.product_id, []).append(stock)
 
@@ -309,6 +366,8 @@ def product_list(request):
         'filter_options': FILTER_OPTIONS,
         'location_tracking_enabled': location_tracking_enabled,
         'barcode_value': barcode_value,
+        'name_query': name_query,
+        'location_scope': location_scope,
     })
 
 
@@ -0,0 +1,211 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Count, DecimalField, F, Min, Sum, Value
+from django.db.models.functions import Coalesce, Lower, Trim
+from django.utils import timezone
+
+from services.data_storage.models import Alert, Product, ProductItem, PurchaseOrder
+from services.live_feed.live_feed import publish_alert_change
+
+
+logger = logging.getLogger(__name__)
+
+
+def _low_stock_alerts():
+    rows = (
+        Product.objects.annotate(
+            total_stock=Coalesce(Sum("items__current_stock"), Value(0), output_field=DecimalField())
+        )
+        .filter(total_stock__lt=F("threshold"))
+        .values_list("id", "name", "total_stock", "threshold")
+    )
+    return {
+        str(product_id): {
+            "subject": name,
+            "message": f"{name} is below threshold ({total_stock:g} < {threshold}).",
+            "product_id": product_id,
+        }
+        for product_id, name, total_stock, threshold in rows
+    }
+
+
+def _expired_lot_alerts():
+    rows = ProductItem.objects.filter(expiry_date__lte=timezone.now().date()).values_list(
+        "id", "product_id", "product__name", "lot_number", "expiry_date"
+    )
+    return {
+        str(item_id): {
+            "subject": f"{name} (Lot {lot_number})",
+            "message": f"Lot {lot_number} of {name} expired on {expiry_date:%Y-%m-%d}.",
+            "product_id": product_id,
+            "product_item_id": item_id,
+        }
+        for item_id, product_id, name, lot_number, expiry_date in rows
+    }
+
+
+def _delayed_delivery_alerts():
+    rows = (
+        PurchaseOrder.objects.filter(expected_delivery__lt=timezone.now())
+        .exclude(status="Delivered")
+        .values_list("id", "product_item_id", "product_name", "expected_delivery")
+    )
+    return {
+        str(order_id): {
+            "subject": f"PO-{order_id} for {product_name}",
+            "message": f"PO-{order_id} for {product_name} was expected on {expected:%Y-%m-%d}.",
+            "product_item_id": item_id,
+            "purchase_order_id": order_id,
+        }
+        for order_id, item_id, product_name, expected in rows
+    }
+
+
+def _missing_threshold_alerts():
+    rows = Product.objects.filter(threshold=0).values_list("id", "name")
+    return {
+        str(product_id): {
+            "subject": name,
+            "message": f"{name} has no stock threshold set.",
+            "product_id": product_id,
+        }
+        for product_id, name in rows
+    }
+
+
+def _duplicate_name_alerts():
+    # Normalize names (strip spaces, lowercase) and keep groups holding two or more distinct spellings
+    rows = (
+        Product.objects.annotate(normalized=Lower(Trim("name")))
+        .values("normalized")
+        .annotate(variants=Count("name", distinct=True), sample=Min("name"))
+        .filter(variants__gt=1)
+        .values_list("normalized", "sample", "variants")
+    )
+    return {
+        normalized[:200]: {
+            "subject": sample,
+            "message": f"{variants} products share the name '{sample}'.",
+        }
+        for normalized, sample, variants in rows
+    }
+
+
+# One set-based query per alert type; ``triggers`` lists the models whose
+# writes can change that type's result.
+ALERT_DETECTORS = {
+    Alert.TYPE_LOW_STOCK: {"detect": _low_stock_alerts, "triggers": (Product, ProductItem)},
+    Alert.TYPE_EXPIRED_LOT: {"detect": _expired_lot_alerts, "triggers": (ProductItem,)},
+    Alert.TYPE_DELAYED_DELIVERY: {"detect": _delayed_delivery_alerts, "triggers": (PurchaseOrder,)},
+    Alert.TYPE_MISSING_THRESHOLD: {"detect": _missing_threshold_alerts, "triggers": (Product,)},
+    Alert.TYPE_DUPLICATE_NAME: {"detect": _duplicate_name_alerts, "triggers": (Product,)},
+}
+
+
+def alert_types_for_model(model):
+    return [
+        alert_type
+        for alert_type, detector in ALERT_DETECTORS.items()
+        if issubclass(model, detector["triggers"])
+    ]
+
+
+def sweep_alerts(alert_types=None):
+    """Reconcile the Alert table with the current inventory state.
+
+    New findings open an alert, findings that persist refresh ``last_seen_at``
+    and alerts whose condition has cleared are resolved (kept for history).
+    Returns a per-type summary of opened, resolved and open counts.
+    """
+    alert_types = list(alert_types or ALERT_DETECTORS.keys())
+    swept_at = timezone.now()
+    summary = {}
+
+    for alert_type in alert_types:
+        found = ALERT_DETECTORS[alert_type]["detect"]()
+        with transaction.atomic():
+            open_alerts = Alert.objects.filter(alert_type=alert_type, resolved_at__isnull=True)
+            existing = {key: (alert_id, message) for alert_id, key, message in open_alerts.values_list("id", "key", "message")}
+
+            resolved_ids = [alert_id for key, (alert_id, _) in existing.items() if key not in found]
+            if resolved_ids:
+                Alert.objects.filter(id__in=resolved_ids).update(resolved_at=swept_at)
+
+            changed = [
+                Alert(id=alert_id, message=found[key]["message"])
+                for key, (alert_id, message) in existing.items()
+                if key in found and found[key]["message"] != message
+            ]
+            if changed:
+                Alert.objects.bulk_update(changed, ["message"], batch_size=500)
+            open_alerts.update(last_seen_at=swept_at)
+
+            new_alerts = [
+                Alert(alert_type=alert_type, key=key, first_seen_at=swept_at, last_seen_at=swept_at, **fields)
+                for key, fields in found.items()
+                if key not in existing
+            ]
+            Alert.objects.bulk_create(new_alerts, batch_size=500)
+
+        summary[alert_type] = {
+            "opened": len(new_alerts),
+            "resolved": len(resolved_ids),
+            "open": len(found),
+        }
+
+    if any(counts["opened"] or counts["resolved"] for counts in summary.values()):
+        publish_alert_change()
+    return summary
+
+
+# Alert types with stock writes committed since their last sweep.
+_dirty_types = set()
+_dirty_lock = threading.Lock()
+_sweeper = None
+
+
+def _sweep_dirty_types():
+    global _sweeper
+    debounce = getattr(settings, "ALERT_SWEEP_DEBOUNCE_SECONDS", 2.0)
+    while True:
+        # Writes arriving during the wait join this sweep instead of starting their own.
+        time.sleep(debounce)
+        with _dirty_lock:
+            alert_types = set(_dirty_types)
+            _dirty_types.clear()
+            if not alert_types:
+                _sweeper = None
+                return
+        try:
+            sweep_alerts(alert_types)
+        except DatabaseError:
+            # Stock writes have already committed; a failed sweep is retried by the scheduled run.
+            logger.exception("Alert sweep after commit failed for %s", sorted(alert_types))
+        finally:
+            close_old_connections()
+
+
+def _mark_dirty(alert_types):
+    global _sweeper
+    with _dirty_lock:
+        _dirty_types.update(alert_types)
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_dirty_types, name="alert-sweeper", daemon=True)
+            _sweeper.start()
+
+
+def schedule_alert_sweep(alert_types):
+    """Sweep the given alert types shortly after the current transaction commits.
+
+    The types are only marked dirty on commit (nothing is marked if the
+    transaction rolls back); a background thread sweeps every dirty type
+    once ALERT_SWEEP_DEBOUNCE_SECONDS later, off the request path, so
+    bursts of writes across requests share one sweep.
+    """
+    alert_types = set(alert_types)
+    if alert_types:
+        transaction.on_commit(lambda: _mark_dirty(alert_types))
@@ -1,37 +1,75 @@
 import json
-import pandas as pd
+import time
 from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.timezone import now
 from django.shortcuts import render
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
 import datetime
-from django.db.models import Count, Sum
-from django.db.models.functions import Coalesce
-from services.data_storage.models import Product, ProductItem, Withdrawal, PurchaseOrder, Supplier, Location
-
-def get_dashboard_data():
-    # 1. Stock Level Status
-    products = Product.objects.all()
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from services.data_storage.models import (
+    ForecastResult,
+    Location,
+    LocationStockRollup,
+    Product,
+    ProductItem,
+    PurchaseOrder,
+    Supplier,
+    Withdrawal,
+)
+from services.location_rollups.location_rollups import products_in_locations
+
+DASHBOARD_WIDGET_CACHE_PREFIX = "dashboard_widget"
+
+
+# Every widget takes ``location_ids``: None covers the whole inventory, otherwise
+# the widget is computed over those locations only, reading LocationStockRollup.
+
+def stock_level_widget(location_ids=None):
+    # Only include products with stock > 0 and either below threshold or at least 2 above
     stock_labels = []
     stock_values = []
     threshold_values = []
     stock_names = []
-    for product in products:
-        total_stock = float(product.get_full_items_in_stock())
-        # Only include products with stock > 0 and either below threshold or at least 2 above
+    if location_ids is None:
+        products = Product.objects.annotate(
+            total_stock=Coalesce(Sum("items__current_stock"), Decimal("0"))
+        ).order_by("id").values_list("product_code", "name", "threshold", "total_stock")
+    else:
+        products = (
+            LocationStockRollup.objects.filter(location_id__in=location_ids)
+            .values("product_id")
+            .annotate(total_stock=Sum("quantity"))
+            .order_by("product_id")
+            .values_list("product__product_code", "product__name", "product__threshold", "total_stock")
+        )
+    for product_code, name, threshold, total_stock in products:
+        total_stock = float(int(total_stock))
         if total_stock <= 0:
             continue
-        threshold = product.threshold
         if total_stock < threshold or total_stock >= (threshold + 2):
-            stock_labels.append(product.product_code)
+            stock_labels.append(product_code)
             stock_values.append(total_stock)
             threshold_values.append(threshold)
-            stock_names.append(product.name)
+            stock_names.append(name)
 
-    # 2. Stock Distribution by Supplier
+    return {
+        'stock_labels': stock_labels,
+        'stock_values': stock_values,
+        'threshold_values': threshold_values,
+        'stock_names': stock_names,
+    }
+
+
+def supplier_distribution_widget(location_ids=None):
     supplier_choice_map = dict(Product.SUPPLIER_CHOICES)
+    products = Product.objects.all()
+    if location_ids is not None:
+        products = products.filter(id__in=products_in_locations(location_ids))
     supplier_data = (
-        Product.objects.annotate(
+        products.annotate(
             supplier_label=Coalesce("supplier_ref__name", "supplier")
         )
         .values("supplier_label")
@@ -46,38 +84,74 @@ def get_dashboard_data():
     for name in Supplier.objects.values_list("name", flat=True):
         counts_map.setdefault(name, 0)
 
-    supplier_labels = list(counts_map.keys())
-    supplier_values = list(counts_map.values())
+    return {
+        'supplier_labels': list(counts_map.keys()),
+        'supplier_values': list(counts_map.values()),
+    }
 
-    # 3. Recent Withdrawals Trend (last 30 days)
-    today = now().date()
-    start_date = today - datetime.timedelta(days=30)
+
+def withdrawal_trend_widget(location_ids=None):
+    # Recent Withdrawals Trend (last 30 days)
+    start_date = now().date() - datetime.timedelta(days=30)
     withdrawals = Withdrawal.objects.filter(timestamp__date__gte=start_date)
+    if location_ids is not None:
+        withdrawals = withdrawals.filter(product_item__product_id__in=products_in_locations(location_ids))
     withdrawal_by_day = withdrawals.extra({'day': "date(timestamp)"}).values('day').annotate(total=Count('id')).order_by('day')
-    withdrawal_dates = [item['day'] for item in withdrawal_by_day]
-    withdrawal_counts = [item['total'] for item in withdrawal_by_day]
+    return {
+        'withdrawal_dates': [str(item['day']) for item in withdrawal_by_day],
+        'withdrawal_counts': [item['total'] for item in withdrawal_by_day],
+    }
+
+
+def top_withdrawn_widget(location_ids=None):
+    withdrawals = Withdrawal.objects.all()
+    if location_ids is not None:
+        withdrawals = withdrawals.filter(product_item__product_id__in=products_in_locations(location_ids))
+    top_withdrawn = withdrawals.values('product_name').annotate(total=Sum('quantity')).order_by('-total')[:5]
+    return {
+        'top_products_labels': [item['product_name'] for item in top_withdrawn],
+        'top_products_counts': [float(item['total']) for item in top_withdrawn],
+    }
+
 
-    # 4. Top Withdrawn Products
-    top_withdrawn = Withdrawal.objects.values('product_name').annotate(total=Sum('quantity')).order_by('-total')[:5]
-    top_products_labels = [item['product_name'] for item in top_withdrawn]
-    top_products_counts = [float(item['total']) for item in top_withdrawn]
+def location_distribution_widget(location_ids=None):
+    if location_ids is not None:
+        rows = (
+            LocationStockRollup.objects.filter(location_id__in=location_ids)
+            .values("location__name")
+            .annotate(total=Sum("quantity"))
+            .order_by("location__name")
+        )
+        location_totals = {row["location__name"]: float(row["total"] or 0) for row in rows}
+        for name in Location.objects.filter(id__in=location_ids).values_list("name", flat=True):
+            location_totals.setdefault(name, 0)
+        return {
+            'location_labels': list(location_totals.keys()),
+            'location_values': list(location_totals.values()),
+        }
 
-    # 5. Stock by Location
     location_totals = {}
-    products_with_location = Product.objects.select_related("location").prefetch_related("items")
-    for product in products_with_location:
-        loc_name = product.location.name if product.location else "Unassigned"
-        total_stock = float(sum(item.current_stock for item in product.items.all()))
-        location_totals[loc_name] = location_totals.get(loc_name, 0) + total_stock
+    product_totals = (
+        Product.objects.values("location__name")
+        .annotate(total=Coalesce(Sum("items__current_stock"), Decimal("0")))
+        .order_by("location__name")
+    )
+    for row in product_totals:
+        loc_name = row["location__name"] or "Unassigned"
+        location_totals[loc_name] = location_totals.get(loc_name, 0) + float(row["total"])
 
     # If location tracking module is enabled, use detailed location stock
     try:
         from solutions.location_tracking.models import LocationStock
 
-        location_stock_rows = LocationStock.objects.select_related("location", "product_item", "product_item__product")
+        location_stock_rows = (
+            LocationStock.objects.values("location__name")
+            .annotate(total=Sum("quantity"))
+            .order_by("location__name")
+        )
         for row in location_stock_rows:
-            loc_name = row.location.name if row.location else "Unassigned"
-            location_totals[loc_name] = location_totals.get(loc_name, 0) + float(row.quantity)
+            loc_name = row["location__name"] or "Unassigned"
+            location_totals[loc_name] = location_totals.get(loc_name, 0) + float(row["total"] or 0)
     except Exception:
         pass
 
@@ -85,36 +159,119 @@ def get_dashboard_data():
     for name in Location.objects.values_list("name", flat=True):
         location_totals.setdefault(name, 0)
 
-    location_labels = list(location_totals.keys())
-    location_values = list(location_totals.values())
-
-    # 6. Expiring Soon Table
-    today_plus_15 = int((today + datetime.timedelta(days=15)).strftime("%s"))
-    today_plus_30 = int((today + datetime.timedelta(days=30)).strftime("%s"))
+    return {
+        'location_labels': list(location_totals.keys()),
+        'location_values': list(location_totals.values()),
+    }
 
-    expiring_soon = ProductItem.objects.filter(
-        expiry_date__range=[today, today + datetime.timedelta(days=60)]
-    ).order_by('expiry_date')
 
+def po_status_widget(location_ids=None):
+    orders = PurchaseOrder.objects.all()
+    if location_ids is not None:
+        orders = orders.filter(product_item__product_id__in=products_in_locations(location_ids))
+    status_rows = orders.values("status").annotate(total=Count("id")).order_by("status")
     return {
-        'stock_labels': stock_labels,
-        'stock_values': stock_values,
-        'threshold_values': threshold_values,
-        'stock_names': stock_names,
-        'supplier_labels': supplier_labels,
-        'supplier_values': supplier_values,
-        'withdrawal_dates': withdrawal_dates,
-        'withdrawal_counts': withdrawal_counts,
-        'top_products_labels': top_products_labels,
-        'top_products_counts': top_products_counts,
-        'location_labels': location_labels,
-        'location_values': location_values,
-        'expiring_soon': expiring_soon,
-        'today_plus_15': today_plus_15,
-        'today_plus_30': today_plus_30,
+        'po_status_labels': [row["status"] for row in status_rows],
+        'po_status_counts': [row["total"] for row in status_rows],
     }
 
 
+def expiry_table_widget(location_ids=None):
+    today = now().date()
+    today_plus_15 = today + datetime.timedelta(days=15)
+    today_plus_30 = today + datetime.timedelta(days=30)
+
+    items = ProductItem.objects.all()
+    if location_ids is not None:
+        items = items.filter(product_id__in=products_in_locations(location_ids))
+    expiring_soon = (
+        items.filter(expiry_date__range=[today, today + datetime.timedelta(days=60)])
+        .order_by('expiry_date')
+        .values_list("product__name", "lot_number", "expiry_date", "current_stock")
+    )
+    rows = []
+    for product_name, lot_number, expiry_date, current_stock in expiring_soon:
+        if expiry_date < today_plus_15:
+            severity = "critical"
+        elif expiry_date < today_plus_30:
+            severity = "warning"
+        else:
+            severity = "ok"
+        rows.append({
+            "product": product_name,
+            "lot_number": lot_number,
+            "expiry_date": expiry_date.isoformat(),
+            "current_stock": float(current_stock),
+            "severity": severity,
+        })
+    return {'expiring_soon': rows}
+
+
+# Each dashboard widget is computed and cached independently so that one slow
+# aggregation never holds back the others. ``ttl`` is in seconds and
+# ``invalidated_by`` lists the live-feed event types that make the cache stale.
+DASHBOARD_WIDGETS = {
+    "stock_level": {"compute": stock_level_widget, "ttl": 60, "invalidated_by": ("lot",)},
+    "supplier_distribution": {"compute": supplier_distribution_widget, "ttl": 300, "invalidated_by": ()},
+    "withdrawal_trend": {"compute": withdrawal_trend_widget, "ttl": 120, "invalidated_by": ("lot",)},
+    "top_withdrawn": {"compute": top_withdrawn_widget, "ttl": 120, "invalidated_by": ("lot",)},
+    "location_distribution": {"compute": location_distribution_widget, "ttl": 60, "invalidated_by": ("lot", "location")},
+    "po_status": {"compute": po_status_widget, "ttl": 120, "invalidated_by": ()},
+    "expiry_table": {"compute": expiry_table_widget, "ttl": 300, "invalidated_by": ("lot",)},
+}
+
+
+def _widget_version_key(name):
+    return f"{DASHBOARD_WIDGET_CACHE_PREFIX}:{name}:version"
+
+
+def get_dashboard_widget(name, location_ids=None):
+    """Return the payload for one dashboard widget, served from cache when fresh.
+
+    Each location scope is cached separately; invalidation bumps a per-widget
+    version so every scope goes stale at once.
+    """
+    widget = DASHBOARD_WIDGETS[name]
+    version = cache.get_or_set(_widget_version_key(name), 1, None)
+    scope_key = "all" if location_ids is None else "-".join(str(pk) for pk in sorted(location_ids))
+    cache_key = f"{DASHBOARD_WIDGET_CACHE_PREFIX}:{name}:v{version}:{scope_key}"
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return {**payload, "cached": True}
+
+    started = time.perf_counter()
+    data = widget["compute"](location_ids)
+    payload = {
+        "widget": name,
+        "scope": scope_key,
+        "data": data,
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2),
+        "computed_at": now().isoformat(),
+    }
+    ttl = widget.get("ttl", getattr(settings, "DASHBOARD_WIDGET_CACHE_SECONDS", 60))
+    cache.set(cache_key, payload, ttl)
+    return {**payload, "cached": False}
+
+
+def invalidate_dashboard_widgets(event_types):
+    """Expire cached widgets, in every location scope, affected by the given live-feed event types."""
+    for name, widget in DASHBOARD_WIDGETS.items():
+        if not set(widget["invalidated_by"]) & set(event_types):
+            continue
+        try:
+            cache.incr(_widget_version_key(name))
+        except ValueError:
+            cache.set(_widget_version_key(name), 2, None)
+
+
+def get_dashboard_data():
+    """Compute every dashboard widget synchronously and merge the results."""
+    context = {}
+    for widget in DASHBOARD_WIDGETS.values():
+        context.update(widget["compute"]())
+    return context
+
+
 
 # import json
 # import pandas as pd
@@ -129,6 +286,18 @@ def get_dashboard_data():
 
 
 def inventory_analysis_forecasting(request):
+    # The scientific stack is imported here, not at module level, so web workers
+    # and management commands that never render this page do not load it.
+    import numpy as np
+    import pandas as pd
+
+    from services.forecasting.consumption_matrix import (
+        DEFAULT_PERCENTILE,
+        consumption_statistics,
+        load_consumption_matrix,
+    )
+    from services.forecasting.forecasting import forecast_window
+
     # === Get Filter Parameters from GET ===
     selected_range = request.GET.get("range", "30")  # default: 1 month
     selected_limit = request.GET.get("limit", "all")  # default: all items
@@ -146,62 +315,99 @@ def inventory_analysis_forecasting(request):
     # === Prepare Date Range ===
     today = now().date()
     start_date = today - timedelta(days=days_back)
-    recent_dates = [start_date + timedelta(days=i) for i in range((today - start_date).days + 1)]
+    recent_dates = pd.date_range(start_date, today, freq="D")
 
-    # === Filtered Products ===
-    products = Product.objects.prefetch_related('items').all()
+    # === Filtered Products (stock totals summed in the same query) ===
+    products = Product.objects.annotate(
+        total_stock=Coalesce(Sum("items__current_stock"), Decimal("0"))
+    ).order_by("id")
     if limit:
         products = products[:limit]
+    products = list(products)
 
     product_names = [p.name for p in products]
-    current_stock = [float(sum(i.current_stock for i in p.items.all())) for p in products]
+    current_stock = [float(p.total_stock) for p in products]
     stock_thresholds = [p.threshold for p in products]
     lead_times = [p.lead_time.days for p in products]
 
-    # === Withdrawals over Date Range ===
-    withdrawal_counts = [
-        float(Withdrawal.objects.filter(timestamp__date=day).aggregate(total=Sum('quantity'))['total'] or 0)
-        for day in recent_dates
-    ]
+    # === Withdrawals over Date Range: one grouped query, densified to every day ===
+    daily_totals = (
+        Withdrawal.objects.filter(timestamp__date__range=(start_date, today))
+        .annotate(day=TruncDate("timestamp"))
+        .values("day")
+        .annotate(total=Sum("quantity"))
+        .order_by("day")
+    )
+    withdrawals_by_day = pd.Series(
+        {pd.Timestamp(row["day"]): float(row["total"] or 0) for row in daily_totals},
+        dtype="float64",
+    ).reindex(recent_dates, fill_value=0.0)
+    withdrawal_counts = withdrawals_by_day.tolist()
     date_labels = [day.strftime("%b %d") for day in recent_dates]
 
     # === DataFrame for SMA & Forecast ===
-    df = pd.DataFrame({"date": recent_dates, "withdrawals": withdrawal_counts}).set_index("date").asfreq("D", fill_value=0)
-    df["withdrawals"] = pd.to_numeric(df["withdrawals"], errors="coerce").fillna(0)
+    df = withdrawals_by_day.rename("withdrawals").to_frame()
     df["SMA_7"] = df["withdrawals"].rolling(window=7, min_periods=1).mean()
     df["SMA_14"] = df["withdrawals"].rolling(window=14, min_periods=1).mean()
 
-    # === Exponential Smoothing Forecast ===
+    # === Precomputed Forecasts (written by the run_forecasts command) ===
+    forecast_start = today + timedelta(days=1)
+    forecast_results = list(ForecastResult.objects.only(
+        "product_id", "forecast_start", "forecast_values", "run_out_date", "reorder_date"
+    ))
     forecast_values = [0] * 7
-    if df["withdrawals"].sum() > 0:
-        model = ExponentialSmoothing(df["withdrawals"], trend="add", seasonal=None, damped_trend=True)
-        fitted = model.fit()
-        forecast_values = [round(val, 2) for val in fitted.forecast(7).tolist()]
+    for result in forecast_results:
+        window = forecast_window(result, forecast_start, 7)
+        forecast_values = [total + value for total, value in zip(forecast_values, window)]
+    forecast_values = [round(value, 2) for value in forecast_values]
+    forecast_computed_at = ForecastResult.objects.aggregate(latest=Max("computed_at"))["latest"]
+    forecasts_by_product = {result.product_id: result for result in forecast_results}
 
     forecast_dates = [(today + timedelta(days=i)).strftime("%b %d") for i in range(1, 8)]
 
-    # === Run-Out & Reorder Estimates ===
-    days_until_run_out = []
-    days_until_reorder = []
-
+    # === Run-Out & Reorder Estimates (array operations over a products x days matrix) ===
+    consumption = consumption_statistics(
+        load_consumption_matrix([p.id for p in products], start_date, today),
+        current_stock,
+        lead_times,
+        today,
+        service_level=settings.FORECAST_SERVICE_LEVEL,
+    )
+    finite_run_out = np.isfinite(consumption["days_to_run_out"])
+    days_until_run_out = np.where(
+        finite_run_out, np.round(consumption["days_to_run_out"], 2), 0
+    ).tolist()
+    days_until_reorder = np.where(
+        np.isfinite(consumption["days_until_reorder"]), np.round(consumption["days_until_reorder"], 2), 0
+    ).tolist()
+    # A stored per-product forecast takes precedence over the average-demand estimate.
     for idx, product in enumerate(products):
-        total_withdrawn = Withdrawal.objects.filter(
-            product_item__product=product,
-            timestamp__gte=start_date
-        ).aggregate(total=Sum('quantity'))['total'] or 0
-
-        avg_daily = float(total_withdrawn) / max(days_back, 1)
-        current = current_stock[idx]
-
-        if avg_daily > 0 and current > 0:
-            run_out = round(current / float(avg_daily), 2)
-            reorder = max(run_out - lead_times[idx], 0)
-        else:
-            run_out = 0
-            reorder = 0
-
-        days_until_run_out.append(run_out)
-        days_until_reorder.append(reorder)
+        result = forecasts_by_product.get(product.id)
+        if result:
+            days_until_run_out[idx] = max((result.run_out_date - today).days, 0) if result.run_out_date else 0
+            days_until_reorder[idx] = max((result.reorder_date - today).days, 0) if result.reorder_date else 0
+
+    reorder_plan = [
+        {
+            "name": name,
+            "avg_daily": round(float(avg), 2),
+            "percentile_daily": round(float(high), 2),
+            "safety_stock": round(float(safety), 2),
+            "reorder_point": round(float(point), 2),
+            "run_out_date": run_out.item() if finite else None,
+            "reorder_date": reorder.item() if not np.isnat(reorder) else None,
+        }
+        for name, avg, high, safety, point, run_out, reorder, finite in zip(
+            product_names,
+            consumption["avg_daily"],
+            consumption["percentile_daily"],
+            consumption["safety_stock"],
+            consumption["reorder_point"],
+            consumption["run_out_date"],
+            consumption["reorder_date"],
+            finite_run_out,
+        )
+    ]
 
     # === Top Consumed Products ===
     top = (Withdrawal.objects
@@ -234,6 +440,10 @@ def inventory_analysis_forecasting(request):
         "top_consumed_quantities": json.dumps(top_consumed_quantities),
         "selected_range": selected_range,
         "selected_limit": selected_limit,
+        "forecast_computed_at": forecast_computed_at,
+        "reorder_plan": reorder_plan,
+        "service_level": settings.FORECAST_SERVICE_LEVEL,
+        "demand_percentile": DEFAULT_PERCENTILE,
     }
 
     return render(request, 'analytics/inventory_analysis_forecasting.html', context)
@@ -0,0 +1,330 @@
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from services.data_output.matcher import suggestion_payload
+from services.data_output.metrics import ListenerMetrics
+
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BUSY = "busy"
+OVERFLOW_DROP = "drop"
+OVERFLOW_POLICIES = (OVERFLOW_BUSY, OVERFLOW_DROP)
+
+# Payload keys read as the correlation id a response echoes back, in order.
+CORRELATION_KEYS = ("correlation_id", "correlationId", "request_id", "requestId")
+
+
+def _load_json(raw_payload):
+    try:
+        return json.loads(raw_payload)
+    except json.JSONDecodeError:
+        return None
+
+
+def _name_from(data):
+    if isinstance(data, dict):
+        ordered_keys = (
+            "combinedText",
+            "product_name",
+            "name",
+            "product",
+            "query",
+        )
+        for key in ordered_keys:
+            value = data.get(key)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+
+        texts = data.get("texts")
+        if isinstance(texts, list):
+            for entry in texts:
+                if isinstance(entry, str) and entry.strip():
+                    return entry.strip()
+    elif isinstance(data, str):
+        return data.strip()
+    return None
+
+
+def extract_product_name(raw_payload, data=None):
+    """Interpret the inbound payload and return the product name string."""
+    if not raw_payload:
+        return ""
+    if data is None:
+        data = _load_json(raw_payload)
+    name = _name_from(data)
+    return raw_payload if name is None else name
+
+
+def extract_batch(data):
+    """``[(item id, product name), ...]`` for a batch check, or None for a single one.
+
+    A batch is a JSON list, or an object with an ``items`` list, of
+    entries shaped like single checks (or plain strings). An entry's id
+    is its ``id`` or ``item_id``, else its position in the list.
+    """
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return None
+    batch = []
+    for position, item in enumerate(items):
+        item_id = position
+        if isinstance(item, dict):
+            item_id = item.get("id", item.get("item_id", position))
+        batch.append((item_id, _name_from(item) or ""))
+    return batch
+
+
+def extract_correlation_id(data, properties=None):
+    """The id the sender will match our response against, if it sent one.
+
+    MQTT 5 CorrelationData wins over an id carried in the parsed JSON payload.
+    """
+    correlation_data = getattr(properties, "CorrelationData", None)
+    if correlation_data:
+        return correlation_data.decode("utf-8", "replace")
+    if isinstance(data, dict):
+        for key in CORRELATION_KEYS:
+            value = data.get(key)
+            if isinstance(value, (str, int)) and not isinstance(value, bool) and str(value).strip():
+                return str(value).strip()
+    return None
+
+
+class CheckListener:
+    """Answers package checks from the lift/lobby scanner on a bounded worker pool.
+
+    ``on_message`` runs on paho's network thread, so it only queues the
+    message; ``workers`` threads parse, match and publish. When
+    ``queue_limit`` messages are already waiting, a new one is shed: with
+    the ``busy`` overflow policy the sender gets an explicit busy response
+    carrying its correlation id, with ``drop`` it is only logged. A batch
+    check (see extract_batch) is one queued message answered by one
+    response. Message counts and timings go to ``metrics``; per-message
+    log lines are written for a sample only. The client is any object
+    with paho's ``subscribe``/``publish`` methods.
+    """
+
+    def __init__(self, matcher, check_topic, response_topic, top_k,
+                 workers=None, queue_limit=None, overflow=None, metrics=None):
+        self.matcher = matcher
+        self.check_topic = check_topic
+        self.response_topic = response_topic
+        self.top_k = top_k
+        self.workers = workers or getattr(settings, "DATA_OUTPUT_WORKERS", 4)
+        self.overflow = overflow or getattr(settings, "DATA_OUTPUT_OVERFLOW", OVERFLOW_BUSY)
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{self.overflow}'; use {' or '.join(OVERFLOW_POLICIES)}.")
+        self.queue_limit = queue_limit or getattr(settings, "DATA_OUTPUT_QUEUE_LIMIT", 200)
+        self.response_threshold = getattr(settings, "DATA_OUTPUT_RESPONSE_THRESHOLD", 0.8)
+        self.batch_limit = getattr(settings, "DATA_OUTPUT_BATCH_LIMIT", 200)
+        self._queue = queue.Queue(maxsize=self.queue_limit)
+        self._threads = []
+        # paho's MQTTMessageInfo for the newest response; QoS 1 responses go out in order.
+        self._last_publish = None
+        self.metrics = metrics or ListenerMetrics()
+        self.metrics.gauge("queue_depth", self._queue.qsize, "Checks waiting for a worker.")
+        self.metrics.gauge("indexed_products", lambda: len(self.matcher), "Products in the match index.")
+        for key, help_text in (
+            ("hits", "Lookups answered from the match result cache."),
+            ("misses", "Lookups scored against the index."),
+            ("hit_rate", "Share of lookups answered from the match result cache."),
+            ("entries", "Results held in the match result cache."),
+        ):
+            self.metrics.gauge(f"match_cache_{key}", lambda key=key: self.matcher.cache_info()[key], help_text)
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"data-output-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """Let the workers finish the messages already queued, then end them."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wait_for_publishes(self, timeout=5.0):
+        """Wait until the broker has acknowledged the last response published, e.g. before disconnecting."""
+        info = self._last_publish
+        if info is not None and hasattr(info, "wait_for_publish"):
+            try:
+                info.wait_for_publish(timeout)
+            except (RuntimeError, ValueError):
+                # Not connected, or the message could not be queued; nothing more will go out.
+                logger.warning("Responses still unsent on shutdown were lost")
+
+    # -- paho callbacks ------------------------------------------------------
+
+    def on_connect(self, client, _userdata, _flags, rc):
+        if rc == 0:
+            if self.metrics.counters["connects"]:
+                self.metrics.inc("reconnects")
+            self.metrics.inc("connects")
+            logger.info("Connected to MQTT broker")
+            client.subscribe(self.check_topic, qos=1)
+            logger.info("Subscribed to %s", self.check_topic)
+        else:
+            logger.error("Failed to connect to MQTT broker: rc=%s", rc)
+
+    def on_disconnect(self, _client, _userdata, rc):
+        self.metrics.inc("disconnects")
+        if rc != 0:
+            logger.warning("Lost the MQTT broker connection (rc=%s); reconnecting", rc)
+
+    def on_message(self, client, _userdata, msg):
+        self.metrics.inc("messages_received")
+        try:
+            self._queue.put_nowait((client, msg, time.perf_counter()))
+        except queue.Full:
+            self._shed(client, msg)
+
+    # -- processing ----------------------------------------------------------
+
+    def _shed(self, client, msg):
+        raw_payload = msg.payload.decode("utf-8", "replace").strip()
+        data = _load_json(raw_payload) if raw_payload else None
+        correlation_id = extract_correlation_id(data, getattr(msg, "properties", None))
+        self.metrics.inc("busy" if self.overflow == OVERFLOW_BUSY else "dropped")
+        # Shedding happens in bursts; the stats line carries the totals.
+        if self.metrics.sampled():
+            logger.warning(
+                "Check queue full (%s waiting); %s message %s",
+                self.queue_limit,
+                "answering busy to" if self.overflow == OVERFLOW_BUSY else "dropping",
+                correlation_id or "without correlation id",
+            )
+        if self.overflow == OVERFLOW_BUSY:
+            self._publish(client, {
+                "correlation_id": correlation_id,
+                "status": "busy",
+                "match_found": False,
+                "message": "Listener busy, retry shortly",
+            })
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            client, msg, queued_at = job
+            self.metrics.observe("queue_wait_ms", (time.perf_counter() - queued_at) * 1000)
+            # Each worker thread has its own connection; drop it if it went stale or broke.
+            close_old_connections()
+            try:
+                self.handle(client, msg)
+            except Exception:
+                self.metrics.inc("errors")
+                logger.exception("Failed to handle message on %s", msg.topic)
+            finally:
+                close_old_connections()
+
+    def handle(self, client, msg):
+        sampled = self.metrics.sampled()
+        try:
+            raw_payload = msg.payload.decode("utf-8").strip()
+        except UnicodeDecodeError:
+            self.metrics.inc("parse_failures")
+            if sampled:
+                logger.warning("Ignoring a payload on %s that is not UTF-8", msg.topic)
+            return
+        if sampled:
+            logger.info("Received payload on %s: %s", msg.topic, raw_payload)
+        data = _load_json(raw_payload) if raw_payload else None
+        if data is None and raw_payload[:1] in ("{", "["):
+            # Still matched as plain text, as before, but most likely a broken sender.
+            self.metrics.inc("parse_failures")
+        correlation_id = extract_correlation_id(data, getattr(msg, "properties", None))
+        batch = extract_batch(data)
+        started = time.perf_counter()
+        if batch is None:
+            response = self.check(extract_product_name(raw_payload, data), correlation_id)
+        else:
+            response = self.check_batch(batch, correlation_id)
+        self.metrics.observe("match_latency_ms", (time.perf_counter() - started) * 1000)
+        self._publish(client, response)
+        if not sampled:
+            return
+        if batch is None:
+            logger.info(
+                "Published response to %s (match_found=%s, score=%s)",
+                self.response_topic,
+                response["match_found"],
+                response["match_score"],
+            )
+        else:
+            logger.info(
+                "Published batch response to %s (%s items, %s found)",
+                self.response_topic,
+                response["count"],
+                response.get("found", 0),
+            )
+
+    def check(self, product_name, correlation_id=None):
+        """Response payload for one product name."""
+        response = self._result(product_name, self.matcher.search(product_name, limit=self.top_k))
+        return dict({"correlation_id": correlation_id, "status": "ok"}, **response)
+
+    def check_batch(self, batch, correlation_id=None):
+        """One response payload for a batch of ``(item id, product name)`` checks."""
+        if len(batch) > self.batch_limit:
+            return {
+                "correlation_id": correlation_id,
+                "status": "error",
+                "batch": True,
+                "count": len(batch),
+                "message": f"A batch may hold at most {self.batch_limit} items; split it and resend.",
+            }
+        names = [name for _, name in batch]
+        results = [
+            dict({"id": item_id}, **self._result(name, suggestions))
+            for (item_id, name), suggestions in zip(batch, self.matcher.search_many(names, limit=self.top_k))
+        ]
+        return {
+            "correlation_id": correlation_id,
+            "status": "ok",
+            "batch": True,
+            "count": len(results),
+            "found": sum(result["match_found"] for result in results),
+            "results": results,
+        }
+
+    def _result(self, product_name, suggestions):
+        score = suggestions[0].score if suggestions else 0.0
+        product = suggestions[0].product if suggestions and score >= self.matcher.threshold else None
+        match_found = bool(product and score >= self.response_threshold)
+        self.metrics.inc("checks")
+        self.metrics.inc("matches_found", int(match_found))
+        self.metrics.observe("match_score", score * 100)
+        product_payload = (
+            {
+                "id": product.id,
+                "name": product.name,
+                "product_code": product.product_code,
+                "barcode_value": product.product_code,
+                "qrcode_value": product.product_code,
+            }
+            if match_found
+            else None
+        )
+        return {
+            "requested_name": product_name,
+            "match_found": match_found,
+            "match_score": round(score * 100, 2),
+            "product": product_payload,
+            "candidates": [suggestion_payload(suggestion) for suggestion in suggestions],
+            "message": "Product found" if match_found else "Product not found",
+        }
+
+    def _publish(self, client, response):
+        self.metrics.inc("messages_published")
+        self._last_publish = client.publish(self.response_topic, json.dumps(response), qos=1, retain=False)
@@ -0,0 +1,299 @@
+"""Offline load testing for the data_output listener.
+
+FakeBroker and FakeClient stand in for the MQTT broker and paho's client,
+so CheckListener runs unchanged without a network. run_load() replays a
+corpus of check payloads against it at a set rate and measures
+throughput, latency and match accuracy.
+"""
+import json
+import queue
+import random
+import string
+import threading
+import time
+from collections import namedtuple
+
+from services.data_storage.models import Product
+
+
+FakeMessage = namedtuple("FakeMessage", "topic payload qos retain properties")
+
+# One corpus entry: the text sent, the product id it should match (None: no match) and how it was made.
+CorpusEntry = namedtuple("CorpusEntry", "text expected_id variant")
+
+VARIANTS = ("exact", "case", "typo", "reordered", "code", "unknown")
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter matching, with the ``+`` and ``#`` wildcards."""
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for position, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if position >= len(topic_parts) or part not in ("+", topic_parts[position]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class FakeBroker:
+    """In-process stand-in for an MQTT broker: routes publishes to subscribed FakeClients.
+
+    Retained messages are kept per topic and delivered to later subscribers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self.retained = {}
+
+    def subscribe(self, client, pattern):
+        with self._lock:
+            self._subscriptions.append((pattern, client))
+            retained = [
+                FakeMessage(topic, payload, 0, True, None)
+                for topic, payload in self.retained.items()
+                if topic_matches(pattern, topic)
+            ]
+        for message in retained:
+            client.deliver(message)
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._subscriptions = [(pattern, other) for pattern, other in self._subscriptions if other is not client]
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        payload = payload or b""
+        with self._lock:
+            if retain:
+                # An empty retained payload clears the topic, as on a real broker.
+                if payload:
+                    self.retained[topic] = payload
+                else:
+                    self.retained.pop(topic, None)
+            targets = [client for pattern, client in self._subscriptions if topic_matches(pattern, topic)]
+        message = FakeMessage(topic, payload, qos, False, None)
+        for client in targets:
+            client.deliver(message)
+
+
+class FakeClient:
+    """The part of ``paho.mqtt.client.Client`` the listener uses, attached to a FakeBroker.
+
+    Messages are handed to ``on_message`` on the client's own network
+    thread (loop_start/loop_forever), as paho does.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self._inbox = queue.Queue()
+        self._thread = None
+
+    def enable_logger(self, logger=None):
+        pass
+
+    def connect(self, host="localhost", port=1883, keepalive=60):
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def disconnect(self):
+        self.broker.unsubscribe(self)
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        self.broker.subscribe(self, topic)
+        return 0, 1
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.broker.publish(topic, payload, qos, retain)
+
+    def deliver(self, message):
+        self._inbox.put(message)
+
+    def loop_start(self):
+        self._thread = threading.Thread(target=self.loop_forever, name="fake-mqtt-loop", daemon=True)
+        self._thread.start()
+
+    def loop_stop(self):
+        self._inbox.put(None)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def loop_forever(self):
+        while True:
+            message = self._inbox.get()
+            if message is None:
+                return
+            if self.on_message:
+                self.on_message(self, None, message)
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def _typo(text, rng, edits=2):
+    """Substitute a few characters, like an OCR misread."""
+    chars = list(text)
+    for _ in range(min(edits, len(chars))):
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase + string.digits)
+    return "".join(chars)
+
+
+def _variant_text(variant, name, code, rng):
+    if variant == "exact":
+        return name
+    if variant == "case":
+        return f"  {name.upper()} "
+    if variant == "typo":
+        return _typo(name, rng)
+    if variant == "reordered":
+        words = name.split()
+        rng.shuffle(words)
+        return " ".join(words)
+    if variant == "code":
+        # A printed GS1 label: the code zero-padded to 14 digits amid other text.
+        return f"REF {code.zfill(14)} LOT {rng.randint(1000, 9999)}"
+    return "".join(rng.choice(string.ascii_lowercase + " ") for _ in range(rng.randint(8, 24))).strip() or "x"
+
+
+def generate_corpus(size, seed=0):
+    """``size`` check texts made from random products in the database, with their expected matches."""
+    rng = random.Random(seed)
+    products = list(Product.objects.values_list("id", "name", "product_code"))
+    if not products:
+        return []
+    corpus = []
+    for _ in range(size):
+        variant = rng.choice(VARIANTS)
+        product_id, name, code = rng.choice(products)
+        text = _variant_text(variant, name, code, rng)
+        corpus.append(CorpusEntry(text, None if variant == "unknown" else product_id, variant))
+    return corpus
+
+
+def read_corpus(path):
+    """Corpus entries from a JSON lines file of ``{"text", "expected_id", "variant"}`` objects."""
+    with open(path, encoding="utf-8") as corpus_file:
+        return [
+            CorpusEntry(entry["text"], entry.get("expected_id"), entry.get("variant", "file"))
+            for entry in map(json.loads, filter(str.strip, corpus_file))
+        ]
+
+
+def write_corpus(path, corpus):
+    with open(path, "w", encoding="utf-8") as corpus_file:
+        for entry in corpus:
+            corpus_file.write(json.dumps(entry._asdict()) + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def _correct(entry, result):
+    matched = result["product"]["id"] if result.get("match_found") else None
+    return matched == entry.expected_id
+
+
+def run_load(broker, corpus, check_topic, response_topic, rate=0, batch_size=1, timeout=10.0):
+    """Publish ``corpus`` on ``check_topic`` at ``rate`` messages/second (0: flat out) and collect answers.
+
+    With ``batch_size`` above 1, entries travel in batch checks. Returns a
+    summary dict; latencies are in milliseconds, accuracy counts answered
+    entries whose match (or lack of one) is the expected product.
+    """
+    batches = [corpus[start:start + batch_size] for start in range(0, len(corpus), batch_size)]
+    sent_at = {}
+    received = {}
+    done = threading.Event()
+
+    def on_message(_client, _userdata, message):
+        now = time.perf_counter()
+        response = json.loads(message.payload)
+        key = response.get("correlation_id")
+        if key in sent_at and key not in received:
+            received[key] = (now, response)
+            if len(received) == len(batches):
+                done.set()
+
+    client = FakeClient(broker)
+    client.on_message = on_message
+    client.subscribe(response_topic)
+    client.loop_start()
+
+    started = time.perf_counter()
+    for number, batch in enumerate(batches):
+        if rate:
+            delay = started + number / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        key = f"load-{number}"
+        if batch_size > 1:
+            payload = {"correlation_id": key, "items": [
+                {"id": position, "combinedText": entry.text} for position, entry in enumerate(batch)
+            ]}
+        else:
+            payload = {"correlation_id": key, "combinedText": batch[0].text}
+        sent_at[key] = time.perf_counter()
+        client.publish(check_topic, json.dumps(payload), qos=1)
+    send_seconds = time.perf_counter() - started
+    done.wait(timeout)
+    client.loop_stop()
+    broker.unsubscribe(client)
+
+    latencies, busy, answered, correct = [], 0, 0, 0
+    by_variant = {}
+    last_answer = started
+    for number, batch in enumerate(batches):
+        key = f"load-{number}"
+        if key not in received:
+            continue
+        answered_at, response = received[key]
+        last_answer = max(last_answer, answered_at)
+        if response.get("status") != "ok":
+            busy += len(batch)
+            continue
+        results = response["results"] if batch_size > 1 else [response]
+        latencies.extend([(answered_at - sent_at[key]) * 1000] * len(batch))
+        for entry, result in zip(batch, results):
+            answered += 1
+            hit = _correct(entry, result)
+            correct += hit
+            variant = by_variant.setdefault(entry.variant, [0, 0])
+            variant[0] += hit
+            variant[1] += 1
+
+    latencies.sort()
+    elapsed = last_answer - started
+    return {
+        "sent": len(corpus),
+        "messages": len(batches),
+        "answered": answered,
+        "busy": busy,
+        "lost": len(corpus) - answered - busy,
+        "send_seconds": send_seconds,
+        "seconds": elapsed,
+        "throughput": answered / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "accuracy": correct / answered if answered else None,
+        "by_variant": {name: hits / total for name, (hits, total) in sorted(by_variant.items())},
+    }
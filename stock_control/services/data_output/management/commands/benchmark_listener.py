@@ -0,0 +1,168 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.data_output.listener import OVERFLOW_POLICIES, CheckListener
+from services.data_output.loadtest import FakeBroker, FakeClient, generate_corpus, read_corpus, run_load, write_corpus
+from services.data_output.matcher import ProductMatcher
+
+
+def _ms(value):
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the data_output listener offline: run it against an in-process broker "
+        "stand-in, replay a corpus of check payloads at a set rate and report throughput, "
+        "p50/p95/p99 latency and match accuracy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corpus",
+            help="JSON lines file of {\"text\", \"expected_id\", \"variant\"} checks to replay "
+                 "(default: generated from the products in the database).",
+        )
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=2000,
+            help="Checks to generate when no --corpus is given (default: 2000).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed for the generated corpus (default: 0).",
+        )
+        parser.add_argument(
+            "--save-corpus",
+            help="Write the corpus used to this file, to replay it after a change.",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            nargs="+",
+            default=[0],
+            help="Messages per second to send; several values run one pass each (default: 0, flat out).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1,
+            help="Checks per message; above 1 they are sent as batch checks (default: 1).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Listener worker threads (default: DATA_OUTPUT_WORKERS).",
+        )
+        parser.add_argument(
+            "--queue-limit",
+            type=int,
+            default=None,
+            help="Listener queue limit (default: DATA_OUTPUT_QUEUE_LIMIT).",
+        )
+        parser.add_argument(
+            "--overflow",
+            choices=OVERFLOW_POLICIES,
+            default=None,
+            help="Listener overflow policy (default: DATA_OUTPUT_OVERFLOW).",
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=int,
+            default=None,
+            help="Match result cache size; 0 measures uncached matching (default: DATA_OUTPUT_MATCH_CACHE_SIZE).",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30.0,
+            help="Seconds to wait for outstanding answers after the last send (default: 30).",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("messages", "batch_size", "workers", "queue_limit"):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be a positive number.")
+        if options["cache_size"] is not None and options["cache_size"] < 0:
+            raise CommandError("--cache-size must not be negative.")
+        if any(rate < 0 for rate in options["rate"]):
+            raise CommandError("--rate must not be negative.")
+        # Per-message logs would dominate the measurement; shed checks are counted in the report.
+        logging.basicConfig(level=logging.ERROR, format="%(asctime)s %(levelname)s %(message)s")
+
+        if options["corpus"]:
+            corpus = read_corpus(options["corpus"])
+        else:
+            corpus = generate_corpus(options["messages"], seed=options["seed"])
+        if not corpus:
+            raise CommandError("Nothing to replay: the corpus is empty and there are no products to build one from.")
+        if options["save_corpus"]:
+            write_corpus(options["save_corpus"], corpus)
+
+        matcher = ProductMatcher(
+            getattr(settings, "DATA_OUTPUT_FUZZY_THRESHOLD", 0.8), cache_size=options["cache_size"]
+        )
+        started = time.perf_counter()
+        indexed = matcher.load()
+        self.stdout.write(
+            f"Indexed {indexed} products in {(time.perf_counter() - started) * 1000:.0f} ms; "
+            f"replaying {len(corpus)} checks"
+        )
+
+        check_topic = settings.DATA_OUTPUT_MQTT_CHECK_TOPIC
+        response_topic = settings.DATA_OUTPUT_MQTT_RESPONSE_TOPIC
+        self.stdout.write(
+            f"{'rate/s':>8}{'answered':>10}{'busy':>6}{'lost':>6}{'checks/s':>10}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'accuracy':>10}"
+        )
+        for rate in options["rate"]:
+            broker = FakeBroker()
+            try:
+                listener = CheckListener(
+                    matcher,
+                    check_topic,
+                    response_topic,
+                    getattr(settings, "DATA_OUTPUT_TOP_K", 5),
+                    workers=options["workers"],
+                    queue_limit=options["queue_limit"],
+                    overflow=options["overflow"],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            listener.start()
+            client = FakeClient(broker)
+            client.on_connect = listener.on_connect
+            client.on_message = listener.on_message
+            client.connect()
+            client.loop_start()
+            try:
+                result = run_load(
+                    broker, corpus, check_topic, response_topic,
+                    rate=rate, batch_size=options["batch_size"], timeout=options["timeout"],
+                )
+            finally:
+                client.loop_stop()
+                listener.stop()
+
+            accuracy = f"{result['accuracy']:>10.1%}" if result["accuracy"] is not None else f"{'-':>10}"
+            self.stdout.write(
+                f"{(f'{rate:g}' if rate else 'max'):>8}{result['answered']:>10}{result['busy']:>6}{result['lost']:>6}"
+                f"{result['throughput']:>10.1f}{_ms(result['p50_ms'])}{_ms(result['p95_ms'])}{_ms(result['p99_ms'])}"
+                f"{accuracy}"
+            )
+        self.stdout.write(
+            "Accuracy by variant (last pass): "
+            + ", ".join(f"{name} {share:.1%}" for name, share in result["by_variant"].items())
+        )
+        cache = matcher.cache_info()
+        self.stdout.write(
+            f"Match cache (all passes): {cache['hits']} hits, {cache['misses']} misses, "
+            f"{cache['hit_rate']:.1%} hit rate"
+        )
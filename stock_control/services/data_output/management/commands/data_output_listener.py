@@ -1,11 +1,10 @@
-import json
 import logging
 import signal
-import sys
-from difflib import SequenceMatcher
+import threading
+import time
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 try:
     import paho.mqtt.client as mqtt
@@ -15,39 +14,13 @@ except ImportError as exc:  # pragma: no cover - surfaces during misconfiguratio
         "Install it via `pip install paho-mqtt`."
     ) from exc
 
-from services.data_storage.models import Product
+from services.data_output.listener import OVERFLOW_POLICIES, CheckListener
+from services.data_output.matcher import ProductMatcher
 
 
 logger = logging.getLogger(__name__)
 
 
-class ProductMatcher:
-    """Utility to find fuzzy matches for product names."""
-
-    def __init__(self, threshold: float):
-        self.threshold = threshold
-
-    def _score(self, query: str, candidate: str) -> float:
-        return SequenceMatcher(None, query.lower(), candidate.lower()).ratio()
-
-    def find(self, query: str):
-        if not query:
-            return None, 0.0
-
-        best_match = None
-        best_score = 0.0
-
-        for product in Product.objects.all().only("id", "name", "product_code"):
-            score = self._score(query, product.name)
-            if score > best_score:
-                best_match = product
-                best_score = score
-
-        if best_match and best_score >= self.threshold:
-            return best_match, best_score
-        return None, best_score
-
-
 class Command(BaseCommand):
     help = (
         "Listen to HiveMQ topic 'lobby/lift/packages/check', "
@@ -71,7 +44,44 @@ class Command(BaseCommand):
             "--threshold",
             type=float,
             default=getattr(settings, "DATA_OUTPUT_FUZZY_THRESHOLD", 0.6),
-            help="Minimum SequenceMatcher ratio (0-1) required to treat a product as existing.",
+            help="Minimum match score (0-1) required to treat a product as existing.",
+        )
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=getattr(settings, "DATA_OUTPUT_TOP_K", 5),
+            help="Ranked candidates included in each response (default: 5).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Threads matching and answering checks (default: DATA_OUTPUT_WORKERS).",
+        )
+        parser.add_argument(
+            "--queue-limit",
+            type=int,
+            default=None,
+            help="Checks allowed to wait for a worker before new ones are shed (default: DATA_OUTPUT_QUEUE_LIMIT).",
+        )
+        parser.add_argument(
+            "--overflow",
+            choices=OVERFLOW_POLICIES,
+            default=None,
+            help="What happens to a check arriving at a full queue: answer 'busy' or 'drop' it "
+                 "(default: DATA_OUTPUT_OVERFLOW).",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=getattr(settings, "DATA_OUTPUT_METRICS_PORT", 0),
+            help="Local port serving /metrics as text; 0 disables it (default: DATA_OUTPUT_METRICS_PORT).",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=getattr(settings, "DATA_OUTPUT_STATS_SECONDS", 60),
+            help="Seconds between stats log lines (default: DATA_OUTPUT_STATS_SECONDS).",
         )
 
     def handle(self, *args, **options):
@@ -82,107 +92,73 @@ class Command(BaseCommand):
         check_topic = settings.DATA_OUTPUT_MQTT_CHECK_TOPIC
         response_topic = settings.DATA_OUTPUT_MQTT_RESPONSE_TOPIC
         threshold = options["threshold"]
+        top_k = options["top_k"]
+        if top_k <= 0:
+            raise CommandError("--top-k must be a positive number.")
+        if options["stats_interval"] <= 0:
+            raise CommandError("--stats-interval must be a positive number of seconds.")
+        for name in ("workers", "queue_limit"):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be a positive number.")
         matcher = ProductMatcher(threshold)
+        started = time.perf_counter()
+        indexed = matcher.load()
+        logger.info(
+            "Indexed %s product names in %.1f ms", indexed, (time.perf_counter() - started) * 1000
+        )
+        matcher.start_refresh()
+
+        try:
+            listener = CheckListener(
+                matcher,
+                check_topic,
+                response_topic,
+                top_k,
+                workers=options["workers"],
+                queue_limit=options["queue_limit"],
+                overflow=options["overflow"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        listener.start()
+        listener.metrics.start_reporting(options["stats_interval"])
+        listener.metrics.serve(options["metrics_port"])
 
         client = mqtt.Client()
         client.enable_logger(logger)
 
+        stopping = threading.Event()
+
         def _graceful_exit(*_args):
-            logger.info("Shutting down MQTT listener...")
-            client.disconnect()
-            sys.exit(0)
+            stopping.set()
 
         signal.signal(signal.SIGTERM, _graceful_exit)
         signal.signal(signal.SIGINT, _graceful_exit)
 
-        def on_connect(_client, _userdata, _flags, rc):
-            if rc == 0:
-                logger.info("Connected to MQTT broker %s:%s", host, port)
-                _client.subscribe(check_topic, qos=1)
-                logger.info("Subscribed to %s", check_topic)
-            else:
-                logger.error("Failed to connect to MQTT broker: rc=%s", rc)
-
-        def on_message(_client, _userdata, msg):
-            raw_payload = msg.payload.decode("utf-8").strip()
-            logger.info("Received payload on %s: %s", msg.topic, raw_payload)
-            product_name = self._extract_product_name(raw_payload)
-
-            product, score = matcher.find(product_name)
-            match_found = bool(
-                product
-                and score >= getattr(settings, "DATA_OUTPUT_RESPONSE_THRESHOLD", 0.8)
-            )
-            product_payload = (
-                {
-                    "id": product.id,
-                    "name": product.name,
-                    "product_code": product.product_code,
-                    "barcode_value": product.product_code,
-                    "qrcode_value": product.product_code,
-                }
-                if match_found
-                else None
-            )
-            response = {
-                "requested_name": product_name,
-                "match_found": match_found,
-                "match_score": round(score * 100, 2),
-                "product": product_payload,
-                "message": "Product found" if match_found else "Product not found",
-            }
-
-            payload = json.dumps(response)
-            _client.publish(response_topic, payload, qos=1, retain=False)
-            logger.info(
-                "Published response to %s (match_found=%s, score=%s)",
-                response_topic,
-                response["match_found"],
-                response["match_score"],
-            )
-
-        client.on_connect = on_connect
-        client.on_message = on_message
+        client.on_connect = listener.on_connect
+        client.on_message = listener.on_message
+        client.on_disconnect = listener.on_disconnect
 
         logger.info(
-            "Starting data_output listener | host=%s port=%s threshold=%s",
+            "Starting data_output listener | host=%s port=%s threshold=%s workers=%s queue_limit=%s overflow=%s",
             host,
             port,
             threshold,
+            listener.workers,
+            listener.queue_limit,
+            listener.overflow,
         )
 
         client.connect(host, port)
-        client.loop_forever()
-
-    @staticmethod
-    def _extract_product_name(raw_payload: str) -> str:
-        """Interpret the inbound payload and return the product name string."""
-        if not raw_payload:
-            return ""
-
-        try:
-            data = json.loads(raw_payload)
-            if isinstance(data, dict):
-                ordered_keys = (
-                    "combinedText",
-                    "product_name",
-                    "name",
-                    "product",
-                    "query",
-                )
-                for key in ordered_keys:
-                    value = data.get(key)
-                    if isinstance(value, str) and value.strip():
-                        return value.strip()
-
-                texts = data.get("texts")
-                if isinstance(texts, list):
-                    for entry in texts:
-                        if isinstance(entry, str) and entry.strip():
-                            return entry.strip()
-            elif isinstance(data, str):
-                return data.strip()
-        except json.JSONDecodeError:
-            pass
-
-        return raw_payload
+        # The network loop runs in its own thread, so it can still send the drained answers on shutdown.
+        client.loop_start()
+        stopping.wait()
+
+        logger.info("Shutting down MQTT listener...")
+        # Take no new checks, answer the queued ones while still connected, then disconnect.
+        client.unsubscribe(check_topic)
+        listener.stop()
+        listener.wait_for_publishes()
+        client.disconnect()
+        client.loop_stop()
+        logger.info("Listener stats: %s", listener.metrics.stats_line()[0])
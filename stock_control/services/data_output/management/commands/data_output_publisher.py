@@ -0,0 +1,118 @@
+import logging
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError as exc:  # pragma: no cover - surfaces during misconfiguration
+    raise SystemExit(
+        "paho-mqtt is required for the data_output service. "
+        "Install it via `pip install paho-mqtt`."
+    ) from exc
+
+from services.data_output.publisher import PUBLIC_BROKERS, StockEventPublisher
+from services.data_storage.models import Alert
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish lot stock levels, low-stock alerts and expired lots as retained MQTT "
+        "messages, following the stock event log so devices need not poll the web app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--host",
+            default=getattr(settings, "DATA_OUTPUT_MQTT_HOST", "broker.hivemq.com"),
+            help="MQTT broker host (default: DATA_OUTPUT_MQTT_HOST); public brokers are refused.",
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=getattr(settings, "DATA_OUTPUT_MQTT_PORT", 1883),
+            help="MQTT broker port (default: 1883)",
+        )
+        parser.add_argument(
+            "--coalesce-seconds",
+            type=float,
+            default=None,
+            help="Window in which changes to one lot are published once (default: DATA_OUTPUT_PUBLISH_COALESCE_SECONDS).",
+        )
+        parser.add_argument(
+            "--stats-interval",
+            type=float,
+            default=getattr(settings, "DATA_OUTPUT_STATS_SECONDS", 60),
+            help="Seconds between stats log lines (default: DATA_OUTPUT_STATS_SECONDS).",
+        )
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+        if options["coalesce_seconds"] is not None and options["coalesce_seconds"] < 0:
+            raise CommandError("--coalesce-seconds must not be negative.")
+        if options["stats_interval"] <= 0:
+            raise CommandError("--stats-interval must be a positive number of seconds.")
+
+        if options["host"].strip().lower() in PUBLIC_BROKERS:
+            raise CommandError(
+                f"Refusing to publish inventory data as retained messages on the public broker "
+                f"{options['host']}: anyone can read them. Set DATA_OUTPUT_MQTT_HOST or --host to a private broker."
+            )
+
+        client = mqtt.Client()
+        client.enable_logger(logger)
+        try:
+            publisher = StockEventPublisher(client, coalesce_seconds=options["coalesce_seconds"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not publisher.enabled:
+            raise CommandError(
+                "No topics to publish to: set DATA_OUTPUT_STOCK_TOPIC, DATA_OUTPUT_LOW_STOCK_TOPIC "
+                "and/or DATA_OUTPUT_EXPIRY_TOPIC."
+            )
+
+        def _on_connect(_client, _userdata, _flags, rc):
+            if rc == 0:
+                logger.info("Connected to MQTT broker")
+            else:
+                logger.error("Failed to connect to MQTT broker: rc=%s", rc)
+
+        def _on_disconnect(_client, _userdata, rc):
+            if rc != 0:
+                # paho keeps queued QoS 1 messages and sends them once reconnected.
+                logger.warning("Lost the MQTT broker connection (rc=%s); reconnecting", rc)
+
+        def _graceful_exit(*_args):
+            logger.info("Shutting down MQTT publisher...")
+            publisher.stop()
+
+        signal.signal(signal.SIGTERM, _graceful_exit)
+        signal.signal(signal.SIGINT, _graceful_exit)
+
+        client.on_connect = _on_connect
+        client.on_disconnect = _on_disconnect
+
+        logger.info(
+            "Starting data_output publisher | host=%s port=%s stock=%s low_stock=%s expiry=%s coalesce=%ss",
+            options["host"],
+            options["port"],
+            publisher.stock_topic or "-",
+            publisher.alert_topics[Alert.TYPE_LOW_STOCK] or "-",
+            publisher.alert_topics[Alert.TYPE_EXPIRED_LOT] or "-",
+            publisher.coalesce_seconds,
+        )
+
+        client.connect(options["host"], options["port"])
+        client.loop_start()
+        try:
+            publisher.sync()
+            publisher.run(options["stats_interval"])
+        finally:
+            logger.info("Publisher stats: %s", publisher.stats_line())
+            client.disconnect()
+            client.loop_stop()
@@ -0,0 +1,370 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from difflib import SequenceMatcher
+from itertools import chain
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max
+
+from services.data_storage.models import ExportChange, Product
+
+
+logger = logging.getLogger(__name__)
+
+IndexedProduct = namedtuple("IndexedProduct", "id name product_code")
+# ``matched_on`` names the scorer that produced ``score``: name, tokens or code.
+Suggestion = namedtuple("Suggestion", "product score matched_on")
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+_FOLD_RE = re.compile(r"[\W_]+")
+
+# Posting entries counted per lookup before the remaining (commonest) trigrams are skipped.
+COUNTED_POSTINGS_BUDGET = 2000
+# Names ranked on all trigrams per scored candidate.
+SHORTLIST_FACTOR = 4
+
+
+def trigrams(text):
+    """Character trigrams of ``text``, padded so short strings still produce some."""
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def normalize_query(text):
+    """``text`` with case, whitespace and punctuation folded, as names and queries are compared."""
+    return _FOLD_RE.sub(" ", (text or "").lower()).strip()
+
+
+def normalize_code(code):
+    """Product code compared case-, punctuation- and zero-padding-insensitively.
+
+    GS1 scans carry the code zero-padded to 14 digits, as get_product_by_id
+    also renders it, while product_code is stored unpadded.
+    """
+    return "".join(_TOKEN_RE.findall(code.lower())).lstrip("0")
+
+
+def _word_score(words, other):
+    """Token-set similarity: the share of characters, on both sides, in words they have in common.
+
+    Word order and repeated words do not matter, so "Kit Bond Detection"
+    scores 1.0 against "Bond Detection Kit".
+    """
+    total = sum(map(len, words)) + sum(map(len, other))
+    return 2 * sum(map(len, words & other)) / total if total else 0.0
+
+
+class ProductMatcher:
+    """Fuzzy product lookup over an in-memory character-trigram index.
+
+    Product names and codes are loaded once; after that the index follows
+    the ExportChange log for Product (see data_storage.signals), so a
+    lookup never touches the database. Only the ``candidates`` products
+    sharing the most trigrams with a query, plus any whose normalized code
+    appears in it, are scored:
+
+    * name: SequenceMatcher ratio of the normalize_query forms;
+    * tokens: the share of characters in words both sides have, whatever
+      their order (see _word_score);
+    * code: 1.0 when a word of the query is the product code.
+
+    A candidate's score is the best of the three.
+
+    The last ``cache_size`` results are kept in an LRU cache keyed on the
+    normalized query. Every index change bumps ``version``, and a cached
+    result from an older version counts as a miss.
+    """
+
+    def __init__(self, threshold, candidates=None, cache_size=None):
+        self.threshold = threshold
+        self.candidates = candidates or getattr(settings, "DATA_OUTPUT_MATCH_CANDIDATES", 20)
+        if cache_size is None:
+            cache_size = getattr(settings, "DATA_OUTPUT_MATCH_CACHE_SIZE", 4096)
+        self.cache_size = cache_size
+        self.version = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+        # (normalized query, limit) -> (version, suggestions), least recently used first
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # product id -> (IndexedProduct, normalized name, name words, normalized code)
+        self._entries = {}
+        self._postings = {}
+        self._codes = {}
+        self._last_change_id = None
+        self._thread = None
+
+    # -- index maintenance ---------------------------------------------------
+
+    @staticmethod
+    def _grams(name, code):
+        return trigrams(name) | (trigrams(code) if code else set())
+
+    def _add(self, product):
+        name = normalize_query(product.name)
+        code = normalize_code(product.product_code)
+        self._entries[product.id] = (product, name, frozenset(_TOKEN_RE.findall(name)), code)
+        for gram in self._grams(name, code):
+            self._postings.setdefault(gram, set()).add(product.id)
+        if code:
+            self._codes.setdefault(code, set()).add(product.id)
+
+    @staticmethod
+    def _discard(index, key, product_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del index[key]
+
+    def _remove(self, product_id):
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        _, name, _, code = entry
+        for gram in self._grams(name, code):
+            self._discard(self._postings, gram, product_id)
+        if code:
+            self._discard(self._codes, code, product_id)
+
+    def load(self):
+        """Build the index from every Product."""
+        # Read the change log position first: changes racing the load are replayed by refresh().
+        last_change_id = (
+            ExportChange.objects.filter(model_name="Product").aggregate(high=Max("id"))["high"] or 0
+        )
+        rows = Product.objects.values_list("id", "name", "product_code").iterator()
+        products = [IndexedProduct(*row) for row in rows]
+        with self._lock:
+            self._entries, self._postings, self._codes = {}, {}, {}
+            for product in products:
+                self._add(product)
+            self._last_change_id = last_change_id
+            self.version += 1
+        return len(products)
+
+    def refresh(self):
+        """Apply Product saves and deletes logged since the last load or refresh.
+
+        Returns the number of products re-read or removed.
+        """
+        if self._last_change_id is None:
+            return self.load()
+        changes = list(
+            ExportChange.objects.filter(model_name="Product", id__gt=self._last_change_id)
+            .order_by("id")
+            .values_list("id", "object_id")
+        )
+        if not changes:
+            return 0
+        changed_ids = {object_id for _, object_id in changes}
+        # The current row is the truth whatever the logged action was; missing rows were deleted.
+        current = {
+            row[0]: IndexedProduct(*row)
+            for row in Product.objects.filter(id__in=changed_ids).values_list("id", "name", "product_code")
+        }
+        with self._lock:
+            for product_id in changed_ids:
+                self._remove(product_id)
+                if product_id in current:
+                    self._add(current[product_id])
+            self._last_change_id = changes[-1][0]
+            self.version += 1
+        return len(changed_ids)
+
+    def start_refresh(self, interval=None):
+        """Keep the index current from a daemon thread polling every ``interval`` seconds."""
+        interval = interval or getattr(settings, "DATA_OUTPUT_INDEX_REFRESH_SECONDS", 5.0)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="product-index-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                changed = self.refresh()
+            except DatabaseError:
+                logger.exception("Failed to refresh the product index")
+            else:
+                if changed:
+                    logger.info("Product index updated: %s products changed, %s indexed", changed, len(self))
+            finally:
+                close_old_connections()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -- result cache --------------------------------------------------------
+
+    def _cached(self, key):
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == self.version:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached[1]
+            self.cache_misses += 1
+            return None
+
+    def _store(self, key, version, suggestions):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = (version, suggestions)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cache_info(self):
+        """Result cache hits, misses, hit rate and entries since the matcher was made."""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+                "entries": len(self._cache),
+                "version": self.version,
+            }
+
+    # -- lookup --------------------------------------------------------------
+
+    def _candidates(self, text):
+        """Ids of the indexed products sharing the most trigrams with ``text``."""
+        postings = sorted(
+            (self._postings[gram] for gram in trigrams(text) if gram in self._postings), key=len
+        )
+        # Count hits over the rarest trigrams only; common ones ("ent", " an") add
+        # thousands of ids and little signal, so they just re-rank the shortlist.
+        counted, total = 0, 0
+        for ids in postings:
+            if counted and total + len(ids) > COUNTED_POSTINGS_BUDGET:
+                break
+            counted += 1
+            total += len(ids)
+        shared = Counter(chain.from_iterable(postings[:counted]))
+        shortlist = dict(shared.most_common(self.candidates * SHORTLIST_FACTOR))
+        for ids in postings[counted:]:
+            for product_id in ids.intersection(shortlist):
+                shortlist[product_id] += 1
+        return sorted(shortlist, key=shortlist.get, reverse=True)[:self.candidates]
+
+    def search(self, query, limit=None):
+        """Up to ``limit`` products most like ``query`` as Suggestions, best first."""
+        return self.search_many([query], limit)[0]
+
+    def search_many(self, queries, limit=None):
+        """Suggestions for each of ``queries``, in order.
+
+        Queries with the same normalize_query form are scored once. The
+        ones not in the result cache are then searched one by one, taking
+        the index lock once for the batch so every answer comes from the
+        same version of the index.
+        """
+        if self._last_change_id is None:
+            self.load()
+        limit = limit or getattr(settings, "DATA_OUTPUT_TOP_K", 5)
+        keys = [normalize_query(query) for query in queries]
+        results = {}
+        for key in keys:
+            if key not in results:
+                results[key] = self._cached((key, limit)) if key else ()
+        missing = [key for key, suggestions in results.items() if suggestions is None]
+        if missing:
+            with self._lock:
+                version = self.version
+                for key in missing:
+                    results[key] = self._search(key, limit)
+            for key in missing:
+                self._store((key, limit), version, results[key])
+        return [list(results[key]) for key in keys]
+
+    def _search(self, query, limit):
+        """Top ``limit`` Suggestions for an already normalized ``query``."""
+        words = frozenset(_TOKEN_RE.findall(query))
+        codes = {word.lstrip("0") for word in words} | {normalize_code(query)}
+        # Same argument order as the full name scan had.
+        name_sequence = SequenceMatcher(None)
+        name_sequence.set_seq1(query)
+        top = []  # min-heap of (score, -product id, matched_on), at most ``limit`` long
+
+        code_hits = set(chain.from_iterable(self._codes[code] for code in codes if code in self._codes))
+        candidates = list(code_hits)
+        candidates.extend(
+            product_id for product_id in self._candidates(query)
+            if product_id not in code_hits
+        )
+        for product_id in candidates:
+            _, name, name_words, _ = self._entries[product_id]
+            # A candidate has to beat the weakest entry of a full top-k.
+            floor = top[0][0] if len(top) == limit else 0.0
+            if product_id in code_hits:
+                score, matched_on = 1.0, "code"
+            else:
+                score, matched_on = _word_score(words, name_words), "tokens"
+                bound = max(score, floor)
+                name_sequence.set_seq2(name)
+                # Cheap upper bounds first; most candidates cannot beat the floor.
+                if name_sequence.real_quick_ratio() > bound and name_sequence.quick_ratio() > bound:
+                    name_score = name_sequence.ratio()
+                    if name_score > score:
+                        score, matched_on = name_score, "name"
+            if score <= floor:
+                continue
+            entry = (score, -product_id, matched_on)
+            if len(top) < limit:
+                heapq.heappush(top, entry)
+            else:
+                heapq.heapreplace(top, entry)
+
+        # A tuple, so callers cannot alter a cached result.
+        return tuple(
+            Suggestion(self._entries[-negated_id][0], score, matched_on)
+            for score, negated_id, matched_on in sorted(top, reverse=True)
+        )
+
+    def find(self, query):
+        """The best match and its score; the product is None below ``threshold``."""
+        suggestions = self.search(query, limit=1)
+        if not suggestions:
+            return None, 0.0
+        best = suggestions[0]
+        if best.score >= self.threshold:
+            return best.product, best.score
+        return None, best.score
+
+
+def suggestion_payload(suggestion):
+    """JSON-ready form of a Suggestion, shared by the MQTT response and the search endpoint."""
+    product = suggestion.product
+    return {
+        "id": product.id,
+        "name": product.name,
+        "product_code": product.product_code,
+        "score": round(suggestion.score * 100, 2),
+        "matched_on": suggestion.matched_on,
+    }
+
+
+_shared_matcher = None
+_shared_lock = threading.Lock()
+
+
+def shared_matcher():
+    """The process-wide matcher behind the HTTP search endpoint, kept current in the background."""
+    global _shared_matcher
+    with _shared_lock:
+        if _shared_matcher is None:
+            _shared_matcher = ProductMatcher(getattr(settings, "DATA_OUTPUT_FUZZY_THRESHOLD", 0.8))
+            _shared_matcher.start_refresh()
+        return _shared_matcher
@@ -0,0 +1,219 @@
+"""In-process metrics for the data_output listener.
+
+Counters and fixed-bucket histograms are cheap enough to update on every
+message. They are read three ways: a compact stats log line every few
+seconds, a Prometheus-style text page on a local HTTP port, and the same
+text written to a file.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "data_output_"
+
+COUNTERS = {
+    "messages_received": "Check messages taken off the broker.",
+    "messages_published": "Responses published (answers, busy replies and batch answers).",
+    "parse_failures": "Messages that were not UTF-8, or looked like JSON but did not parse.",
+    "checks": "Product names matched (a batch counts each item).",
+    "matches_found": "Checks answered with a product.",
+    "busy": "Checks shed with a busy reply because the queue was full.",
+    "dropped": "Checks shed without a reply because the queue was full.",
+    "errors": "Messages whose handling raised an exception.",
+    "connects": "Successful connections to the broker.",
+    "reconnects": "Connections after the first, i.e. recoveries from a lost connection.",
+    "disconnects": "Connections to the broker that ended.",
+}
+
+HISTOGRAMS = {
+    "match_latency_ms": (
+        "Time to match one message, in milliseconds.",
+        (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+    ),
+    "queue_wait_ms": (
+        "Time a message waited for a worker, in milliseconds.",
+        (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+    ),
+    "match_score": (
+        "Best match score per check, 0-100.",
+        (10, 20, 30, 40, 50, 60, 70, 80, 90, 100),
+    ),
+}
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        # One count per bound plus an overflow bucket.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile (None when empty)."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class ListenerMetrics:
+    """Thread-safe counters, histograms and gauges for one listener process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {name: Histogram(bounds) for name, (_, bounds) in HISTOGRAMS.items()}
+        self.gauges = {}
+        self.log_sample_rate = getattr(settings, "DATA_OUTPUT_LOG_SAMPLE_RATE", 0.01)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, name, value):
+        with self._lock:
+            self.histograms[name].observe(value)
+
+    def gauge(self, name, read, help_text):
+        """Report ``read()`` as a gauge whenever metrics are read."""
+        self.gauges[name] = (read, help_text)
+
+    def sampled(self):
+        """Whether this message's per-message log lines should be written."""
+        return self.log_sample_rate >= 1 or random.random() < self.log_sample_rate
+
+    # -- reading -------------------------------------------------------------
+
+    def _gauge_values(self):
+        values = {}
+        for name, (read, _) in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                values[name] = None
+        return values
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format."""
+        gauges = self._gauge_values()
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {
+                name: (histogram.bounds, list(histogram.counts), histogram.total, histogram.count)
+                for name, histogram in self.histograms.items()
+            }
+        lines = []
+        for name, value in counters.items():
+            lines += [f"# HELP {METRIC_PREFIX}{name}_total {COUNTERS[name]}",
+                      f"# TYPE {METRIC_PREFIX}{name}_total counter",
+                      f"{METRIC_PREFIX}{name}_total {value}"]
+        for name, (bounds, counts, total, count) in histograms.items():
+            lines += [f"# HELP {METRIC_PREFIX}{name} {HISTOGRAMS[name][0]}",
+                      f"# TYPE {METRIC_PREFIX}{name} histogram"]
+            cumulative = 0
+            for bound, bucket in zip(bounds + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f'{METRIC_PREFIX}{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{METRIC_PREFIX}{name}_sum {total:.3f}", f"{METRIC_PREFIX}{name}_count {count}"]
+        for name, value in gauges.items():
+            if value is not None:
+                lines += [f"# HELP {METRIC_PREFIX}{name} {self.gauges[name][1]}",
+                          f"# TYPE {METRIC_PREFIX}{name} gauge",
+                          f"{METRIC_PREFIX}{name} {value}"]
+        lines.append(f"{METRIC_PREFIX}uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def stats_line(self, previous=None, interval=None):
+        """Compact one-line summary; with the ``previous`` counters, rates over ``interval`` too."""
+        gauges = self._gauge_values()
+        with self._lock:
+            counters = dict(self.counters)
+            latency = self.histograms["match_latency_ms"]
+            wait = self.histograms["queue_wait_ms"]
+            p50, p95, wait_p95 = latency.quantile(0.5), latency.quantile(0.95), wait.quantile(0.95)
+        rate = ""
+        if previous is not None and interval:
+            rate = f" ({(counters['messages_received'] - previous['messages_received']) / interval:.1f}/s)"
+        hit_rate = counters["matches_found"] / counters["checks"] if counters["checks"] else 0.0
+        return (
+            f"rx={counters['messages_received']}{rate} tx={counters['messages_published']} "
+            f"checks={counters['checks']} hit={hit_rate:.0%} parse_fail={counters['parse_failures']} "
+            f"busy={counters['busy']} dropped={counters['dropped']} errors={counters['errors']} "
+            f"queue={gauges.get('queue_depth')} match_p50<={p50}ms p95<={p95}ms wait_p95<={wait_p95}ms "
+            f"cache_hit={gauges.get('match_cache_hit_rate') or 0:.0%} reconnects={counters['reconnects']}"
+        ), counters
+
+    # -- exposure ------------------------------------------------------------
+
+    def start_reporting(self, interval=None, metrics_file=None):
+        """Log a stats line, and rewrite ``metrics_file`` if set, every ``interval`` seconds."""
+        interval = interval or getattr(settings, "DATA_OUTPUT_STATS_SECONDS", 60)
+        metrics_file = metrics_file if metrics_file is not None else getattr(settings, "DATA_OUTPUT_METRICS_FILE", "")
+
+        def _report():
+            previous = None
+            while True:
+                time.sleep(interval)
+                line, previous = self.stats_line(previous, interval)
+                logger.info("Listener stats: %s", line)
+                if metrics_file:
+                    try:
+                        with open(f"{metrics_file}.tmp", "w", encoding="utf-8") as out:
+                            out.write(self.render())
+                        os.replace(f"{metrics_file}.tmp", metrics_file)
+                    except OSError:
+                        logger.exception("Failed to write metrics to %s", metrics_file)
+
+        threading.Thread(target=_report, name="data-output-stats", daemon=True).start()
+
+    def serve(self, port=None, host="127.0.0.1"):
+        """Serve ``/metrics`` over HTTP on a local port; returns the server, or None if disabled."""
+        port = getattr(settings, "DATA_OUTPUT_METRICS_PORT", 0) if port is None else port
+        if not port:
+            return None
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            logger.exception("Metrics endpoint not started: cannot listen on %s:%s", host, port)
+            return None
+        threading.Thread(target=server.serve_forever, name="data-output-metrics", daemon=True).start()
+        logger.info("Serving listener metrics on http://%s:%s/metrics", host, port)
+        return server
@@ -0,0 +1,256 @@
+"""Outbound stock events for devices on the MQTT network.
+
+StockEventPublisher follows the StockEvent log behind the live feed and
+keeps one retained message per lot, per low-stock product and per
+expired lot on the broker. Shelf displays and lift terminals subscribe
+once and get the last value straight away, instead of polling the web app.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.db.models import DecimalField, Max, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from services.data_storage.models import Alert, ProductItem, StockEvent
+
+
+logger = logging.getLogger(__name__)
+
+# StockEvent rows read per query while catching up.
+POLL_BATCH = 500
+
+# Open brokers anyone can subscribe to; retained inventory data must not go there.
+PUBLIC_BROKERS = ("broker.hivemq.com", "test.mosquitto.org", "broker.emqx.io", "mqtt.eclipseprojects.io")
+
+
+def _current_lots():
+    """Every lot in the shape of live_feed.lot_event_payload, from two queries."""
+    totals = {
+        product_id: (total_stock, remaining_parts)
+        for product_id, total_stock, remaining_parts in ProductItem.objects.values("product_id")
+        .annotate(
+            total_stock=Coalesce(Sum("current_stock"), Value(0), output_field=DecimalField()),
+            remaining_parts=Coalesce(Sum("accumulated_partial"), Value(0)),
+        )
+        .order_by()
+        .values_list("product_id", "total_stock", "remaining_parts")
+    }
+    rows = ProductItem.objects.values_list("id", "product_id", "lot_number", "current_stock").iterator()
+    for item_id, product_id, lot_number, current_stock in rows:
+        total_stock, remaining_parts = totals[product_id]
+        yield {
+            "product_item_id": item_id,
+            "product_id": product_id,
+            "lot_number": lot_number,
+            "quantity": str(current_stock),
+            "deleted": False,
+            "product_total_stock": str(total_stock),
+            "product_full_items": int(total_stock),
+            "product_remaining_parts": remaining_parts,
+        }
+
+
+def _check_topic(setting, topic):
+    try:
+        topic.format(product_id=0, product_item_id=0)
+    except (KeyError, IndexError, ValueError) as exc:
+        raise ValueError(
+            f"{setting} '{topic}' may only use the {{product_id}} and {{product_item_id}} fields."
+        ) from exc
+    return topic
+
+
+class StockEventPublisher:
+    """Mirrors stock levels, low-stock alerts and expired lots onto retained MQTT topics.
+
+    Lot changes are read from the StockEvent log with one indexed
+    ``id > last_id`` query per poll. Changes to one lot are coalesced: the
+    first opens a ``coalesce_seconds`` window and only the latest state is
+    published when it closes. A deleted lot clears its retained message.
+    Alert events trigger a resync of open low-stock and expired-lot
+    alerts; a newly open alert is published and a resolved one cleared.
+    An empty topic, the default, turns that kind of message off. The
+    client is any object with paho's ``publish`` method.
+    """
+
+    def __init__(self, client, stock_topic=None, low_stock_topic=None, expiry_topic=None,
+                 coalesce_seconds=None, poll_interval=None):
+        self.client = client
+        self.stock_topic = _check_topic(
+            "DATA_OUTPUT_STOCK_TOPIC",
+            settings.DATA_OUTPUT_STOCK_TOPIC if stock_topic is None else stock_topic,
+        )
+        self.alert_topics = {
+            Alert.TYPE_LOW_STOCK: _check_topic(
+                "DATA_OUTPUT_LOW_STOCK_TOPIC",
+                settings.DATA_OUTPUT_LOW_STOCK_TOPIC if low_stock_topic is None else low_stock_topic,
+            ),
+            Alert.TYPE_EXPIRED_LOT: _check_topic(
+                "DATA_OUTPUT_EXPIRY_TOPIC",
+                settings.DATA_OUTPUT_EXPIRY_TOPIC if expiry_topic is None else expiry_topic,
+            ),
+        }
+        if coalesce_seconds is None:
+            coalesce_seconds = getattr(settings, "DATA_OUTPUT_PUBLISH_COALESCE_SECONDS", 2.0)
+        self.coalesce_seconds = coalesce_seconds
+        self.poll_interval = poll_interval or getattr(settings, "DATA_OUTPUT_PUBLISH_POLL_SECONDS", 1.0)
+        self._last_id = None
+        # product_item_id -> (monotonic time the window closes, latest lot payload)
+        self._pending = {}
+        # alert topic -> JSON last published there (None: to be cleared unless still open)
+        self._alert_messages = {}
+        self._stopped = threading.Event()
+        self.enabled = bool(self.stock_topic or any(self.alert_topics.values()))
+        self.counts = dict.fromkeys(("events", "coalesced", "lot_messages", "alert_messages", "cleared"), 0)
+
+    # -- publishing ----------------------------------------------------------
+
+    def _publish(self, topic, payload):
+        """Publish ``payload`` as the retained value of ``topic``; None clears it."""
+        if payload is None:
+            self.counts["cleared"] += 1
+            self.client.publish(topic, b"", qos=1, retain=True)
+        else:
+            self.client.publish(topic, payload, qos=1, retain=True)
+
+    def _publish_lot(self, payload):
+        if not self.stock_topic:
+            return
+        self.counts["lot_messages"] += 1
+        topic = self.stock_topic.format(**payload)
+        self._publish(topic, None if payload["deleted"] else json.dumps(payload, cls=DjangoJSONEncoder))
+
+    def sync(self):
+        """Publish every lot and open alert, e.g. on start when events may have been missed.
+
+        Alert topics resolved within LIVE_FEED_RETENTION_HOURS are cleared
+        too, in case the publisher was down when they resolved.
+        """
+        # Read the log position first: events racing the snapshot are replayed by poll().
+        self._last_id = StockEvent.objects.aggregate(high=Max("id"))["high"] or 0
+        self._pending = {}
+        lots = 0
+        if self.stock_topic:
+            for payload in _current_lots():
+                self._publish_lot(payload)
+                lots += 1
+        cutoff = timezone.now() - timedelta(hours=getattr(settings, "LIVE_FEED_RETENTION_HOURS", 24))
+        recently_resolved = Alert.objects.filter(resolved_at__gte=cutoff)
+        self._alert_messages = {topic: None for topic in self._alert_rows(recently_resolved)}
+        self.sync_alerts()
+        logger.info(
+            "Published %s lots and %s open alerts", lots, sum(1 for value in self._alert_messages.values() if value)
+        )
+
+    def _alert_rows(self, alerts):
+        """``{topic: payload}`` for the low-stock and expired-lot alerts in ``alerts`` with a topic set."""
+        enabled = [alert_type for alert_type, topic in self.alert_topics.items() if topic]
+        rows = alerts.filter(alert_type__in=enabled).values(
+            "alert_type", "subject", "message", "first_seen_at", "product_id", "product_item_id",
+            "product_item__lot_number", "product_item__expiry_date",
+        )
+        messages = {}
+        for row in rows:
+            expired = row["alert_type"] == Alert.TYPE_EXPIRED_LOT
+            # The product or lot behind the alert has been deleted; the next sweep resolves it.
+            if row["product_id"] is None or (expired and row["product_item_id"] is None):
+                continue
+            payload = {
+                "alert_type": row["alert_type"],
+                "product_id": row["product_id"],
+                "product_item_id": row["product_item_id"],
+                "subject": row["subject"],
+                "message": row["message"],
+                "since": row["first_seen_at"],
+            }
+            if expired:
+                payload["lot_number"] = row["product_item__lot_number"]
+                payload["expiry_date"] = row["product_item__expiry_date"]
+            topic = self.alert_topics[row["alert_type"]].format(**payload)
+            messages[topic] = json.dumps(payload, cls=DjangoJSONEncoder)
+        return messages
+
+    def sync_alerts(self):
+        """Publish alerts that opened or changed since the last sync and clear resolved ones."""
+        current = self._alert_rows(Alert.objects.filter(resolved_at__isnull=True))
+        for topic, message in current.items():
+            if self._alert_messages.get(topic) != message:
+                self.counts["alert_messages"] += 1
+                self._publish(topic, message)
+        for topic in self._alert_messages.keys() - current.keys():
+            self._publish(topic, None)
+        self._alert_messages = current
+
+    # -- following the event log ---------------------------------------------
+
+    def poll(self):
+        """Queue lot changes logged since the last poll and resync alerts if they changed."""
+        if self._last_id is None:
+            self.sync()
+        alerts_changed = False
+        while True:
+            events = list(
+                StockEvent.objects.filter(id__gt=self._last_id)
+                .order_by("id")
+                .values_list("id", "event_type", "payload")[:POLL_BATCH]
+            )
+            for _, event_type, payload in events:
+                self.counts["events"] += 1
+                if event_type == StockEvent.TYPE_LOT:
+                    self._queue_lot(json.loads(payload))
+                elif event_type == StockEvent.TYPE_ALERT:
+                    alerts_changed = True
+            if events:
+                self._last_id = events[-1][0]
+            if len(events) < POLL_BATCH:
+                break
+        if alerts_changed:
+            self.sync_alerts()
+
+    def _queue_lot(self, payload):
+        item_id = payload["product_item_id"]
+        if item_id in self._pending:
+            self.counts["coalesced"] += 1
+            due = self._pending[item_id][0]
+        else:
+            due = time.monotonic() + self.coalesce_seconds
+        self._pending[item_id] = (due, payload)
+
+    def flush(self, force=False):
+        """Publish the lots whose coalescing window has closed (all of them with ``force``)."""
+        now = time.monotonic()
+        due = [item_id for item_id, (closes_at, _) in self._pending.items() if force or closes_at <= now]
+        for item_id in due:
+            self._publish_lot(self._pending.pop(item_id)[1])
+        return len(due)
+
+    def run(self, stats_interval=None):
+        """Poll and publish until stop() is called; pending lots are flushed on the way out."""
+        stats_interval = stats_interval or getattr(settings, "DATA_OUTPUT_STATS_SECONDS", 60)
+        next_stats = time.monotonic() + stats_interval
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Failed to poll stock events")
+            finally:
+                close_old_connections()
+            self.flush()
+            if time.monotonic() >= next_stats:
+                next_stats += stats_interval
+                logger.info("Publisher stats: %s", self.stats_line())
+            self._stopped.wait(self.poll_interval)
+        self.flush(force=True)
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats_line(self):
+        return " ".join(f"{name}={value}" for name, value in self.counts.items()) + f" pending={len(self._pending)}"
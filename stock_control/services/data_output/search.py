@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from services.data_output.matcher import shared_matcher, suggestion_payload
+
+# Most suggestions one search request may ask for.
+SEARCH_MAX_LIMIT = 50
+
+
+@login_required
+def product_search(request):
+    """Ranked product suggestions for ``q`` from the same matcher as the MQTT listener."""
+    query = (request.GET.get("q") or "").strip()
+    if not query:
+        return JsonResponse({"error": "No query provided"}, status=400)
+    try:
+        limit = int(request.GET.get("limit") or getattr(settings, "DATA_OUTPUT_TOP_K", 5))
+    except ValueError:
+        return JsonResponse({"error": "limit must be a whole number"}, status=400)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+
+    suggestions = shared_matcher().search(query, limit=limit)
+    return JsonResponse({
+        "query": query,
+        "results": [suggestion_payload(suggestion) for suggestion in suggestions],
+    })
@@ -0,0 +1,6 @@
+from django.urls import path
+from services.data_output.search import product_search
+
+urlpatterns = [
+    path("products/search/", product_search, name="product_search"),
+]
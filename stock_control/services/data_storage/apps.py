@@ -4,3 +4,6 @@ class DataStorageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services.data_storage'
     label = 'data_storage'
+
+    def ready(self):
+        from services.data_storage import signals  # noqa: F401
@@ -0,0 +1,99 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.forecasting.backtesting import (
+    backtest_products,
+    run_backtests,
+    select_model,
+    summarise,
+    synthetic_series,
+)
+from services.forecasting.forecasters import FORECASTERS
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest SMA_7, SMA_14, Holt, Croston/SBA and seasonal-naive forecasts with "
+        "rolling-origin evaluation, report MASE, bias and fit time per model, and store "
+        "the cheapest model meeting the accuracy bar for each product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            dest="product_ids",
+            action="append",
+            type=int,
+            help="Only backtest this product id (repeatable). Defaults to all products.",
+        )
+        parser.add_argument(
+            "--model",
+            dest="model_names",
+            action="append",
+            choices=list(FORECASTERS),
+            help="Only evaluate this model (repeatable). Defaults to all models.",
+        )
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU core).")
+        parser.add_argument("--history-days", type=int, default=None, help="Days of history (default: FORECAST_HISTORY_DAYS).")
+        parser.add_argument("--horizon", type=int, default=7, help="Days forecast from each origin (default: 7).")
+        parser.add_argument("--origins", type=int, default=8, help="Forecast origins per product (default: 8).")
+        parser.add_argument("--step", type=int, default=7, help="Days between origins (default: 7).")
+        parser.add_argument("--mase-bar", type=float, default=None, help="Accuracy bar (default: FORECAST_MASE_BAR).")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report results without storing the selected models.",
+        )
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            metavar="PRODUCTS",
+            help="Benchmark on this many seeded synthetic series instead of the database (never stored).",
+        )
+        parser.add_argument("--synthetic-days", type=int, default=730, help="Length of synthetic series (default: 730).")
+
+    def handle(self, *args, **options):
+        for name in ("workers", "history_days", "horizon", "origins", "step"):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be a positive number.")
+
+        evaluation = {
+            "horizon": options["horizon"],
+            "origins": options["origins"],
+            "step": options["step"],
+            "model_names": options["model_names"],
+            "workers": options["workers"],
+        }
+        if options["synthetic"]:
+            started = time.perf_counter()
+            results = run_backtests(
+                synthetic_series(options["synthetic"], options["synthetic_days"]), **evaluation
+            )
+            mase_bar = settings.FORECAST_MASE_BAR if options["mase_bar"] is None else options["mase_bar"]
+            selections = {product_id: select_model(metrics, mase_bar) for product_id, metrics in results}
+            summary = {
+                "products": len(results),
+                "models": summarise(results, selections),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        else:
+            summary = backtest_products(
+                history_days=options["history_days"],
+                product_ids=options["product_ids"],
+                mase_bar=options["mase_bar"],
+                store=not options["dry_run"],
+                **evaluation,
+            )
+
+        self.stdout.write(f"{'model':<16}{'median MASE':>12}{'mean bias':>12}{'fit ms':>10}{'selected':>10}")
+        for name, row in summary["models"].items():
+            median_mase = "-" if row["median_mase"] is None else f"{row['median_mase']:.3f}"
+            self.stdout.write(
+                f"{name:<16}{median_mase:>12}{row['mean_bias']:>12.3f}{row['mean_fit_ms']:>10.3f}{row['selected']:>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Backtested {summary['products']} products in {summary['elapsed_ms']:.1f} ms."
+        ))
@@ -0,0 +1,123 @@
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.reporting.reporting import write_excel
+
+HEADER = [
+    "id", "product_item", "quantity", "withdrawal_type", "timestamp", "user",
+    "barcode", "parts_withdrawn", "product_code", "product_name", "lot_number", "expiry_date",
+]
+
+
+def synthetic_rows(count):
+    """Withdrawal-shaped export rows, generated on the fly."""
+    start = datetime.datetime(2024, 1, 1, 8, 0)
+    for index in range(count):
+        product = index % 500
+        yield [
+            count - index,
+            f"Reagent {product} (Lot L{product}-{index % 3})",
+            index % 7 + 1,
+            "unit",
+            start + datetime.timedelta(minutes=index),
+            f"user{index % 25}",
+            None,
+            0,
+            f"P{product:04d}",
+            f"Reagent {product}",
+            f"L{product}-{index % 3}",
+            datetime.date(2026, 1, 1) + datetime.timedelta(days=product),
+        ]
+
+
+def _write_legacy(path, rows):
+    """The previous export: every cell as str() in an in-memory workbook."""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(HEADER)
+    for row in rows:
+        ws.append([str(value) for value in row])
+    wb.save(path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the Excel report export on synthetic withdrawal rows. Each run happens "
+        "in a fresh process and reports wall time, peak RSS and file size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[100000, 1000000],
+            help="Row counts to export (default: 100000 1000000).",
+        )
+        parser.add_argument(
+            "--rows-per-sheet",
+            type=int,
+            default=None,
+            help="Split exports across sheets of this many rows (default: EXPORT_EXCEL_ROWS_PER_SHEET).",
+        )
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Also run the previous in-memory, all-text export for comparison.",
+        )
+        parser.add_argument(
+            "--run",
+            choices=["streaming", "legacy"],
+            help="Internal: run one export in this process and print its measurements as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        if any(count < 0 for count in options["rows"]):
+            raise CommandError("--rows must not be negative.")
+
+        if options["run"]:
+            count = options["rows"][0]
+            with tempfile.NamedTemporaryFile(suffix=".xlsx") as out:
+                started = time.perf_counter()
+                if options["run"] == "legacy":
+                    _write_legacy(out.name, synthetic_rows(count))
+                else:
+                    write_excel(out.name, "Withdrawal", HEADER, synthetic_rows(count),
+                                rows_per_sheet=options["rows_per_sheet"])
+                elapsed = time.perf_counter() - started
+                size = os.path.getsize(out.name)
+            # ru_maxrss is reported in kilobytes on Linux.
+            self.stdout.write(json.dumps({
+                "seconds": round(elapsed, 2),
+                "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "size_mb": round(size / 1024 / 1024, 1),
+            }))
+            return
+
+        manage_py = os.path.join(settings.BASE_DIR, "manage.py")
+        modes = ["streaming", "legacy"] if options["legacy"] else ["streaming"]
+        self.stdout.write(f"{'mode':<11}{'rows':>10}{'seconds':>10}{'peak RSS':>12}{'file':>10}")
+        for count in options["rows"]:
+            for mode in modes:
+                command = [sys.executable, manage_py, "benchmark_exports", "--run", mode, "--rows", str(count)]
+                if options["rows_per_sheet"]:
+                    command += ["--rows-per-sheet", str(options["rows_per_sheet"])]
+                completed = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+                if completed.returncode != 0:
+                    raise CommandError(f"{mode} export of {count} rows failed:\n{completed.stderr}")
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{mode:<11}{count:>10}{result['seconds']:>9.2f}s"
+                    f"{result['rss_mb']:>9.1f} MB{result['size_mb']:>7.1f} MB"
+                )
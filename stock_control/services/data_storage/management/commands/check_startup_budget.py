@@ -0,0 +1,116 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command, load_command_class
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that only forecasting and Excel export paths should load.
+HEAVY_MODULES = ("numpy", "pandas", "scipy", "statsmodels")
+
+
+def _probe_check():
+    call_command("check", verbosity=0)
+
+
+def _probe_web():
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+
+    get_wsgi_application()
+    # Resolving the URL patterns imports every view module, as the first request would.
+    get_resolver().url_patterns
+
+
+def _probe_listener():
+    load_command_class("services.data_output", "data_output_listener")
+
+
+def _probe_publisher():
+    load_command_class("services.data_output", "data_output_publisher")
+
+
+PROBES = {
+    "check": _probe_check,
+    "web": _probe_web,
+    "listener": _probe_listener,
+    "publisher": _probe_publisher,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh processes for `manage.py check`, a web worker and the data_output "
+        "listener and publisher, and fail if any exceeds its start-up time or peak RSS budget or loads "
+        "the scientific stack (numpy/pandas/scipy/statsmodels)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--probe",
+            choices=sorted(PROBES),
+            help=(
+                "Internal: run one probe in this process and print its measurements "
+                "as JSON. Without it every probe runs in its own subprocess."
+            ),
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=float,
+            default=None,
+            help="Start-up time budget per process (default: STARTUP_BUDGET_SECONDS).",
+        )
+        parser.add_argument(
+            "--max-rss-mb",
+            type=float,
+            default=None,
+            help="Peak RSS budget per process in MB (default: STARTUP_BUDGET_RSS_MB).",
+        )
+
+    def handle(self, *args, **options):
+        if options["probe"]:
+            PROBES[options["probe"]]()
+            # ru_maxrss is reported in kilobytes on Linux.
+            self.stdout.write(json.dumps({
+                "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+            }))
+            return
+
+        max_seconds = options["max_seconds"] or settings.STARTUP_BUDGET_SECONDS
+        max_rss_mb = options["max_rss_mb"] or settings.STARTUP_BUDGET_RSS_MB
+        manage_py = os.path.join(settings.BASE_DIR, "manage.py")
+
+        failures = []
+        for name in sorted(PROBES):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, manage_py, "check_startup_budget", "--probe", name],
+                capture_output=True,
+                text=True,
+                env=os.environ.copy(),
+            )
+            elapsed = time.perf_counter() - started
+            if completed.returncode != 0:
+                raise CommandError(f"Probe '{name}' failed:\n{completed.stderr}")
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+            problems = []
+            if elapsed > max_seconds:
+                problems.append(f"took {elapsed:.2f}s (budget {max_seconds:.2f}s)")
+            if result["rss_mb"] > max_rss_mb:
+                problems.append(f"peak RSS {result['rss_mb']:.1f} MB (budget {max_rss_mb:.1f} MB)")
+            if result["heavy_modules"]:
+                problems.append(f"loaded {', '.join(result['heavy_modules'])}")
+
+            status = "FAIL" if problems else "ok"
+            self.stdout.write(f"{name:<10}{elapsed:>8.2f}s{result['rss_mb']:>9.1f} MB  {status}")
+            failures.extend(f"{name}: {problem}" for problem in problems)
+
+        if failures:
+            raise CommandError("Start-up budget exceeded:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All processes within the start-up budget."))
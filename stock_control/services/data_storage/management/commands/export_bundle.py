@@ -0,0 +1,68 @@
+import datetime
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.reporting.bundles import BUNDLE_FORMATS, BUNDLE_MODELS, available_bundle_models, write_bundle
+
+
+class Command(BaseCommand):
+    help = (
+        "Write withdrawals, registrations, PO completion logs, location stocks and QC checks "
+        "for a date range into one ZIP, one CSV/Parquet/Feather file per model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the ZIP file to write.")
+        parser.add_argument(
+            "--model",
+            dest="models",
+            action="append",
+            choices=sorted(BUNDLE_MODELS),
+            help="Include this model (repeatable). Defaults to every installed one.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(BUNDLE_FORMATS),
+            default="csv",
+            help="File format inside the ZIP (default: csv). Parquet and Feather need pyarrow.",
+        )
+        parser.add_argument("--start-date", help="First day to include (YYYY-MM-DD).")
+        parser.add_argument("--end-date", help="Last day to include (YYYY-MM-DD).")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Models written in parallel (default: one thread per model).",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("start_date", "end_date"):
+            if options[name]:
+                try:
+                    datetime.datetime.strptime(options[name], "%Y-%m-%d")
+                except ValueError:
+                    raise CommandError(f"--{name.replace('_', '-')} must be in YYYY-MM-DD format.")
+        if options["workers"] is not None and options["workers"] <= 0:
+            raise CommandError("--workers must be a positive number.")
+
+        started = time.perf_counter()
+        try:
+            rows = write_bundle(
+                options["output"],
+                options["models"] or available_bundle_models(),
+                options["format"],
+                options["start_date"],
+                options["end_date"],
+                workers=options["workers"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for name, count in rows.items():
+            self.stdout.write(f"{name:<17}{count:>10} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['output']} ({os.path.getsize(options['output']) / 1024 / 1024:.2f} MB) "
+            f"in {time.perf_counter() - started:.2f}s."
+        ))
@@ -0,0 +1,79 @@
+import logging
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.reporting.deltas import DELTA_FORMATS, DELTA_MODELS, export_delta, prune_export_changes
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the Withdrawal, PurchaseOrder or Product rows created, changed or deleted since a "
+        "consumer's last run, as CSV or JSON lines, and advance its watermark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("consumer", help="Name of the consuming system, e.g. 'erp'.")
+        parser.add_argument("model", choices=DELTA_MODELS, help="Model to export.")
+        parser.add_argument(
+            "--format",
+            choices=DELTA_FORMATS,
+            default="csv",
+            help="Output format (default: csv).",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write (default: standard output).",
+        )
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="Write every current row instead of the changes, then continue deltas from here.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Write the export without moving the watermark.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["consumer"].strip():
+            raise CommandError("consumer must not be empty.")
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+        out = sys.stdout if options["output"] == "-" else open(options["output"], "w", newline="", encoding="utf-8")
+        try:
+            # export_delta saves the watermark only after the last record is written.
+            summary = export_delta(
+                out,
+                options["consumer"],
+                options["model"],
+                file_format=options["format"],
+                snapshot=options["snapshot"],
+                commit=not options["dry_run"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        logger.info(
+            "%s %s for %s: changes %s-%s, %s upserts, %s deletes%s",
+            "Snapshot" if summary["snapshot"] else "Delta",
+            summary["model"],
+            summary["consumer"],
+            summary["from_change"],
+            summary["to_change"],
+            summary["upserts"],
+            summary["deletes"],
+            " (dry run, watermark unchanged)" if options["dry_run"] else "",
+        )
+        if not options["dry_run"]:
+            pruned = prune_export_changes()
+            if pruned:
+                logger.info("Pruned %s change log entries read by every consumer", pruned)
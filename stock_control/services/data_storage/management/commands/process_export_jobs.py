@@ -0,0 +1,79 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from services.reporting.export_jobs import process_export_jobs, purge_expired_exports, requeue_stale_jobs
+from services.reporting.report_cache import prune_artifacts, run_due_schedules
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate queued report exports (ExportJob) on a thread pool and store the files "
+        "for download from the My Exports page, and refresh due report schedules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker threads (default: EXPORT_WORKERS).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for queued jobs every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=5,
+            help="Seconds between polls when --loop is set (default: 5).",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] is not None and options["workers"] <= 0:
+            raise CommandError("--workers must be a positive number.")
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be a positive number of seconds.")
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+        while True:
+            try:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    logger.warning("Requeued %s export jobs left running by a stopped worker", requeued)
+                purged = purge_expired_exports() + prune_artifacts()
+                if purged:
+                    logger.info("Removed %s expired exports", purged)
+                schedules = run_due_schedules()
+                if any(schedules.values()):
+                    logger.info(
+                        "Report schedules: %s generated, %s unchanged since the last data change, %s failed",
+                        schedules["generated"],
+                        schedules["unchanged"],
+                        schedules["failed"],
+                    )
+                started = time.perf_counter()
+                summary = process_export_jobs(workers=options["workers"])
+            except DatabaseError:
+                if not options["loop"]:
+                    raise
+                logger.exception("Export run failed")
+            else:
+                if summary["done"] or summary["failed"] or not options["loop"]:
+                    logger.info(
+                        "Export run finished in %.1f ms: %s ready, %s failed",
+                        (time.perf_counter() - started) * 1000,
+                        summary["done"],
+                        summary["failed"],
+                    )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
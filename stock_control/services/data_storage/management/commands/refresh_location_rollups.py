@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from services.location_rollups.location_rollups import refresh_location_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-location stock rollups used by location-scoped dashboards."
+
+    def handle(self, *args, **options):
+        rows = refresh_location_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} location rollup rows."))
@@ -0,0 +1,90 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from services.forecasting.forecasting import run_forecasts
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit a demand forecast for every product in parallel worker processes and "
+        "store forecasts, run-out dates and reorder dates in the ForecastResult table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            dest="product_ids",
+            action="append",
+            type=int,
+            help="Only forecast this product id (repeatable). Defaults to all products.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes (default: FORECAST_WORKERS, or one per CPU core).",
+        )
+        parser.add_argument(
+            "--history-days",
+            type=int,
+            default=None,
+            help="Days of withdrawal history to fit on (default: FORECAST_HISTORY_DAYS).",
+        )
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=None,
+            help="Days to forecast ahead (default: FORECAST_HORIZON_DAYS).",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and refit every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=86400,
+            help="Seconds between runs when --loop is set (default: 86400).",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("workers", "history_days", "horizon"):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be a positive number.")
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be a positive number of seconds.")
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+        while True:
+            try:
+                summary = run_forecasts(
+                    history_days=options["history_days"],
+                    horizon=options["horizon"],
+                    workers=options["workers"],
+                    product_ids=options["product_ids"],
+                )
+            except DatabaseError:
+                if not options["loop"]:
+                    raise
+                logger.exception("Forecast run failed")
+            else:
+                logger.info(
+                    "Forecast run finished in %.1f ms: %s products (%s refitted on %s workers, %s updated incrementally) | %s",
+                    summary["elapsed_ms"],
+                    summary["products"],
+                    summary["full_refits"],
+                    summary["workers"],
+                    summary["incremental"],
+                    ", ".join(f"{name}={count}" for name, count in sorted(summary["models"].items())),
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
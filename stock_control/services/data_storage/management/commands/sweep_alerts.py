@@ -0,0 +1,70 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from services.alerts.alerts import ALERT_DETECTORS, sweep_alerts
+from services.live_feed.live_feed import prune_stock_events
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute inventory alerts (low stock, expired lots, delayed POs, missing "
+        "thresholds, duplicate names) and store them in the Alert table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            dest="alert_types",
+            action="append",
+            choices=sorted(ALERT_DETECTORS.keys()),
+            help="Only sweep this alert type (repeatable). Defaults to all types.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and sweep every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=300,
+            help="Seconds between sweeps when --loop is set (default: 300).",
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("--interval must be a positive number of seconds.")
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+        while True:
+            started = time.perf_counter()
+            try:
+                summary = sweep_alerts(options["alert_types"])
+                pruned = prune_stock_events()
+            except DatabaseError:
+                # A concurrent post-commit sweep may have opened the same alert; retry next round.
+                if not options["loop"]:
+                    raise
+                logger.exception("Alert sweep failed")
+                time.sleep(options["interval"])
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                "Alert sweep finished in %.1f ms (pruned %s live feed events) | %s",
+                elapsed_ms,
+                pruned,
+                ", ".join(
+                    f"{alert_type}: open={counts['open']} +{counts['opened']} -{counts['resolved']}"
+                    for alert_type, counts in summary.items()
+                ),
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
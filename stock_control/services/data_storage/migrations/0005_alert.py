@@ -0,0 +1,46 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_storage', '0004_product_supplier_ref_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('low_stock', 'Low Stock'), ('expired_lot', 'Expired Lot'), ('delayed_delivery', 'Delayed Delivery'), ('missing_threshold', 'Missing Threshold'), ('duplicate_name', 'Duplicate Product Name')], max_length=30)),
+                ('key', models.CharField(max_length=200)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.CharField(max_length=255)),
+                ('first_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('acknowledged_at', models.DateTimeField(blank=True, null=True)),
+                ('acknowledged_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='acknowledged_alerts', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='data_storage.product')),
+                ('product_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='data_storage.productitem')),
+                ('purchase_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='data_storage.purchaseorder')),
+            ],
+            options={
+                'ordering': ['-first_seen_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['resolved_at', 'alert_type'], name='alert_open_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('alert_type', 'key'), name='alert_unique_open_key'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0005_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('lot', 'Lot Stock Changed'), ('location', 'Location Stock Changed'), ('alert', 'Alerts Changed')], max_length=20)),
+                ('payload', models.TextField(help_text='JSON document describing the change')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:28
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0006_stockevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationStockRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('lot_count', models.PositiveIntegerField(default=0)),
+                ('next_expiry', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_rollups', to='data_storage.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_rollups', to='data_storage.product')),
+            ],
+            options={
+                'unique_together': {('location', 'product')},
+            },
+        ),
+    ]
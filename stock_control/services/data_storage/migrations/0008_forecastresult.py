@@ -0,0 +1,34 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:31
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0007_locationstockrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=30)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('history_days', models.PositiveIntegerField()),
+                ('forecast_start', models.DateField(help_text='Date of the first forecast value')),
+                ('forecast_values', models.TextField(help_text='JSON list of forecast daily withdrawals')),
+                ('avg_daily_demand', models.FloatField(default=0)),
+                ('current_stock', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('days_until_run_out', models.FloatField(blank=True, null=True)),
+                ('run_out_date', models.DateField(blank=True, null=True)),
+                ('reorder_date', models.DateField(blank=True, null=True)),
+                ('fit_ms', models.FloatField(default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='data_storage.product')),
+            ],
+        ),
+    ]
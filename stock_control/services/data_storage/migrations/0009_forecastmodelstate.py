@@ -0,0 +1,33 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0008_forecastresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastModelState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('smoothing_level', models.FloatField()),
+                ('smoothing_trend', models.FloatField()),
+                ('damping_trend', models.FloatField()),
+                ('level', models.FloatField()),
+                ('trend', models.FloatField()),
+                ('fitted_through', models.DateField(help_text='Last day of history folded into the state')),
+                ('series_hash', models.CharField(help_text='Hash of the trailing history up to fitted_through', max_length=40)),
+                ('fit_mae', models.FloatField(help_text='Mean absolute one-step error at the last full fit')),
+                ('recent_error_sum', models.FloatField(default=0)),
+                ('recent_error_count', models.PositiveIntegerField(default=0)),
+                ('fitted_at', models.DateTimeField(help_text='Time of the last full fit')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_state', to='data_storage.product')),
+            ],
+        ),
+    ]
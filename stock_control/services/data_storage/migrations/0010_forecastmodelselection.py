@@ -0,0 +1,29 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0009_forecastmodelstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastModelSelection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=30)),
+                ('mase', models.FloatField(blank=True, null=True)),
+                ('bias', models.FloatField(blank=True, null=True)),
+                ('fit_ms', models.FloatField(default=0)),
+                ('mase_bar', models.FloatField()),
+                ('metrics', models.TextField(help_text='JSON backtest metrics for every candidate model')),
+                ('evaluated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_model', to='data_storage.product')),
+            ],
+        ),
+    ]
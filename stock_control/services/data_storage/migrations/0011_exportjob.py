@@ -0,0 +1,48 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_storage', '0010_forecastmodelselection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel')], max_length=10)),
+                ('params', models.TextField(help_text='JSON export parameters (model, format, filters)')),
+                ('params_hash', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Ready'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('row_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('size_bytes', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('duration_ms', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'created_at'], name='exportjob_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='exportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('user', 'params_hash'), name='exportjob_unique_active'),
+        ),
+    ]
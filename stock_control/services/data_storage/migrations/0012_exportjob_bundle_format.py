@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-19 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0011_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel'), ('bundle', 'ZIP Bundle')], max_length=10),
+        ),
+    ]
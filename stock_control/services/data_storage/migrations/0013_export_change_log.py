@@ -0,0 +1,42 @@
+# Generated by Django 3.2.8 on 2026-10-19 07:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_storage', '0012_exportjob_bundle_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model_name', models.CharField(max_length=50)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Created or Changed'), ('delete', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(max_length=100)),
+                ('model_name', models.CharField(max_length=50)),
+                ('last_change_id', models.BigIntegerField(default=0)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_row_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('consumer', 'model_name')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exportchange',
+            index=models.Index(fields=['model_name', 'id'], name='exportchange_model_idx'),
+        ),
+    ]
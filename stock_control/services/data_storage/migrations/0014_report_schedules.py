@@ -0,0 +1,52 @@
+# Generated by Django 3.2.8 on 2026-10-19 07:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_storage', '0013_export_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('params', models.TextField(help_text='JSON export parameters (model, format, filters, dates)')),
+                ('data_version', models.BigIntegerField(help_text='Newest ExportChange id for the model when generated')),
+                ('file_name', models.CharField(max_length=255)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('duration_ms', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_served_at', models.DateTimeField(blank=True, null=True)),
+                ('hits', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReportSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('model_name', models.CharField(max_length=50)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel')], max_length=10)),
+                ('params', models.TextField(help_text='JSON export parameters; window_days replaces fixed dates with the last N days')),
+                ('cadence', models.CharField(choices=[('hourly', 'Hourly'), ('daily', 'Daily'), ('weekly', 'Weekly')], default='daily', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_schedules', to=settings.AUTH_USER_MODEL)),
+                ('last_artifact', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='data_storage.reportartifact')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
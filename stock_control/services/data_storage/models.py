@@ -242,3 +242,308 @@ class PurchaseOrderCompletionLog(models.Model):
 
     def __str__(self):
         return f"Completed PO - {self.product_name} ({self.product_code}) on {self.completed_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class Alert(models.Model):
+    TYPE_LOW_STOCK = 'low_stock'
+    TYPE_EXPIRED_LOT = 'expired_lot'
+    TYPE_DELAYED_DELIVERY = 'delayed_delivery'
+    TYPE_MISSING_THRESHOLD = 'missing_threshold'
+    TYPE_DUPLICATE_NAME = 'duplicate_name'
+
+    TYPE_CHOICES = [
+        (TYPE_LOW_STOCK, 'Low Stock'),
+        (TYPE_EXPIRED_LOT, 'Expired Lot'),
+        (TYPE_DELAYED_DELIVERY, 'Delayed Delivery'),
+        (TYPE_MISSING_THRESHOLD, 'Missing Threshold'),
+        (TYPE_DUPLICATE_NAME, 'Duplicate Product Name'),
+    ]
+
+    alert_type = models.CharField(max_length=30, choices=TYPE_CHOICES)
+    # Identifies the offending record within its type (product id, lot id, normalized name...)
+    key = models.CharField(max_length=200)
+    subject = models.CharField(max_length=200)
+    message = models.CharField(max_length=255)
+
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='alerts')
+    product_item = models.ForeignKey(ProductItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='alerts')
+    purchase_order = models.ForeignKey(PurchaseOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='alerts')
+
+    first_seen_at = models.DateTimeField(default=now)
+    last_seen_at = models.DateTimeField(default=now)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    acknowledged_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='acknowledged_alerts'
+    )
+
+    class Meta:
+        ordering = ['-first_seen_at']
+        indexes = [
+            models.Index(fields=['resolved_at', 'alert_type'], name='alert_open_type_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['alert_type', 'key'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='alert_unique_open_key',
+            ),
+        ]
+
+    @property
+    def is_open(self):
+        return self.resolved_at is None
+
+    def acknowledge(self, user):
+        self.acknowledged_at = now()
+        self.acknowledged_by = user
+        self.save(update_fields=['acknowledged_at', 'acknowledged_by'])
+
+    def __str__(self):
+        return f"{self.get_alert_type_display()}: {self.subject}"
+
+
+class StockEvent(models.Model):
+    """Append-only feed of stock changes, streamed to open pages by the live feed."""
+    TYPE_LOT = 'lot'
+    TYPE_LOCATION = 'location'
+    TYPE_ALERT = 'alert'
+
+    TYPE_CHOICES = [
+        (TYPE_LOT, 'Lot Stock Changed'),
+        (TYPE_LOCATION, 'Location Stock Changed'),
+        (TYPE_ALERT, 'Alerts Changed'),
+    ]
+
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    payload = models.TextField(help_text="JSON document describing the change")
+    created_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} #{self.id}"
+
+
+class LocationStockRollup(models.Model):
+    """Per-location stock totals for each product, refreshed whenever stock moves."""
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='stock_rollups')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='location_rollups')
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    lot_count = models.PositiveIntegerField(default=0)
+    next_expiry = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('location', 'product')
+
+    def __str__(self):
+        return f"{self.product} @ {self.location} ({self.quantity})"
+
+
+class ForecastResult(models.Model):
+    """Latest per-product demand forecast, written by the run_forecasts command."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast')
+    model_name = models.CharField(max_length=30)
+    computed_at = models.DateTimeField(default=now)
+    history_days = models.PositiveIntegerField()
+    forecast_start = models.DateField(help_text="Date of the first forecast value")
+    forecast_values = models.TextField(help_text="JSON list of forecast daily withdrawals")
+    avg_daily_demand = models.FloatField(default=0)
+    current_stock = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    days_until_run_out = models.FloatField(null=True, blank=True)
+    run_out_date = models.DateField(null=True, blank=True)
+    reorder_date = models.DateField(null=True, blank=True)
+    fit_ms = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Forecast for {self.product} ({self.model_name})"
+
+
+class ForecastModelState(models.Model):
+    """Fitted Holt parameters and smoothing state, reused to update forecasts incrementally."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast_state')
+    smoothing_level = models.FloatField()
+    smoothing_trend = models.FloatField()
+    damping_trend = models.FloatField()
+    level = models.FloatField()
+    trend = models.FloatField()
+    fitted_through = models.DateField(help_text="Last day of history folded into the state")
+    series_hash = models.CharField(max_length=40, help_text="Hash of the trailing history up to fitted_through")
+    fit_mae = models.FloatField(help_text="Mean absolute one-step error at the last full fit")
+    recent_error_sum = models.FloatField(default=0)
+    recent_error_count = models.PositiveIntegerField(default=0)
+    fitted_at = models.DateTimeField(help_text="Time of the last full fit")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast state for {self.product} through {self.fitted_through}"
+
+
+class ForecastModelSelection(models.Model):
+    """Model chosen for a product by the backtest_forecasts command."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecast_model')
+    model_name = models.CharField(max_length=30)
+    mase = models.FloatField(null=True, blank=True)
+    bias = models.FloatField(null=True, blank=True)
+    fit_ms = models.FloatField(default=0)
+    mase_bar = models.FloatField()
+    metrics = models.TextField(help_text="JSON backtest metrics for every candidate model")
+    evaluated_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"{self.product}: {self.model_name}"
+
+
+class ExportJob(models.Model):
+    """Report export generated in the background by the process_export_jobs command."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+        ('bundle', 'ZIP Bundle'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    model_name = models.CharField(max_length=50)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    params = models.TextField(help_text="JSON export parameters (model, format, filters)")
+    # SHA-256 of the normalized params; identical requests share one active job
+    params_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    file_name = models.CharField(max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    size_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'params_hash'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='exportjob_unique_active',
+            ),
+        ]
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def __str__(self):
+        return f"{self.model_name} {self.get_file_format_display()} export for {self.user} ({self.get_status_display()})"
+
+
+class ExportChange(models.Model):
+    """Change log of exported rows, read by incremental (delta) exports.
+
+    One entry per save or delete; deleted rows survive here as tombstones.
+    The auto-incrementing id orders changes and serves as the watermark.
+    """
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+
+    ACTION_CHOICES = [
+        (ACTION_UPSERT, 'Created or Changed'),
+        (ACTION_DELETE, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'id'], name='exportchange_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id} {self.action}"
+
+
+class ExportWatermark(models.Model):
+    """Last change a delta export consumer has received for one model."""
+    consumer = models.CharField(max_length=100)
+    model_name = models.CharField(max_length=50)
+    last_change_id = models.BigIntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_row_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('consumer', 'model_name')
+
+    def __str__(self):
+        return f"{self.consumer} / {self.model_name} @ {self.last_change_id}"
+
+
+class ReportArtifact(models.Model):
+    """Generated report file, reused while its parameters and data version match."""
+    # SHA-256 of the normalized export params plus the model's data version
+    cache_key = models.CharField(max_length=64, unique=True)
+    params = models.TextField(help_text="JSON export parameters (model, format, filters, dates)")
+    data_version = models.BigIntegerField(help_text="Newest ExportChange id for the model when generated")
+    file_name = models.CharField(max_length=255)
+    row_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    duration_ms = models.FloatField(default=0)
+    created_at = models.DateTimeField(default=now)
+    last_served_at = models.DateTimeField(null=True, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.file_name} (v{self.data_version})"
+
+
+class ReportSchedule(models.Model):
+    """Report generated in the background on a cadence so downloads can use the cached file."""
+    CADENCE_HOURLY = 'hourly'
+    CADENCE_DAILY = 'daily'
+    CADENCE_WEEKLY = 'weekly'
+
+    CADENCE_CHOICES = [
+        (CADENCE_HOURLY, 'Hourly'),
+        (CADENCE_DAILY, 'Daily'),
+        (CADENCE_WEEKLY, 'Weekly'),
+    ]
+
+    name = models.CharField(max_length=100)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_schedules')
+    model_name = models.CharField(max_length=50)
+    file_format = models.CharField(max_length=10, choices=ExportJob.FORMAT_CHOICES[:2])
+    params = models.TextField(help_text="JSON export parameters; window_days replaces fixed dates with the last N days")
+    cadence = models.CharField(max_length=10, choices=CADENCE_CHOICES, default=CADENCE_DAILY)
+    is_active = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(default=now)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_artifact = models.ForeignKey(
+        ReportArtifact, on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='schedules'
+    )
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_cadence_display()})"
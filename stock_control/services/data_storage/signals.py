@@ -0,0 +1,120 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from services.alerts.alerts import alert_types_for_model, schedule_alert_sweep
+from services.live_feed.live_feed import publish_lot_change
+from services.location_rollups.location_rollups import schedule_rollup_refresh
+from services.data_storage.models import (
+    ExportChange, Location, Product, ProductItem, PurchaseOrder, Supplier, Withdrawal,
+)
+
+# Field each label-only model contributes to exported reports (see reporting.FK_EXPORT_LABELS).
+LABEL_FIELDS = {Supplier: 'name', Location: 'name', User: 'username'}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductItem)
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductItem)
+@receiver(post_delete, sender=PurchaseOrder)
+def refresh_alerts_on_stock_change(sender, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_alert_sweep(alert_types_for_model(sender))
+
+
+@receiver(post_save, sender=Product)
+def refresh_rollups_on_product_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The home location may have changed.
+    schedule_rollup_refresh([instance.pk])
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def refresh_rollups_on_lot_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_rollup_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def publish_lot_stock_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    publish_lot_change(instance.pk, instance.product_id)
+
+
+# ProductItem changes only version cached reports whose lot labels read them (see
+# reporting.deltas.report_version); lots have no delta export.
+@receiver(post_save, sender=Withdrawal)
+@receiver(post_save, sender=PurchaseOrder)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductItem)
+def log_export_upsert(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ExportChange.objects.create(
+        model_name=sender.__name__, object_id=instance.pk, action=ExportChange.ACTION_UPSERT,
+    )
+
+
+@receiver(post_delete, sender=Withdrawal)
+@receiver(post_delete, sender=PurchaseOrder)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductItem)
+def log_export_delete(sender, instance, **kwargs):
+    ExportChange.objects.create(
+        model_name=sender.__name__, object_id=instance.pk, action=ExportChange.ACTION_DELETE,
+    )
+
+
+# Suppliers, locations and users are logged only to version cached reports that print
+# their names (see reporting.deltas.report_version).
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=User)
+def log_label_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # A login saves only last_login; reports stay valid.
+    if update_fields is not None and LABEL_FIELDS[sender] not in update_fields:
+        return
+    ExportChange.objects.create(
+        model_name=sender.__name__, object_id=instance.pk, action=ExportChange.ACTION_UPSERT,
+    )
+
+
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Location)
+@receiver(post_delete, sender=User)
+def log_label_delete(sender, instance, **kwargs):
+    ExportChange.objects.create(
+        model_name=sender.__name__, object_id=instance.pk, action=ExportChange.ACTION_DELETE,
+    )
+
+
+# Deleting one of these nulls the foreign keys pointing at it with a bulk UPDATE
+# that sends no signals; the exported rows it changes are recorded here instead.
+UNLINKED_ON_DELETE = {
+    ProductItem: ((Withdrawal, 'product_item'), (PurchaseOrder, 'product_item')),
+    User: ((Withdrawal, 'user'), (PurchaseOrder, 'ordered_by')),
+    Supplier: ((Product, 'supplier_ref'),),
+    Location: ((Product, 'location'),),
+}
+
+
+@receiver(pre_delete, sender=ProductItem)
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Supplier)
+@receiver(pre_delete, sender=Location)
+def log_export_rows_unlinked(sender, instance, **kwargs):
+    ExportChange.objects.bulk_create([
+        ExportChange(model_name=model.__name__, object_id=object_id, action=ExportChange.ACTION_UPSERT)
+        for model, field in UNLINKED_ON_DELETE[sender]
+        for object_id in model.objects.filter(**{field: instance}).values_list('id', flat=True)
+    ])
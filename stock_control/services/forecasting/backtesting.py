@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.timezone import now
+
+from services.data_storage.models import ForecastModelSelection, Product
+from services.forecasting.forecasters import FORECASTERS
+from services.forecasting.forecasting import build_daily_series
+
+MIN_TRAIN_DAYS = 28
+
+
+def rolling_origins(length, horizon, origins, step):
+    """Cut-off indices for rolling-origin evaluation, oldest first."""
+    last = length - horizon
+    cutoffs = [last - step * i for i in range(origins)]
+    return sorted(cutoff for cutoff in cutoffs if cutoff >= MIN_TRAIN_DAYS)
+
+
+def backtest_series(task):
+    """Evaluate every model on one series from several forecast origins.
+
+    For each origin the model sees only the history before it and forecasts
+    ``horizon`` days. Returns per-model MASE (scaled by the in-sample naive
+    one-step error), bias (mean forecast minus actual, per day) and the mean
+    fit time per origin. Runs inside worker processes.
+    """
+    product_id, values, horizon, origins, step, model_names = task
+    series = np.asarray(values, dtype=float)
+    cutoffs = rolling_origins(len(series), horizon, origins, step)
+
+    metrics = {}
+    for name in model_names:
+        forecaster = FORECASTERS[name]
+        scaled_errors = []
+        errors = []
+        fit_seconds = 0.0
+        for cutoff in cutoffs:
+            train, actual = series[:cutoff], series[cutoff:cutoff + horizon]
+            started = time.perf_counter()
+            forecast = np.clip(np.nan_to_num(forecaster(train, horizon)), 0, None)
+            fit_seconds += time.perf_counter() - started
+            errors.append(forecast - actual)
+            scale = np.mean(np.abs(np.diff(train)))
+            if scale > 0:
+                scaled_errors.append(np.mean(np.abs(forecast - actual)) / scale)
+        metrics[name] = {
+            "mase": round(float(np.mean(scaled_errors)), 4) if scaled_errors else None,
+            "bias": round(float(np.mean(np.concatenate(errors))), 4) if errors else None,
+            "fit_ms": round(fit_seconds * 1000 / max(len(cutoffs), 1), 3),
+            "origins": len(cutoffs),
+        }
+    return product_id, metrics
+
+
+def select_model(metrics, mase_bar):
+    """Cheapest model whose MASE meets the bar, else the most accurate one.
+
+    Fit times are compared at whole-millisecond resolution so timing noise
+    between the sub-millisecond models does not decide; ties go to MASE.
+    """
+    scored = [(name, values) for name, values in metrics.items() if values["mase"] is not None]
+    if not scored:
+        return None
+    passing = [(name, values) for name, values in scored if values["mase"] <= mase_bar]
+    if passing:
+        return min(passing, key=lambda entry: (int(entry[1]["fit_ms"]), entry[1]["mase"]))[0]
+    return min(scored, key=lambda entry: entry[1]["mase"])[0]
+
+
+def summarise(results, selections):
+    """Aggregate per-model accuracy and speed across products."""
+    summary = {}
+    for name in FORECASTERS:
+        rows = [metrics[name] for _, metrics in results if name in metrics]
+        if not rows:
+            continue
+        mases = [row["mase"] for row in rows if row["mase"] is not None]
+        summary[name] = {
+            "median_mase": round(float(np.median(mases)), 4) if mases else None,
+            "mean_bias": round(float(np.mean([row["bias"] for row in rows if row["bias"] is not None] or [0])), 4),
+            "mean_fit_ms": round(float(np.mean([row["fit_ms"] for row in rows])), 3),
+            "selected": sum(1 for selected in selections.values() if selected == name),
+        }
+    return summary
+
+
+def run_backtests(series_by_product, horizon=7, origins=8, step=7, model_names=None, workers=None):
+    """Backtest ``{product_id: values}`` across a process pool."""
+    model_names = list(model_names or FORECASTERS)
+    workers = workers or settings.FORECAST_WORKERS or os.cpu_count() or 1
+    tasks = [
+        (product_id, values, horizon, origins, step, model_names)
+        for product_id, values in series_by_product.items()
+    ]
+    if workers <= 1 or len(tasks) < 2:
+        return [backtest_series(task) for task in tasks]
+    connections.close_all()
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(backtest_series, tasks, chunksize=chunksize))
+
+
+def synthetic_series(products, days, seed=0):
+    """Seeded intermittent demand series for a reproducible speed benchmark."""
+    rng = np.random.default_rng(seed)
+    occurrence = rng.uniform(0.05, 0.6, size=(products, 1))
+    sizes = rng.gamma(2.0, rng.uniform(0.5, 3.0, size=(products, 1)), size=(products, days))
+    demand = np.where(rng.random((products, days)) < occurrence, np.ceil(sizes), 0.0)
+    return {product_id: demand[product_id - 1] for product_id in range(1, products + 1)}
+
+
+def backtest_products(history_days=None, horizon=7, origins=8, step=7, model_names=None,
+                      workers=None, product_ids=None, mase_bar=None, store=True):
+    """Backtest each product's withdrawal history and store the selected model."""
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    mase_bar = settings.FORECAST_MASE_BAR if mase_bar is None else mase_bar
+    started = time.perf_counter()
+
+    last_day = now().date() - timedelta(days=1)
+    ids = Product.objects.order_by("id")
+    if product_ids is not None:
+        ids = ids.filter(id__in=product_ids)
+    ids = list(ids.values_list("id", flat=True))
+    series = build_daily_series(last_day - timedelta(days=history_days - 1), last_day, ids)
+
+    results = run_backtests(
+        {product_id: series[product_id].to_numpy() for product_id in ids},
+        horizon=horizon, origins=origins, step=step, model_names=model_names, workers=workers,
+    )
+    selections = {product_id: select_model(metrics, mase_bar) for product_id, metrics in results}
+
+    if store:
+        evaluated_at = now()
+        rows = []
+        for product_id, metrics in results:
+            selected = selections[product_id]
+            if not selected:
+                continue
+            rows.append(ForecastModelSelection(
+                product_id=product_id,
+                model_name=selected,
+                mase=metrics[selected]["mase"],
+                bias=metrics[selected]["bias"],
+                fit_ms=metrics[selected]["fit_ms"],
+                mase_bar=mase_bar,
+                metrics=json.dumps(metrics),
+                evaluated_at=evaluated_at,
+            ))
+        with transaction.atomic():
+            ForecastModelSelection.objects.filter(product_id__in=ids).delete()
+            ForecastModelSelection.objects.bulk_create(rows, batch_size=500)
+
+    return {
+        "products": len(results),
+        "models": summarise(results, selections),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
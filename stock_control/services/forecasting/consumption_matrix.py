@@ -0,0 +1,94 @@
+from statistics import NormalDist
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from services.data_storage.models import Withdrawal
+
+DEFAULT_PERCENTILE = 90
+
+
+def load_consumption_matrix(product_ids, start_date, end_date):
+    """Load daily withdrawals into a float matrix with one row per product id.
+
+    Rows follow ``product_ids``; columns are the days from ``start_date`` to
+    ``end_date`` inclusive. One grouped query fills the whole matrix.
+    """
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    days = (end_date - start_date).days + 1
+    matrix = np.zeros((len(product_ids), max(days, 0)))
+    if not len(product_ids) or days <= 0:
+        return matrix
+
+    rows = list(
+        Withdrawal.objects.filter(
+            product_item__product_id__in=product_ids.tolist(),
+            timestamp__date__range=(start_date, end_date),
+        )
+        .annotate(day=TruncDate("timestamp"))
+        .values("product_item__product_id", "day")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+        .values_list("product_item__product_id", "day", "total")
+    )
+    if not rows:
+        return matrix
+
+    row_products, row_days, row_totals = zip(*rows)
+    order = np.argsort(product_ids)
+    positions = order[np.searchsorted(product_ids, np.asarray(row_products, dtype=np.int64), sorter=order)]
+    columns = (np.asarray(row_days, dtype="datetime64[D]") - np.datetime64(start_date, "D")).astype(np.int64)
+    return np.bincount(
+        positions * days + columns,
+        weights=np.asarray(row_totals, dtype=float),
+        minlength=matrix.size,
+    ).reshape(matrix.shape)
+
+
+def consumption_statistics(matrix, current_stock, lead_time_days, today,
+                           service_level=0.95, percentile=DEFAULT_PERCENTILE):
+    """Demand, safety stock, run-out and reorder estimates for every row at once.
+
+    ``current_stock`` and ``lead_time_days`` are arrays aligned with the
+    matrix rows. Safety stock is ``z * sigma_daily * sqrt(lead_time)`` for the
+    normal quantile ``z`` of ``service_level``; the reorder point adds the
+    average demand over the lead time. Products with no demand never run
+    out: their day counts are ``inf`` and their dates ``NaT``.
+    """
+    current_stock = np.asarray(current_stock, dtype=float)
+    lead_time_days = np.asarray(lead_time_days, dtype=float)
+    days = matrix.shape[1]
+
+    if days:
+        avg_daily = matrix.mean(axis=1)
+        std_daily = matrix.std(axis=1, ddof=1) if days > 1 else np.zeros(len(matrix))
+        percentile_daily = np.percentile(matrix, percentile, axis=1)
+    else:
+        avg_daily = std_daily = percentile_daily = np.zeros(len(matrix))
+
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * std_daily * np.sqrt(lead_time_days)
+    reorder_point = avg_daily * lead_time_days + safety_stock
+
+    has_demand = avg_daily > 0
+    safe_avg = np.where(has_demand, avg_daily, 1.0)
+    days_to_run_out = np.where(has_demand, np.maximum(current_stock, 0) / safe_avg, np.inf)
+    days_until_reorder = np.where(has_demand, np.maximum(current_stock - reorder_point, 0) / safe_avg, np.inf)
+
+    def to_dates(day_counts):
+        finite = np.isfinite(day_counts)
+        offsets = np.where(finite, np.floor(day_counts), 0).astype("timedelta64[D]")
+        return np.where(finite, np.datetime64(today, "D") + offsets, np.datetime64("NaT"))
+
+    return {
+        "avg_daily": avg_daily,
+        "percentile_daily": percentile_daily,
+        "std_daily": std_daily,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "days_to_run_out": days_to_run_out,
+        "days_until_reorder": days_until_reorder,
+        "run_out_date": to_dates(days_to_run_out),
+        "reorder_date": to_dates(days_until_reorder),
+    }
@@ -0,0 +1,65 @@
+import warnings
+
+import numpy as np
+
+CROSTON_ALPHA = 0.1
+SEASON_DAYS = 7
+
+
+def _mean(history):
+    return float(history.mean()) if len(history) else 0.0
+
+
+def sma_forecaster(window):
+    def forecast(history, horizon):
+        return np.full(horizon, _mean(history[-window:]))
+
+    forecast.__name__ = f"sma_{window}"
+    return forecast
+
+
+def holt_forecast_series(history, horizon):
+    """Damped additive Holt; falls back to the mean when the fit fails."""
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fitted = ExponentialSmoothing(history, trend="add", seasonal=None, damped_trend=True).fit()
+        return np.asarray(fitted.forecast(horizon))
+    except (ValueError, np.linalg.LinAlgError):
+        return np.full(horizon, _mean(history))
+
+
+def croston_sba_forecast(history, horizon, alpha=CROSTON_ALPHA):
+    """Croston's method with the Syntetos-Boylan bias correction.
+
+    Smooths non-zero demand sizes and the intervals between them separately;
+    the daily rate is (1 - alpha / 2) * size / interval.
+    """
+    nonzero = np.flatnonzero(history)
+    if not len(nonzero):
+        return np.zeros(horizon)
+    size = float(history[nonzero[0]])
+    interval = float(nonzero[0] + 1)
+    for previous, current in zip(nonzero[:-1], nonzero[1:]):
+        size += alpha * (history[current] - size)
+        interval += alpha * ((current - previous) - interval)
+    return np.full(horizon, (1 - alpha / 2) * size / interval)
+
+
+def seasonal_naive_forecast(history, horizon, season=SEASON_DAYS):
+    """Repeat the last full week."""
+    if len(history) < season:
+        return np.full(horizon, _mean(history))
+    return np.resize(history[-season:], horizon).astype(float)
+
+
+# Candidate models for backtesting and for the forecasting job, by stored name.
+FORECASTERS = {
+    "seasonal_naive": seasonal_naive_forecast,
+    "sma_7": sma_forecaster(7),
+    "sma_14": sma_forecaster(14),
+    "croston_sba": croston_sba_forecast,
+    "holt": holt_forecast_series,
+}
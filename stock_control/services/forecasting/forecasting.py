@@ -0,0 +1,323 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.timezone import now
+
+from services.data_storage.models import (
+    ForecastModelSelection,
+    ForecastModelState,
+    ForecastResult,
+    Product,
+    Withdrawal,
+)
+from services.forecasting.forecasters import FORECASTERS
+
+
+logger = logging.getLogger(__name__)
+
+# A trend model needs some real history; sparser series are forecast with their mean.
+MIN_NONZERO_DAYS = 14
+# Days of history, ending at the last fitted day, hashed to detect retroactive edits.
+HASH_WINDOW_DAYS = 90
+# Drift is only judged once a few new observations have been folded in.
+MIN_DRIFT_OBSERVATIONS = 7
+MIN_FIT_MAE = 0.05
+
+
+def build_daily_series(start_date, end_date, product_ids):
+    """Return a days x products DataFrame of withdrawn quantities, zero-filled.
+
+    One grouped query covers every product; missing days are filled in pandas.
+    """
+    index = pd.date_range(start_date, end_date, freq="D")
+    rows = (
+        Withdrawal.objects.filter(
+            product_item__isnull=False,
+            timestamp__date__range=(start_date, end_date),
+        )
+        .annotate(day=TruncDate("timestamp"))
+        .values("product_item__product_id", "day")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+        .values_list("product_item__product_id", "day", "total")
+    )
+    frame = pd.DataFrame.from_records(list(rows), columns=["product_id", "day", "total"])
+    if frame.empty:
+        return pd.DataFrame(0.0, index=index, columns=product_ids)
+    frame["day"] = pd.to_datetime(frame["day"])
+    frame["total"] = frame["total"].astype(float)
+    return frame.pivot_table(
+        index="day", columns="product_id", values="total", aggfunc="sum", fill_value=0.0
+    ).reindex(index=index, columns=product_ids, fill_value=0.0)
+
+
+def _rounded(forecast):
+    return [round(float(value), 4) for value in np.clip(np.nan_to_num(forecast), 0, None)]
+
+
+def holt_forecast(level, trend, damping, horizon):
+    """Damped additive trend forecast: level + (phi + ... + phi^h) * trend."""
+    return level + np.cumsum(damping ** np.arange(1, horizon + 1)) * trend
+
+
+def update_holt_state(state, observations):
+    """Fold new observations into a fitted Holt state without refitting.
+
+    Returns the new level and trend plus the absolute one-step-ahead errors.
+    """
+    alpha, beta, phi = state["smoothing_level"], state["smoothing_trend"], state["damping_trend"]
+    level, trend = state["level"], state["trend"]
+    errors = []
+    for observed in observations:
+        predicted = level + phi * trend
+        errors.append(abs(observed - predicted))
+        new_level = alpha * observed + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+    return level, trend, errors
+
+
+def fit_series(task):
+    """Fit one product's daily series and forecast ``horizon`` days ahead.
+
+    Runs inside worker processes, so it only touches NumPy/statsmodels.
+    ``selected_model`` is the backtest winner, if any; without one, sparse
+    series use their mean and the rest damped Holt. Holt fits also return
+    their parameters and final state for incremental reuse.
+    """
+    product_id, values, horizon, selected_model = task
+    started = time.perf_counter()
+    series = np.asarray(values, dtype=float)
+    state = None
+
+    if series.sum() <= 0:
+        model_name, forecast = "none", np.zeros(horizon)
+    elif selected_model in FORECASTERS and selected_model != "holt":
+        model_name, forecast = selected_model, FORECASTERS[selected_model](series, horizon)
+    elif selected_model != "holt" and np.count_nonzero(series) < MIN_NONZERO_DAYS:
+        model_name, forecast = "mean", np.full(horizon, series.mean())
+    else:
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                fitted = ExponentialSmoothing(series, trend="add", seasonal=None, damped_trend=True).fit()
+            model_name, forecast = "holt", np.asarray(fitted.forecast(horizon))
+            state = {
+                "smoothing_level": float(fitted.params["smoothing_level"]),
+                "smoothing_trend": float(fitted.params["smoothing_trend"]),
+                "damping_trend": float(fitted.params["damping_trend"]),
+                "level": float(fitted.level[-1]),
+                "trend": float(fitted.trend[-1]),
+                "fit_mae": float(np.mean(np.abs(fitted.resid))),
+            }
+        except (ValueError, np.linalg.LinAlgError):
+            model_name, forecast = "mean", np.full(horizon, series.mean())
+
+    fit_ms = (time.perf_counter() - started) * 1000
+    return product_id, model_name, _rounded(forecast), fit_ms, state
+
+
+def estimate_days_until_run_out(current_stock, forecast, avg_daily):
+    """Days until the cumulative forecast demand uses up ``current_stock``.
+
+    Beyond the forecast horizon the last week's forecast rate (or the
+    historical average) is extrapolated. Returns None when there is no demand.
+    """
+    if current_stock <= 0:
+        return 0.0
+    forecast = np.asarray(forecast, dtype=float)
+    cumulative = np.cumsum(forecast)
+    hit = int(np.searchsorted(cumulative, current_stock))
+    if hit < len(forecast):
+        consumed_before = cumulative[hit - 1] if hit else 0.0
+        return hit + (current_stock - consumed_before) / forecast[hit]
+
+    rate = forecast[-7:].mean() if len(forecast) else 0.0
+    if rate <= 0:
+        rate = avg_daily
+    if rate <= 0:
+        return None
+    remaining = current_stock - (cumulative[-1] if len(forecast) else 0.0)
+    return len(forecast) + remaining / rate
+
+
+def series_hash(series, end_date):
+    """Hash the trailing HASH_WINDOW_DAYS of ``series`` ending at ``end_date``."""
+    window = series.loc[pd.Timestamp(end_date - timedelta(days=HASH_WINDOW_DAYS - 1)):pd.Timestamp(end_date)]
+    return hashlib.sha1(np.round(window.to_numpy(dtype=float), 4).tobytes()).hexdigest()
+
+
+def _update_cached_fit(cached, series, last_day, horizon, today):
+    """Advance a cached Holt fit over the days since it was fitted.
+
+    Returns None when a full refit is needed: the cache is too old, history
+    up to the fitted day changed retroactively, or recent one-step errors
+    drifted well above the error of the original fit.
+    """
+    if cached is None:
+        return None
+    if (today - cached.fitted_at.date()).days > settings.FORECAST_REFIT_MAX_AGE_DAYS:
+        return None
+    if cached.fitted_through > last_day or cached.fitted_through < series.index[0].date():
+        return None
+    if series_hash(series, cached.fitted_through) != cached.series_hash:
+        return None
+
+    started = time.perf_counter()
+    state = {
+        field: getattr(cached, field)
+        for field in ("smoothing_level", "smoothing_trend", "damping_trend", "level", "trend", "fit_mae")
+    }
+    new_observations = series.loc[pd.Timestamp(cached.fitted_through + timedelta(days=1)):].to_numpy(dtype=float)
+    state["level"], state["trend"], errors = update_holt_state(state, new_observations)
+    state["recent_error_sum"] = cached.recent_error_sum + sum(errors)
+    state["recent_error_count"] = cached.recent_error_count + len(errors)
+    state["fitted_at"] = cached.fitted_at
+    if state["recent_error_count"] >= MIN_DRIFT_OBSERVATIONS:
+        recent_mae = state["recent_error_sum"] / state["recent_error_count"]
+        if recent_mae > settings.FORECAST_DRIFT_RATIO * max(state["fit_mae"], MIN_FIT_MAE):
+            return None
+
+    forecast = holt_forecast(state["level"], state["trend"], state["damping_trend"], horizon)
+    fit_ms = (time.perf_counter() - started) * 1000
+    return "holt", _rounded(forecast), fit_ms, state
+
+
+def _fit_all(tasks, workers):
+    if workers <= 1 or len(tasks) < 2:
+        return [fit_series(task) for task in tasks]
+    # Forked workers must not inherit the parent's open database sockets.
+    connections.close_all()
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fit_series, tasks, chunksize=chunksize))
+
+
+def run_forecasts(history_days=None, horizon=None, workers=None, product_ids=None):
+    """Forecast every product and store ForecastResult rows.
+
+    Each product uses the model picked by backtest_forecasts when there is
+    one. Products with a valid cached Holt state are updated incrementally
+    in this process; only the rest are refitted in the process pool.
+    """
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    horizon = horizon or settings.FORECAST_HORIZON_DAYS
+    workers = workers or settings.FORECAST_WORKERS or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    # Only complete days are fitted, so a cached state never covers a partial day.
+    today = now().date()
+    last_day = today - timedelta(days=1)
+    start_date = last_day - timedelta(days=history_days - 1)
+
+    products = Product.objects.annotate(
+        total_stock=Coalesce(Sum("items__current_stock"), Decimal("0"))
+    ).order_by("id")
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    products = list(products.values_list("id", "total_stock", "lead_time"))
+    ids = [product_id for product_id, _, _ in products]
+
+    series = build_daily_series(start_date, last_day, ids)
+    cached_states = {state.product_id: state for state in ForecastModelState.objects.filter(product_id__in=ids)}
+    selected_models = dict(
+        ForecastModelSelection.objects.filter(product_id__in=ids).values_list("product_id", "model_name")
+    )
+
+    fitted = {}
+    tasks = []
+    for product_id in ids:
+        selected_model = selected_models.get(product_id)
+        outcome = None
+        if selected_model in (None, "holt"):
+            outcome = _update_cached_fit(cached_states.get(product_id), series[product_id], last_day, horizon, today)
+        if outcome:
+            fitted[product_id] = outcome
+        else:
+            tasks.append((product_id, series[product_id].to_numpy(), horizon, selected_model))
+    incremental = len(fitted)
+    for product_id, model_name, forecast, fit_ms, state in _fit_all(tasks, workers):
+        if state:
+            state.update(recent_error_sum=0.0, recent_error_count=0, fitted_at=now())
+        fitted[product_id] = (model_name, forecast, fit_ms, state)
+
+    computed_at = now()
+    results = []
+    states = []
+    for product_id, total_stock, lead_time in products:
+        model_name, forecast, fit_ms, state = fitted[product_id]
+        if state:
+            states.append(ForecastModelState(
+                product_id=product_id,
+                fitted_through=last_day,
+                series_hash=series_hash(series[product_id], last_day),
+                **state,
+            ))
+        avg_daily = float(series[product_id].mean()) if len(series) else 0.0
+        days = estimate_days_until_run_out(float(total_stock), forecast, avg_daily)
+        run_out_date = today + timedelta(days=int(days)) if days is not None else None
+        reorder_date = None
+        if run_out_date:
+            reorder_date = max(run_out_date - timedelta(days=lead_time.days), today)
+        results.append(ForecastResult(
+            product_id=product_id,
+            model_name=model_name,
+            computed_at=computed_at,
+            history_days=history_days,
+            forecast_start=today,
+            forecast_values=json.dumps(forecast),
+            avg_daily_demand=round(avg_daily, 4),
+            current_stock=total_stock,
+            days_until_run_out=round(days, 2) if days is not None else None,
+            run_out_date=run_out_date,
+            reorder_date=reorder_date,
+            fit_ms=round(fit_ms, 2),
+        ))
+
+    with transaction.atomic():
+        stale = ForecastResult.objects.all()
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=ids)
+        stale.delete()
+        ForecastResult.objects.bulk_create(results, batch_size=500)
+        ForecastModelState.objects.filter(product_id__in=ids).delete()
+        ForecastModelState.objects.bulk_create(states, batch_size=500)
+
+    return {
+        "products": len(results),
+        "models": dict(Counter(result.model_name for result in results)),
+        "full_refits": len(tasks),
+        "incremental": incremental,
+        "workers": workers,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def forecast_window(result, start_date, days):
+    """Slice a stored forecast to ``days`` values starting at ``start_date``.
+
+    Results computed on an earlier day are shifted; days past the stored
+    horizon repeat its last value.
+    """
+    values = json.loads(result.forecast_values)
+    if not values:
+        return [0.0] * days
+    offset = max((start_date - result.forecast_start).days, 0)
+    window = values[offset:offset + days]
+    return window + [values[-1]] * (days - len(window))
@@ -0,0 +1,252 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from services.data_storage.models import Alert, ProductItem, StockEvent
+
+
+logger = logging.getLogger(__name__)
+
+REPLAY_LIMIT = 500
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+def publish_stock_event(event_type, payload):
+    return StockEvent.objects.create(
+        event_type=event_type,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder),
+    )
+
+
+def lot_event_payload(product_item_id, product_id=None):
+    item = (
+        ProductItem.objects.filter(pk=product_item_id)
+        .values("product_id", "lot_number", "current_stock")
+        .first()
+    )
+    if item:
+        product_id = item["product_id"]
+    totals = ProductItem.objects.filter(product_id=product_id).aggregate(
+        total_stock=Coalesce(Sum("current_stock"), Value(0), output_field=DecimalField()),
+        remaining_parts=Coalesce(Sum("accumulated_partial"), Value(0)),
+    )
+    return {
+        "product_item_id": product_item_id,
+        "product_id": product_id,
+        "lot_number": item["lot_number"] if item else None,
+        "quantity": str(item["current_stock"]) if item else None,
+        "deleted": item is None,
+        "product_total_stock": str(totals["total_stock"]),
+        "product_full_items": int(totals["total_stock"]),
+        "product_remaining_parts": totals["remaining_parts"],
+    }
+
+
+def alert_event_payload():
+    open_alerts = Alert.objects.filter(resolved_at__isnull=True)
+    counts = dict(
+        open_alerts.values("alert_type")
+        .annotate(total=Count("id"))
+        .order_by()
+        .values_list("alert_type", "total")
+    )
+    return {
+        "open_counts": {alert_type: counts.get(alert_type, 0) for alert_type, _ in Alert.TYPE_CHOICES},
+        "unacknowledged": open_alerts.filter(acknowledged_at__isnull=True).count(),
+    }
+
+
+def _publish_after_commit(build_event):
+    def _publish():
+        try:
+            event_type, payload = build_event()
+            publish_stock_event(event_type, payload)
+        except DatabaseError:
+            # The stock write has already committed; a lost live update only delays the screens.
+            logger.exception("Failed to publish stock event")
+        else:
+            # Whether or not any stream is open, this process's cached widgets are now stale.
+            _invalidate_cached_widgets({event_type})
+
+    transaction.on_commit(_publish)
+
+
+def publish_lot_change(product_item_id, product_id=None):
+    _publish_after_commit(lambda: (StockEvent.TYPE_LOT, lot_event_payload(product_item_id, product_id)))
+
+
+def publish_location_change(build_payload):
+    _publish_after_commit(lambda: (StockEvent.TYPE_LOCATION, build_payload()))
+
+
+def publish_alert_change():
+    _publish_after_commit(lambda: (StockEvent.TYPE_ALERT, alert_event_payload()))
+
+
+def prune_stock_events():
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, "LIVE_FEED_RETENTION_HOURS", 24))
+    deleted, _ = StockEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+# ---------------------------------------------------------------------------
+# Fan-out
+# ---------------------------------------------------------------------------
+
+class Subscriber(queue.Queue):
+    """One stream's queue of events; ``overflowed`` once an event could not be queued."""
+
+    def __init__(self):
+        super().__init__(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class StockEventBroadcaster:
+    """Single per-process poller that fans StockEvent rows out to every open stream.
+
+    However many screens are connected, the process issues one indexed
+    ``id > last_id`` query per poll interval.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                # Start from the newest event, not where a previous poller stopped,
+                # so a new subscriber is not sent events from before it connected.
+                self._last_id = None
+                self._thread = threading.Thread(target=self._run, name="stock-event-broadcaster", daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _fetch(self):
+        events = StockEvent.objects.order_by("id")
+        if self._last_id is None:
+            self._last_id = StockEvent.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        return list(
+            events.filter(id__gt=self._last_id).values_list("id", "event_type", "payload")[:REPLAY_LIMIT]
+        )
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                events = self._fetch()
+            except DatabaseError:
+                logger.exception("Failed to poll stock events")
+                events = []
+            finally:
+                close_old_connections()
+
+            if events:
+                self._last_id = events[-1][0]
+                # Events published by other processes (the alert sweeper, other workers).
+                _invalidate_cached_widgets({event_type for _, event_type, _ in events})
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for subscriber in subscribers:
+                    for event in events:
+                        try:
+                            subscriber.put_nowait(event)
+                        except queue.Full:
+                            # Client is not reading. Queue nothing newer, which would skip the
+                            # gap; its stream ends and EventSource replays from Last-Event-ID.
+                            subscriber.overflowed = True
+                            self.unsubscribe(subscriber)
+                            break
+            time.sleep(self.poll_interval)
+
+
+def _invalidate_cached_widgets(event_types):
+    from services.analysis.analysis import invalidate_dashboard_widgets
+
+    invalidate_dashboard_widgets(event_types)
+
+
+broadcaster = StockEventBroadcaster(getattr(settings, "LIVE_FEED_POLL_SECONDS", 1.0))
+
+
+def _format_event(event_id, event_type, payload):
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+def _replay_since(last_event_id):
+    return list(
+        StockEvent.objects.filter(id__gt=last_event_id)
+        .order_by("id")
+        .values_list("id", "event_type", "payload")[:REPLAY_LIMIT]
+    )
+
+
+def stock_event_stream(request):
+    """Server-Sent Events stream of lot, location and alert changes."""
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    heartbeat = getattr(settings, "LIVE_FEED_HEARTBEAT_SECONDS", 15)
+    max_seconds = getattr(settings, "LIVE_FEED_MAX_STREAM_SECONDS", 1800)
+
+    def events(subscriber):
+        try:
+            yield "retry: 5000\n\n"
+            seen_id = last_event_id
+            if last_event_id:
+                for event in _replay_since(last_event_id):
+                    seen_id = event[0]
+                    yield _format_event(*event)
+            close_old_connections()
+
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                if subscriber.overflowed and subscriber.empty():
+                    # Events were dropped after the ones just sent; reconnecting replays them.
+                    break
+                try:
+                    event = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event[0] <= seen_id:
+                    continue
+                seen_id = event[0]
+                yield _format_event(*event)
+            # Ending the stream lets EventSource reconnect and frees the worker thread periodically.
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(events(broadcaster.subscribe()), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from services.data_storage.models import LocationStockRollup, Product, ProductItem
+
+
+logger = logging.getLogger(__name__)
+
+
+def location_tracking_installed():
+    return apps.is_installed("solutions.location_tracking")
+
+
+def _empty_rollup():
+    return {"quantity": Decimal("0"), "lot_count": 0, "next_expiry": None}
+
+
+def _rollup_rows(product_ids=None):
+    """Return {(location_id, product_id): totals} computed from the stock tables.
+
+    Attribution matches the unscoped location distribution widget: a
+    product's lot stock counts at its home location and, with shelf-level
+    tracking installed, LocationStock quantities count at their own
+    locations on top of it.
+    """
+    products = Product.objects.filter(location__isnull=False)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+
+    rows = {}
+    lots = {}
+    grouped = products.values("id", "location_id").annotate(
+        total=Coalesce(Sum("items__current_stock"), Decimal("0")),
+    ).order_by()
+    # A product stays visible at its home location even when it has no stock.
+    for row in grouped:
+        rows[(row["location_id"], row["id"])] = {
+            "quantity": row["total"],
+            "lot_count": 0,
+            "next_expiry": None,
+        }
+    stocked = ProductItem.objects.filter(product__in=products, current_stock__gt=0).values_list(
+        "product__location_id", "product_id", "id", "expiry_date"
+    )
+    for location_id, product_id, item_id, expiry in stocked:
+        lots.setdefault((location_id, product_id), {})[item_id] = expiry
+
+    if location_tracking_installed():
+        from solutions.location_tracking.models import LocationStock
+
+        stocks = LocationStock.objects.filter(quantity__gt=0)
+        if product_ids is not None:
+            stocks = stocks.filter(product_item__product_id__in=product_ids)
+        shelved = stocks.values_list(
+            "location_id", "product_item__product_id", "product_item_id", "quantity", "product_item__expiry_date"
+        )
+        for location_id, product_id, item_id, quantity, expiry in shelved:
+            totals = rows.setdefault((location_id, product_id), _empty_rollup())
+            totals["quantity"] += quantity
+            lots.setdefault((location_id, product_id), {})[item_id] = expiry
+
+    # A lot held both at home and on a shelf of the same location counts once.
+    for key, expiries in lots.items():
+        totals = rows.setdefault(key, _empty_rollup())
+        totals["lot_count"] = len(expiries)
+        totals["next_expiry"] = min(expiries.values())
+    return rows
+
+
+def refresh_location_rollups(product_ids=None):
+    """Rebuild the rollup rows for the given products (all products when None)."""
+    rows = _rollup_rows(product_ids)
+    with transaction.atomic():
+        stale = LocationStockRollup.objects.all()
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=product_ids)
+        stale.delete()
+        LocationStockRollup.objects.bulk_create(
+            [
+                LocationStockRollup(location_id=location_id, product_id=product_id, **totals)
+                for (location_id, product_id), totals in rows.items()
+            ],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def products_in_locations(location_ids):
+    """Subquery of product ids stocked at, or assigned to, any of the given locations."""
+    return (
+        LocationStockRollup.objects.filter(location_id__in=location_ids)
+        .values("product_id")
+        .distinct()
+    )
+
+
+# Products with stock writes committed since their rollups were last refreshed.
+_dirty_products = set()
+_dirty_lock = threading.Lock()
+_refresher = None
+
+
+def _refresh_dirty_products():
+    global _refresher
+    debounce = getattr(settings, "LOCATION_ROLLUP_DEBOUNCE_SECONDS", 2.0)
+    while True:
+        # Writes arriving during the wait join this refresh instead of starting their own.
+        time.sleep(debounce)
+        with _dirty_lock:
+            product_ids = set(_dirty_products)
+            _dirty_products.clear()
+            if not product_ids:
+                _refresher = None
+                return
+        try:
+            refresh_location_rollups(product_ids)
+        except DatabaseError:
+            # Stock writes have already committed; refresh_location_rollups can be rerun to repair.
+            logger.exception("Location rollup refresh failed for products %s", sorted(product_ids))
+        finally:
+            close_old_connections()
+
+
+def _mark_dirty(product_ids):
+    global _refresher
+    with _dirty_lock:
+        _dirty_products.update(product_ids)
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_dirty_products, name="rollup-refresher", daemon=True)
+            _refresher.start()
+
+
+def schedule_rollup_refresh(product_ids):
+    """Refresh the rollups of the given products shortly after the current transaction commits.
+
+    As with alert sweeps, the products are only marked dirty on commit and
+    a background thread refreshes them all once
+    LOCATION_ROLLUP_DEBOUNCE_SECONDS later, off the request path.
+    """
+    product_ids = {pid for pid in product_ids if pid}
+    if product_ids:
+        transaction.on_commit(lambda: _mark_dirty(product_ids))
@@ -0,0 +1,182 @@
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, models
+from django.utils.timezone import make_aware
+
+from services.reporting.reporting import (
+    EXPORT_CHUNK_SIZE,
+    FK_EXPORT_LABELS,
+    export_columns,
+    filter_date_range,
+    iter_export_rows,
+)
+
+# Bundle members: name -> (display name, model label, date field filtered by the range,
+# app that must be installed). Location stocks are a current snapshot, so they are not filtered by date.
+BUNDLE_MODELS = {
+    'withdrawals': ('Withdrawals', 'data_storage.Withdrawal', 'timestamp', None),
+    'registrations': ('Stock Registrations', 'data_storage.StockRegistration', 'timestamp', None),
+    'po_completions': ('PO Completion Logs', 'data_storage.PurchaseOrderCompletionLog', 'completed_at', None),
+    'location_stocks': ('Location Stocks', 'location_tracking.LocationStock', None, 'solutions.location_tracking'),
+    'qc_checks': ('QC Checks', 'quality_control.QualityCheck', 'created_at', 'solutions.quality_control'),
+}
+
+# Columnar formats are written with pyarrow, which is optional.
+BUNDLE_FORMATS = {
+    'csv': 'CSV',
+    'parquet': 'Parquet',
+    'feather': 'Feather',
+}
+
+
+def available_bundle_models():
+    """Bundle members whose app is installed in this deployment."""
+    return [
+        name for name, (_, _, _, app) in BUNDLE_MODELS.items()
+        if app is None or apps.is_installed(app)
+    ]
+
+
+def columnar_available():
+    return find_spec('pyarrow') is not None
+
+
+def bundle_queryset(name, start_date=None, end_date=None):
+    """Rows of a bundle member from ``start_date`` through the whole of ``end_date``."""
+    _, label, date_field, _ = BUNDLE_MODELS[name]
+    queryset = apps.get_model(*label.split('.')).objects.all()
+    if date_field:
+        queryset = filter_date_range(queryset, date_field, start_date)
+        if end_date:
+            next_day = datetime.datetime.strptime(end_date, "%Y-%m-%d") + datetime.timedelta(days=1)
+            queryset = queryset.filter(**{f"{date_field}__lt": make_aware(next_day)})
+    return queryset.order_by('id')
+
+
+def _arrow_type(pa, field):
+    """Arrow type for an exported column, matching iter_export_rows(typed=True)."""
+    if field.is_relation:
+        if field.related_model._meta.label in FK_EXPORT_LABELS:
+            return pa.string()
+        return pa.int64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, (models.AutoField, models.IntegerField)):
+        return pa.int64()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC' if settings.USE_TZ else None)
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, models.DurationField):
+        return pa.duration('us')
+    return pa.string()
+
+
+def _batches(rows, size=EXPORT_CHUNK_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_csv(path, queryset, columns):
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow([header for header, _, _ in columns])
+        for row in iter_export_rows(queryset, columns):
+            writer.writerow(row)
+            written += 1
+    return written
+
+
+def _write_columnar(path, queryset, columns, file_format):
+    """Write one record batch per EXPORT_CHUNK_SIZE rows, so memory stays flat."""
+    import pyarrow as pa
+
+    fields = {field.name: field for field in queryset.model._meta.fields}
+    schema = pa.schema([(header, _arrow_type(pa, fields[header])) for header, _, _ in columns])
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+    else:
+        # Feather v2 is the Arrow IPC file format.
+        writer = pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    written = 0
+    try:
+        rows = iter_export_rows(queryset, columns, typed=True, convert=lambda value: value)
+        for batch in _batches(rows):
+            arrays = [
+                pa.array([row[index] for row in batch], type=field.type)
+                for index, field in enumerate(schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            written += len(batch)
+    finally:
+        writer.close()
+    return written
+
+
+def _write_member(task):
+    """Write one model to its own file. Runs in a worker thread."""
+    name, directory, file_format, start_date, end_date = task
+    close_old_connections()
+    try:
+        queryset = bundle_queryset(name, start_date, end_date)
+        columns = export_columns(queryset.model)
+        path = os.path.join(directory, f"{name}.{file_format}")
+        if file_format == 'csv':
+            rows = _write_csv(path, queryset, columns)
+        else:
+            rows = _write_columnar(path, queryset, columns, file_format)
+        return name, path, rows
+    finally:
+        close_old_connections()
+
+
+def write_bundle(target, names, file_format='csv', start_date=None, end_date=None, workers=None):
+    """Write several models into one ZIP, one file per model, generated in parallel.
+
+    CSV members are deflated; Parquet and Feather members are already
+    zstd-compressed and are stored as-is. Returns ``{name: rows}``.
+    """
+    if file_format not in BUNDLE_FORMATS:
+        raise ValueError(f"Unknown bundle format '{file_format}'.")
+    if file_format != 'csv' and not columnar_available():
+        raise ValueError("Parquet and Feather bundles need pyarrow installed.")
+    names = [name for name in available_bundle_models() if name in names]
+    if not names:
+        raise ValueError("Choose at least one model for the bundle.")
+
+    directory = tempfile.mkdtemp(prefix='ims_bundle_')
+    try:
+        tasks = [(name, directory, file_format, start_date, end_date) for name in names]
+        with ThreadPoolExecutor(max_workers=workers or len(tasks)) as pool:
+            results = list(pool.map(_write_member, tasks))
+
+        compression = zipfile.ZIP_DEFLATED if file_format == 'csv' else zipfile.ZIP_STORED
+        with zipfile.ZipFile(target, 'w', compression=compression) as bundle:
+            for name, path, _ in results:
+                bundle.write(path, arcname=os.path.basename(path))
+        return {name: rows for name, _, rows in results}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,183 @@
+import csv
+import json
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min
+from django.utils.timezone import now
+
+from services.data_storage.models import ExportChange, ExportWatermark
+from services.reporting.reporting import MODEL_MAP, export_columns, iter_export_rows
+
+# Models whose saves and deletes are logged to ExportChange (see data_storage.signals).
+DELTA_MODELS = ('Withdrawal', 'PurchaseOrder', 'Product')
+DELTA_FORMATS = ('csv', 'jsonl')
+
+# Models a report's foreign key label columns read (see reporting.FK_EXPORT_LABELS):
+# renaming a product, lot, supplier, location or user changes those reports without
+# touching their own rows.
+LABEL_MODELS = {
+    'Withdrawal': ('ProductItem', 'Product', 'User'),
+    'PurchaseOrder': ('ProductItem', 'Product', 'User'),
+    'Product': ('Supplier', 'Location'),
+}
+
+# Current rows are fetched by id in chunks of this size.
+DELTA_FETCH_SIZE = 500
+
+
+def data_version(model_name):
+    """Newest change logged for a model; it moves whenever a row is saved or deleted."""
+    return ExportChange.objects.filter(model_name=model_name).aggregate(high=Max('id'))['high'] or 0
+
+
+def report_version(model_name):
+    """Data version of a report: its model's and those of the models its labels read, in one query."""
+    names = (model_name,) + LABEL_MODELS.get(model_name, ())
+    highs = dict(
+        ExportChange.objects.filter(model_name__in=names)
+        .values('model_name')
+        .annotate(high=Max('id'))
+        .values_list('model_name', 'high')
+    )
+    return ':'.join(str(highs.get(name) or 0) for name in names)
+
+
+def _latest_changes(model_name, after_id, through_id):
+    """The last change per row in ``(after_id, through_id]``, oldest first.
+
+    Memory and work follow the number of changes in the window, not the
+    size of the table.
+    """
+    latest = {}
+    changes = (
+        ExportChange.objects.filter(model_name=model_name, id__gt=after_id, id__lte=through_id)
+        .order_by('id')
+        .values_list('id', 'object_id', 'action')
+    )
+    for change_id, object_id, action in changes.iterator():
+        latest[object_id] = (change_id, action)
+    return sorted(
+        ((change_id, object_id, action) for object_id, (change_id, action) in latest.items()),
+        key=lambda change: change[0],
+    )
+
+
+def _delta_records(model_class, columns, changes, typed):
+    """Yield ``(op, change_id, object_id, values)``; deletes have no values."""
+    for start in range(0, len(changes), DELTA_FETCH_SIZE):
+        chunk = changes[start:start + DELTA_FETCH_SIZE]
+        upsert_ids = [object_id for _, object_id, action in chunk if action == ExportChange.ACTION_UPSERT]
+        current = {}
+        if upsert_ids:
+            rows = iter_export_rows(
+                model_class.objects.filter(id__in=upsert_ids), columns,
+                typed=typed, convert=lambda value: value,
+            )
+            current = {int(row[0]): row for row in rows}
+        for change_id, object_id, action in chunk:
+            row = current.get(object_id)
+            if action == ExportChange.ACTION_UPSERT and row is not None:
+                yield ExportChange.ACTION_UPSERT, change_id, object_id, row
+            else:
+                # Deleted, or removed without signals after its last logged save.
+                yield ExportChange.ACTION_DELETE, change_id, object_id, None
+
+
+def _snapshot_records(model_class, columns, change_id, typed):
+    rows = iter_export_rows(model_class.objects.order_by('id'), columns, typed=typed, convert=lambda value: value)
+    for row in rows:
+        yield ExportChange.ACTION_UPSERT, change_id, int(row[0]), row
+
+
+def export_delta(out, consumer, model_name, file_format='csv', snapshot=False, commit=True):
+    """Write the rows of ``model_name`` that changed since ``consumer``'s watermark.
+
+    The first run for a consumer (or ``snapshot``) writes every current row;
+    later runs write one record per row created, changed or deleted since
+    the last run. Each record starts with ``_op`` (upsert/delete) and
+    ``_change_id``. ``out`` is a text file. With ``commit`` the watermark
+    moves to the newest change included, so the next run continues there.
+    """
+    if model_name not in DELTA_MODELS:
+        raise ValueError(f"Delta exports support {', '.join(DELTA_MODELS)}, not '{model_name}'.")
+    if file_format not in DELTA_FORMATS:
+        raise ValueError(f"Unknown delta format '{file_format}'.")
+
+    model_class = apps.get_model(*MODEL_MAP[model_name].split('.'))
+    watermark = ExportWatermark.objects.filter(consumer=consumer, model_name=model_name).first()
+    if watermark is None:
+        watermark = ExportWatermark(consumer=consumer, model_name=model_name)
+    # Changes logged after this point go to the next run. Very recent ones wait too: an
+    # id can be allocated by a transaction that commits after a later id is visible.
+    through_id = ExportChange.objects.filter(
+        model_name=model_name,
+        changed_at__lte=now() - timedelta(seconds=settings.EXPORT_DELTA_SETTLE_SECONDS),
+    ).aggregate(high=Max('id'))['high'] or 0
+    through_id = max(through_id, watermark.last_change_id)
+
+    columns = export_columns(model_class)
+    headers = [header for header, _, _ in columns]
+    typed = file_format == 'jsonl'
+    full = snapshot or watermark.last_run_at is None
+    if full:
+        records = _snapshot_records(model_class, columns, through_id, typed)
+    else:
+        changes = _latest_changes(model_name, watermark.last_change_id, through_id)
+        records = _delta_records(model_class, columns, changes, typed)
+
+    counts = {ExportChange.ACTION_UPSERT: 0, ExportChange.ACTION_DELETE: 0}
+    writer = csv.writer(out) if file_format == 'csv' else None
+    if writer:
+        writer.writerow(['_op', '_change_id'] + headers)
+    for op, change_id, object_id, row in records:
+        counts[op] += 1
+        if row is None:
+            # Export columns start with the primary key; a tombstone only has that.
+            row = [object_id] + [None] * (len(headers) - 1)
+        if writer:
+            writer.writerow([op, change_id] + ['' if value is None else value for value in row])
+        else:
+            record = {'_op': op, '_change_id': change_id}
+            record.update(zip(headers, row))
+            out.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+
+    summary = {
+        'consumer': consumer,
+        'model': model_name,
+        'snapshot': full,
+        'from_change': watermark.last_change_id,
+        'to_change': through_id,
+        'upserts': counts[ExportChange.ACTION_UPSERT],
+        'deletes': counts[ExportChange.ACTION_DELETE],
+    }
+    if commit:
+        watermark.last_change_id = through_id
+        watermark.last_run_at = now()
+        watermark.last_row_count = summary['upserts'] + summary['deletes']
+        watermark.save()
+    return summary
+
+
+def prune_export_changes(retention_days=None):
+    """Delete change log entries older than the retention period that every consumer has read."""
+    retention_days = retention_days or settings.EXPORT_CHANGE_RETENTION_DAYS
+    cutoff = now() - timedelta(days=retention_days)
+    deleted = 0
+    for model_name in DELTA_MODELS:
+        entries = ExportChange.objects.filter(model_name=model_name, changed_at__lt=cutoff)
+        oldest_read = ExportWatermark.objects.filter(model_name=model_name).aggregate(
+            low=Min('last_change_id'),
+        )['low']
+        if oldest_read is not None:
+            entries = entries.filter(id__lte=oldest_read)
+        deleted += entries.delete()[0]
+    # Label-only models have no consumers; keep their newest entry so report versions never go back.
+    for model_name in {name for names in LABEL_MODELS.values() for name in names} - set(DELTA_MODELS):
+        newest = data_version(model_name)
+        deleted += ExportChange.objects.filter(
+            model_name=model_name, changed_at__lt=cutoff, id__lt=newest,
+        ).delete()[0]
+    return deleted
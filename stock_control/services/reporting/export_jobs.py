@@ -0,0 +1,285 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, close_old_connections, transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.timezone import now
+
+from services.data_storage.models import ExportJob
+from services.reporting.bundles import (
+    BUNDLE_FORMATS,
+    BUNDLE_MODELS,
+    available_bundle_models,
+    columnar_available,
+    write_bundle,
+)
+from services.reporting.reporting import (
+    EXCEL_CONTENT_TYPE,
+    MODEL_MAP,
+    parse_rows_per_sheet,
+    report_column_names,
+    report_filters,
+    report_filename,
+    report_queryset,
+    write_report,
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {'csv': 'csv', 'excel': 'xlsx', 'bundle': 'zip'}
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+
+
+def _date_range(data):
+    try:
+        return _parse_date(data.get('start_date')), _parse_date(data.get('end_date'))
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format.")
+
+
+def bundle_params(data):
+    """Normalize the parameters of a multi-model ZIP bundle."""
+    chosen = data.getlist('bundle') if hasattr(data, 'getlist') else data.get('bundle', [])
+    names = [name for name in available_bundle_models() if name in chosen]
+    if not names:
+        raise ValueError("Choose at least one model for the bundle.")
+    bundle_format = data.get('bundle_format') or 'csv'
+    if bundle_format not in BUNDLE_FORMATS:
+        raise ValueError(f"Unknown bundle format '{bundle_format}'.")
+    if bundle_format != 'csv' and not columnar_available():
+        raise ValueError("Parquet and Feather bundles need pyarrow installed.")
+
+    params = {'model': 'Bundle', 'format': 'bundle', 'bundle_models': names, 'bundle_format': bundle_format}
+    start_date, end_date = _date_range(data)
+    if start_date:
+        params['start_date'] = start_date
+    if end_date:
+        params['end_date'] = end_date
+    return params
+
+
+def export_params(data):
+    """Normalize export parameters from a query dict; raises ValueError when invalid.
+
+    Empty filters are dropped so requests that differ only in blank fields
+    hash to the same job.
+    """
+    if data.get('download') == 'bundle':
+        return bundle_params(data)
+    model_name = data.get('model', 'Withdrawal')
+    if model_name not in MODEL_MAP:
+        raise ValueError(f"Unknown report model '{model_name}'.")
+    file_format = data.get('download')
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError("Choose CSV or Excel for the export.")
+    start_date, end_date = _date_range(data)
+
+    params = {'model': model_name, 'format': file_format}
+    if start_date:
+        params['start_date'] = start_date
+    if end_date:
+        params['end_date'] = end_date
+    filters = report_filters(model_name, data)
+    if filters:
+        params['filters'] = filters
+    columns = report_column_names(model_name, data)
+    if columns:
+        params['columns'] = columns
+    rows_per_sheet = parse_rows_per_sheet(data.get('rows_per_sheet'))
+    if file_format == 'excel' and rows_per_sheet:
+        params['rows_per_sheet'] = rows_per_sheet
+    return params
+
+
+def params_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def request_export(user, params):
+    """Queue an export, or return the user's queued/running job for the same parameters.
+
+    Returns ``(job, created)``.
+    """
+    digest = params_hash(params)
+    existing = ExportJob.objects.filter(
+        user=user, params_hash=digest, status__in=ExportJob.ACTIVE_STATUSES,
+    ).first()
+    if existing:
+        return existing, False
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                user=user,
+                model_name=params['model'],
+                file_format=params['format'],
+                params=json.dumps(params, sort_keys=True),
+                params_hash=digest,
+            )
+    except IntegrityError:
+        # A concurrent request queued the same export first.
+        return ExportJob.objects.get(
+            user=user, params_hash=digest, status__in=ExportJob.ACTIVE_STATUSES,
+        ), False
+    return job, True
+
+
+def export_path(job):
+    return os.path.join(settings.EXPORT_ROOT, job.file_name)
+
+
+def _claim(job_id):
+    """Mark a queued job as running; False when another worker got there first."""
+    return ExportJob.objects.filter(pk=job_id, status=ExportJob.STATUS_QUEUED).update(
+        status=ExportJob.STATUS_RUNNING, started_at=now(),
+    ) == 1
+
+
+def run_export_job(job_id):
+    """Claim a queued job and generate its file. Runs in a worker thread.
+
+    Returns the final status, or None when another worker claimed the job.
+    """
+    close_old_connections()
+    try:
+        if not _claim(job_id):
+            return None
+        job = ExportJob.objects.get(pk=job_id)
+        params = json.loads(job.params)
+        job.file_name = f"export_{job.pk}.{EXPORT_FORMATS[job.file_format]}"
+        path = export_path(job)
+        started = time.perf_counter()
+        try:
+            os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+            with open(path, 'wb') as out:
+                if job.file_format == 'bundle':
+                    rows = sum(write_bundle(
+                        out, params['bundle_models'], params['bundle_format'],
+                        params.get('start_date'), params.get('end_date'),
+                    ).values())
+                else:
+                    queryset = report_queryset(
+                        params['model'], params.get('start_date'), params.get('end_date'), params.get('filters'),
+                    )
+                    rows = write_report(out, params['model'], queryset, job.file_format,
+                                        rows_per_sheet=params.get('rows_per_sheet'),
+                                        column_names=params.get('columns'))
+        except Exception as exc:
+            logger.exception("Export job %s failed", job.pk)
+            if os.path.exists(path):
+                os.remove(path)
+            job.status = ExportJob.STATUS_FAILED
+            job.file_name = ''
+            job.error = str(exc)
+        else:
+            job.status = ExportJob.STATUS_DONE
+            job.row_count = rows
+            job.size_bytes = os.path.getsize(path)
+        job.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        job.finished_at = now()
+        job.save(update_fields=[
+            'status', 'file_name', 'row_count', 'size_bytes', 'duration_ms', 'error', 'finished_at',
+        ])
+        return job.status
+    finally:
+        close_old_connections()
+
+
+def requeue_stale_jobs(max_age_seconds=None):
+    """Put running jobs back in the queue when their worker died mid-export."""
+    max_age_seconds = max_age_seconds or settings.EXPORT_JOB_STALE_SECONDS
+    return ExportJob.objects.filter(
+        status=ExportJob.STATUS_RUNNING,
+        started_at__lt=now() - timedelta(seconds=max_age_seconds),
+    ).update(status=ExportJob.STATUS_QUEUED, started_at=None)
+
+
+def purge_expired_exports(retention_days=None):
+    """Delete finished jobs, and their files, older than the retention period."""
+    retention_days = retention_days or settings.EXPORT_RETENTION_DAYS
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.STATUS_DONE, ExportJob.STATUS_FAILED],
+        finished_at__lt=now() - timedelta(days=retention_days),
+    )
+    for job in expired.exclude(file_name=''):
+        path = export_path(job)
+        if os.path.exists(path):
+            os.remove(path)
+    return expired.delete()[0]
+
+
+def process_export_jobs(workers=None, limit=None):
+    """Run queued jobs, oldest first, on a thread pool; returns a status summary."""
+    workers = workers or settings.EXPORT_WORKERS
+    queued = ExportJob.objects.filter(status=ExportJob.STATUS_QUEUED).order_by('created_at')
+    job_ids = list(queued.values_list('id', flat=True)[:limit])
+
+    summary = {ExportJob.STATUS_DONE: 0, ExportJob.STATUS_FAILED: 0}
+    if not job_ids:
+        return summary
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for status in pool.map(run_export_job, job_ids):
+            if status:
+                summary[status] += 1
+    return summary
+
+
+def queue_export(request):
+    """Queue the export described by the download form (POST) and go to the user's exports."""
+    if request.method != 'POST':
+        return redirect('analytics:my_exports')
+    try:
+        params = export_params(request.POST)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect('analytics:my_exports' if request.POST.get('download') == 'bundle' else 'analytics:download_report')
+
+    job, created = request_export(request.user, params)
+    if created:
+        messages.success(request, f"{job.model_name} export queued. It will appear here when it is ready.")
+    else:
+        messages.info(request, f"An identical {job.model_name} export is already {job.get_status_display().lower()}.")
+    return redirect('analytics:my_exports')
+
+
+def my_exports(request):
+    jobs = list(ExportJob.objects.filter(user=request.user)[:50])
+    for job in jobs:
+        job.filters = json.loads(job.params)
+    bundle_formats = [
+        (value, label) for value, label in BUNDLE_FORMATS.items()
+        if value == 'csv' or columnar_available()
+    ]
+    return render(request, 'analytics/my_exports.html', {
+        'jobs': jobs,
+        'has_active_jobs': any(job.is_active for job in jobs),
+        'bundle_models': [(name, BUNDLE_MODELS[name][0]) for name in available_bundle_models()],
+        'bundle_formats': bundle_formats,
+    })
+
+
+def download_export(request, job_id):
+    job = get_object_or_404(ExportJob, pk=job_id, user=request.user, status=ExportJob.STATUS_DONE)
+    path = export_path(job)
+    if not os.path.exists(path):
+        raise Http404("The export file is no longer available.")
+    content_type = {'excel': EXCEL_CONTENT_TYPE, 'bundle': 'application/zip'}.get(job.file_format, 'text/csv')
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=True,
+        filename=report_filename(job.user, job.file_format, job.created_at),
+        content_type=content_type,
+    )
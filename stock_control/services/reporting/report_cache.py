@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import F, Q
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
+from django.utils.timezone import localdate, now
+
+from services.data_storage.models import ReportArtifact, ReportSchedule
+from services.reporting.deltas import data_version, report_version
+from services.reporting.export_jobs import export_params, params_hash
+from services.reporting.reporting import (
+    EXCEL_CONTENT_TYPE,
+    report_filename,
+    report_queryset,
+    write_report,
+)
+
+logger = logging.getLogger(__name__)
+
+CADENCES = {
+    ReportSchedule.CADENCE_HOURLY: timedelta(hours=1),
+    ReportSchedule.CADENCE_DAILY: timedelta(days=1),
+    ReportSchedule.CADENCE_WEEKLY: timedelta(days=7),
+}
+
+
+def cache_key(params, version):
+    return hashlib.sha256(f"{params_hash(params)}:{version}".encode('utf-8')).hexdigest()
+
+
+def artifact_path(artifact):
+    return os.path.join(settings.EXPORT_ROOT, 'cache', artifact.file_name)
+
+
+def schedule_params(schedule, today=None):
+    """The export params a schedule stands for today; a rolling window becomes fixed dates."""
+    params = json.loads(schedule.params)
+    window_days = params.pop('window_days', None)
+    if window_days:
+        today = today or localdate()
+        params['start_date'] = (today - timedelta(days=window_days)).isoformat()
+        params['end_date'] = today.isoformat()
+    return params
+
+
+def schedule_download_url(schedule, today=None):
+    """download_report query string that the schedule's artifact answers."""
+    params = schedule_params(schedule, today)
+    query = [('model', params['model']), ('download', params['format'])]
+    for name in ('start_date', 'end_date', 'rows_per_sheet'):
+        if params.get(name):
+            query.append((name, params[name]))
+    query.extend(sorted(params.get('filters', {}).items()))
+    query.extend(('columns', column) for column in params.get('columns', []))
+    return urlencode(query)
+
+
+def find_artifact(params):
+    """The cached file for these params at the report's current data version, if any."""
+    artifact = ReportArtifact.objects.filter(cache_key=cache_key(params, report_version(params['model']))).first()
+    if artifact and os.path.exists(artifact_path(artifact)):
+        return artifact
+    return None
+
+
+def cached_report_response(request):
+    """Serve a download_report request from a scheduled artifact; None on a miss."""
+    if request.GET.get('download') not in ('csv', 'excel'):
+        return None
+    try:
+        params = export_params(request.GET)
+    except ValueError:
+        return None
+    artifact = find_artifact(params)
+    if artifact is None:
+        return None
+
+    ReportArtifact.objects.filter(pk=artifact.pk).update(hits=F('hits') + 1, last_served_at=now())
+    content_type = EXCEL_CONTENT_TYPE if params['format'] == 'excel' else 'text/csv'
+    return FileResponse(
+        open(artifact_path(artifact), 'rb'),
+        as_attachment=True,
+        filename=report_filename(request.user, params['format']),
+        content_type=content_type,
+    )
+
+
+def generate_artifact(params):
+    """Return the artifact for ``params``, generating it only if the data changed.
+
+    Returns ``(artifact, generated)``.
+    """
+    key = cache_key(params, report_version(params['model']))
+    artifact = ReportArtifact.objects.filter(cache_key=key).first()
+    if artifact and os.path.exists(artifact_path(artifact)):
+        return artifact, False
+
+    extension = 'xlsx' if params['format'] == 'excel' else 'csv'
+    artifact = artifact or ReportArtifact(cache_key=key)
+    artifact.params = json.dumps(params, sort_keys=True)
+    artifact.data_version = data_version(params['model'])
+    artifact.file_name = f"{key}.{extension}"
+    path = artifact_path(artifact)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    started = time.perf_counter()
+    queryset = report_queryset(params['model'], params.get('start_date'), params.get('end_date'), params.get('filters'))
+    # Written under a temporary name so a download never sees a partial file.
+    with open(f"{path}.tmp", 'wb') as out:
+        artifact.row_count = write_report(out, params['model'], queryset, params['format'],
+                                          rows_per_sheet=params.get('rows_per_sheet'),
+                                          column_names=params.get('columns'))
+    os.replace(f"{path}.tmp", path)
+    artifact.size_bytes = os.path.getsize(path)
+    artifact.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    artifact.created_at = now()
+    artifact.save()
+    return artifact, True
+
+
+def run_due_schedules():
+    """Refresh every active schedule whose next run is due; returns a summary."""
+    summary = {'generated': 0, 'unchanged': 0, 'failed': 0}
+    current = now()
+    for schedule in ReportSchedule.objects.filter(is_active=True, next_run_at__lte=current):
+        try:
+            artifact, generated = generate_artifact(schedule_params(schedule))
+        except Exception:
+            logger.exception("Report schedule %s failed", schedule.pk)
+            summary['failed'] += 1
+        else:
+            summary['generated' if generated else 'unchanged'] += 1
+            schedule.last_artifact = artifact
+        schedule.last_run_at = current
+        # Keep the cadence's time of day instead of drifting by each run's delay.
+        while schedule.next_run_at <= current:
+            schedule.next_run_at += CADENCES[schedule.cadence]
+        schedule.save(update_fields=['last_artifact', 'last_run_at', 'next_run_at'])
+    return summary
+
+
+def prune_artifacts(retention_days=None):
+    """Delete artifacts past the retention period that no schedule currently points at."""
+    retention_days = retention_days or settings.EXPORT_RETENTION_DAYS
+    expired = ReportArtifact.objects.filter(
+        Q(last_served_at__isnull=True) | Q(last_served_at__lt=now() - timedelta(days=retention_days)),
+        created_at__lt=now() - timedelta(days=retention_days),
+        schedules__isnull=True,
+    )
+    deleted = 0
+    for artifact in expired:
+        path = artifact_path(artifact)
+        if os.path.exists(path):
+            os.remove(path)
+        artifact.delete()
+        deleted += 1
+    return deleted
+
+
+def report_schedules(request):
+    schedules = list(ReportSchedule.objects.select_related('created_by', 'last_artifact'))
+    today = localdate()
+    for schedule in schedules:
+        schedule.current_params = schedule_params(schedule, today)
+        schedule.window_days = json.loads(schedule.params).get('window_days')
+        schedule.download_query = schedule_download_url(schedule, today)
+        # The cached file only answers requests while the data is unchanged.
+        artifact = schedule.last_artifact
+        schedule.is_fresh = bool(
+            artifact
+            and artifact.cache_key == cache_key(schedule.current_params, report_version(schedule.model_name))
+        )
+    return render(request, 'analytics/report_schedules.html', {
+        'schedules': schedules,
+        'cadences': ReportSchedule.CADENCE_CHOICES,
+    })
+
+
+def create_schedule(request):
+    """Save the report currently shown on the download page as a schedule (POST)."""
+    if request.method != 'POST':
+        return redirect('analytics:report_schedules')
+    data = request.POST.copy()
+    data['download'] = data.get('schedule_format', 'csv')
+    try:
+        params = export_params(data)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect('analytics:report_schedules')
+    try:
+        window_days = int(data.get('window_days') or 0)
+    except ValueError:
+        messages.error(request, "The rolling window must be a whole number of days.")
+        return redirect('analytics:report_schedules')
+    name = (data.get('name') or '').strip()
+    cadence = data.get('cadence')
+    if not name or cadence not in CADENCES:
+        messages.error(request, "Give the schedule a name and a cadence.")
+        return redirect('analytics:report_schedules')
+    if window_days > 0:
+        params.pop('start_date', None)
+        params.pop('end_date', None)
+        params['window_days'] = window_days
+
+    ReportSchedule.objects.create(
+        name=name,
+        created_by=request.user,
+        model_name=params['model'],
+        file_format=params['format'],
+        params=json.dumps(params, sort_keys=True),
+        cadence=cadence,
+    )
+    messages.success(request, f"Scheduled \"{name}\". The first file will be ready shortly.")
+    return redirect('analytics:report_schedules')
+
+
+def update_schedule(request, schedule_id):
+    """Pause, resume or delete a schedule (POST)."""
+    schedule = get_object_or_404(ReportSchedule, pk=schedule_id)
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'delete':
+            schedule.delete()
+            messages.success(request, f"Deleted schedule \"{schedule.name}\".")
+        elif action in ('pause', 'resume'):
+            schedule.is_active = action == 'resume'
+            schedule.save(update_fields=['is_active'])
+    return redirect('analytics:report_schedules')
@@ -1,12 +1,14 @@
 import io
 import csv
-import zipfile
 import datetime
+import tempfile
 from django.apps import apps
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from django.utils.timezone import make_aware
-from openpyxl import Workbook
 from django.utils.timezone import now
 
 from services.data_storage.models import Product, Withdrawal, PurchaseOrder  # Adjust as needed
@@ -26,78 +28,381 @@ FILTER_FIELDS = {
     # Product has no date field to filter
 }
 
+# Server-side filters per model: name -> (label, lookups). A value matches when any
+# lookup matches; the first lookup is compared case-insensitively, the rest by substring.
+REPORT_FILTERS = {
+    'Withdrawal': {
+        'product': ('Product (code or name)', ('product_code', 'product_name')),
+        'user': ('User', ('user__username',)),
+        'lot': ('Lot', ('lot_number',)),
+        'type': ('Type', ('withdrawal_type',)),
+    },
+    'PurchaseOrder': {
+        'product': ('Product (code or name)', ('product_code', 'product_name')),
+        'user': ('Ordered By', ('ordered_by__username',)),
+        'lot': ('Lot', ('lot_number',)),
+        'type': ('Status', ('status',)),
+    },
+    'Product': {
+        'product': ('Product (code or name)', ('product_code', 'name')),
+        'type': ('Supplier', ('supplier',)),
+    },
+}
+
+PREVIEW_PAGE_SIZE = 50
+# Previews count matching rows up to this limit; beyond it the count is estimated.
+PREVIEW_COUNT_LIMIT = 10000
+
+# Foreign keys are exported as their display text, built from joined columns so a
+# row never loads its related objects. Each entry mirrors the related model's __str__.
+FK_EXPORT_LABELS = {
+    'data_storage.ProductItem': (('product__name', 'lot_number'), "{0} (Lot {1})"),
+    'data_storage.Product': (('product_code', 'name'), "{0} - {1}"),
+    'data_storage.PurchaseOrder': (('id', 'product_name', 'lot_number'), "PO-{0} for {1} (Lot {2})"),
+    'data_storage.Supplier': (('name',), "{0}"),
+    'data_storage.Location': (('name',), "{0}"),
+    'auth.User': (('username',), "{0}"),
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Excel's hard limit is 1,048,576 rows per sheet, one of which holds the header.
+EXCEL_MAX_ROWS_PER_SHEET = 1048575
+
+
+def export_columns(model_class, selected=None):
+    """Return ``(header, lookups, template)`` for every exported column of a model.
+
+    ``selected`` limits the columns to those field names, in model order.
+    """
+    columns = []
+    for field in model_class._meta.fields:
+        if selected and field.name not in selected:
+            continue
+        if field.is_relation:
+            label = FK_EXPORT_LABELS.get(field.related_model._meta.label)
+            if label:
+                paths, template = label
+                columns.append((field.name, tuple(f"{field.name}__{path}" for path in paths), template))
+            else:
+                columns.append((field.name, (field.attname,), "{0}"))
+        else:
+            columns.append((field.name, (field.name,), "{0}"))
+    return columns
+
+
+def excel_value(value):
+    """Convert a database value to something openpyxl can store as a typed cell."""
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        # Excel has no time zones; store the local wall-clock time.
+        return timezone.make_naive(value)
+    if value is None or isinstance(value, (int, float, datetime.date, datetime.time, datetime.timedelta)):
+        return value
+    if hasattr(value, 'as_tuple'):  # Decimal
+        return value
+    return str(value)
+
+
+def iter_export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE, typed=False, convert=excel_value):
+    """Yield rows from a single ``values_list`` query.
+
+    By default every cell is display text, as in the CSV export. With
+    ``typed`` plain columns keep their database type (numbers, dates),
+    passed through ``convert``, and empty values stay empty; foreign keys
+    are still exported as labels.
+    """
+    lookups = [lookup for _, column_lookups, _ in columns for lookup in column_lookups]
+    for values in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        row = []
+        position = 0
+        for _, column_lookups, template in columns:
+            parts = values[position:position + len(column_lookups)]
+            position += len(column_lookups)
+            if typed:
+                if parts[0] is None:
+                    row.append(None)
+                elif len(parts) == 1 and template == "{0}":
+                    row.append(convert(parts[0]))
+                else:
+                    row.append(template.format(*parts))
+            else:
+                # A null foreign key renders as "None", as str() of the missing object did.
+                row.append(str(None) if parts[0] is None else template.format(*parts))
+        yield row
+
+
+def stream_csv(header, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV text in chunks of ``chunk_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_excel(target, title, header, rows, rows_per_sheet=None):
+    """Write rows to a write-only workbook, starting a new sheet every ``rows_per_sheet`` rows.
+
+    Write-only worksheets flush each row to disk as it is appended, so memory
+    stays flat however many rows there are. ``target`` is a path or a binary
+    file object. Returns the number of data rows written.
+    """
+    # openpyxl pulls in numpy, so only Excel exports pay for it.
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    rows_per_sheet = min(rows_per_sheet or settings.EXPORT_EXCEL_ROWS_PER_SHEET, EXCEL_MAX_ROWS_PER_SHEET)
+    wb = Workbook(write_only=True)
+    ws = None
+    written = 0
+    for row in rows:
+        if written % rows_per_sheet == 0:
+            sheet_number = written // rows_per_sheet + 1
+            ws = wb.create_sheet(title=title if sheet_number == 1 else f"{title} ({sheet_number})")
+            ws.append(header)
+        ws.append([
+            ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+            for value in row
+        ])
+        written += 1
+    if ws is None:
+        wb.create_sheet(title=title).append(header)
+    wb.save(target)
+    return written
+
+
+def report_filters(selected_model, data):
+    """The non-empty filters for a model from a query dict."""
+    filters = {}
+    for name in REPORT_FILTERS.get(selected_model, {}):
+        value = (data.get(name) or '').strip()
+        if value:
+            filters[name] = value
+    return filters
+
+
+def report_column_names(selected_model, data):
+    """Column names chosen in a query dict; empty when all columns are wanted."""
+    model_class = apps.get_model(*MODEL_MAP[selected_model].split('.'))
+    names = {field.name for field in model_class._meta.fields}
+    chosen = [name for name in data.getlist('columns') if name in names] if hasattr(data, 'getlist') else []
+    return chosen if len(chosen) < len(names) else []
+
+
+def filter_date_range(queryset, date_field, start_date=None, end_date=None):
+    """Filter on ``date_field`` between two ``YYYY-MM-DD`` strings, either of which may be empty."""
+    if start_date:
+        queryset = queryset.filter(
+            **{f"{date_field}__gte": make_aware(datetime.datetime.strptime(start_date, "%Y-%m-%d"))}
+        )
+    if end_date:
+        queryset = queryset.filter(
+            **{f"{date_field}__lte": make_aware(datetime.datetime.strptime(end_date, "%Y-%m-%d"))}
+        )
+    return queryset
+
+
+def report_queryset(selected_model, start_date=None, end_date=None, filters=None):
+    """Rows of a report model, newest first, filtered by its date field when it has one.
+
+    ``filters`` maps names from REPORT_FILTERS to the values to match.
+    """
+    model_class = apps.get_model(*MODEL_MAP[selected_model].split('.'))
+    queryset = model_class.objects.all()
+    if selected_model in FILTER_FIELDS:
+        queryset = filter_date_range(queryset, FILTER_FIELDS[selected_model], start_date, end_date)
+
+    for name, value in (filters or {}).items():
+        _, lookups = REPORT_FILTERS[selected_model][name]
+        condition = Q(**{f"{lookups[0]}__iexact": value})
+        for lookup in lookups[1:]:
+            condition |= Q(**{f"{lookup}__icontains": value})
+        queryset = queryset.filter(condition)
+
+    return queryset.order_by('-id')
+
+
+def write_report(target, selected_model, queryset, download_type, rows_per_sheet=None, column_names=None):
+    """Write a report as CSV or Excel to a binary file object; returns the row count."""
+    columns = export_columns(queryset.model, column_names)
+    header = [name for name, _, _ in columns]
+    if download_type == 'excel':
+        return write_excel(
+            target, selected_model, header,
+            iter_export_rows(queryset, columns, typed=True),
+            rows_per_sheet=rows_per_sheet,
+        )
+
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for row in rows:
+            written += 1
+            yield row
+
+    for chunk in stream_csv(header, counted(iter_export_rows(queryset, columns))):
+        target.write(chunk.encode('utf-8'))
+    return written
+
+
+def report_filename(user, download_type, day=None):
+    """Download name for a report, e.g. ``IMS_alice_20250101.csv``."""
+    user_part = user.username if user.is_authenticated else "anonymous"
+    date_part = (day or now()).strftime("%Y%m%d")
+    extension = {'excel': 'xlsx', 'bundle': 'zip'}.get(download_type, 'csv')
+    return f"IMS_{user_part}_{date_part}.{extension}"
+
+
+def preview_page(queryset, columns, after=None, before=None, page_size=PREVIEW_PAGE_SIZE):
+    """One page of preview rows using keyset pagination on ``-id``.
+
+    ``after`` continues below that id (next page), ``before`` above it
+    (previous page), so each page costs one indexed range scan however
+    deep it is. Returns ``(rows, next_after, previous_before)``; the cursors
+    are None on the last and first pages.
+    """
+    id_column = ('id', ('id',), "{0}")
+    if before is not None:
+        page = queryset.filter(id__gt=before).order_by('id')[:page_size + 1]
+    else:
+        if after is not None:
+            queryset = queryset.filter(id__lt=after)
+        page = queryset.order_by('-id')[:page_size + 1]
+    rows = [(int(row[0]), row[1:]) for row in iter_export_rows(page, [id_column] + list(columns))]
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if before is not None:
+        rows.reverse()
+        has_next, has_previous = True, more
+    else:
+        has_next, has_previous = more, after is not None
+    if not rows:
+        return rows, None, None
+    return rows, rows[-1][0] if has_next else None, rows[0][0] if has_previous else None
+
+
+def estimate_row_count(queryset, filtered):
+    """Count rows up to PREVIEW_COUNT_LIMIT; returns ``(count, kind)``.
+
+    ``kind`` is 'exact', 'estimate' or 'at_least'. Larger unfiltered tables
+    are estimated from the id range, which only reads the ends of the
+    primary key index; larger filtered results report the limit.
+    """
+    count = queryset.order_by()[:PREVIEW_COUNT_LIMIT + 1].count()
+    if count <= PREVIEW_COUNT_LIMIT:
+        return count, 'exact'
+    if not filtered:
+        bounds = queryset.order_by().aggregate(low=Min('id'), high=Max('id'))
+        return max(bounds['high'] - bounds['low'] + 1, count), 'estimate'
+    return PREVIEW_COUNT_LIMIT, 'at_least'
+
+
+def _cursor(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_rows_per_sheet(value):
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return 0
+
+
 def download_report(request):
     selected_model = request.GET.get('model', 'Withdrawal')
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     download_type = request.GET.get('download')
 
-    preview_model_class = apps.get_model(*MODEL_MAP[selected_model].split('.'))
-    preview_fields = [f.name for f in preview_model_class._meta.fields]
+    filters = report_filters(selected_model, request.GET)
+    column_names = report_column_names(selected_model, request.GET)
 
-    preview_queryset = preview_model_class.objects.all()
-
-    # Filter preview table if model supports date filtering
-    if selected_model in FILTER_FIELDS:
-        date_field = FILTER_FIELDS[selected_model]
-        if start_date:
-            preview_queryset = preview_queryset.filter(
-                **{f"{date_field}__gte": make_aware(datetime.datetime.strptime(start_date, "%Y-%m-%d"))}
-            )
-        if end_date:
-            preview_queryset = preview_queryset.filter(
-                **{f"{date_field}__lte": make_aware(datetime.datetime.strptime(end_date, "%Y-%m-%d"))}
-            )
-
-    # ✅ THEN slice it
-    preview_queryset = preview_queryset.order_by('-id')
+    preview_queryset = report_queryset(selected_model, start_date, end_date, filters)
+    preview_model_class = preview_queryset.model
+    preview_fields = [f.name for f in preview_model_class._meta.fields]
 
 
     # Handle Excel or CSV download
     if download_type in ['excel', 'csv']:
         model_class = preview_model_class
-        fields = preview_fields
         qs = preview_queryset
-
-        # Build filename
-        user_part = request.user.username if request.user.is_authenticated else "anonymous"
-        date_part = now().strftime("%Y%m%d")
+        filename = report_filename(request.user, download_type)
 
         if download_type == 'excel':
-            wb = Workbook()
-            ws = wb.create_sheet(title=selected_model)
-            ws.append(fields)
-            for obj in qs:
-                ws.append([str(getattr(obj, field, '')) for field in fields])
-
-            # Remove the default sheet
-            if "Sheet" in wb.sheetnames:
-                wb.remove(wb["Sheet"])
-
-            out = io.BytesIO()
-            wb.save(out)
+            # The workbook is built in a temporary file that is removed once the response closes it.
+            out = tempfile.TemporaryFile(suffix='.xlsx')
+            write_report(out, selected_model, qs, download_type,
+                         rows_per_sheet=parse_rows_per_sheet(request.GET.get('rows_per_sheet')),
+                         column_names=column_names)
             out.seek(0)
-            response = HttpResponse(out, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename=IMS_{user_part}_{date_part}.xlsx'
-            return response
+            return FileResponse(
+                out,
+                as_attachment=True,
+                filename=filename,
+                content_type=EXCEL_CONTENT_TYPE,
+            )
 
         elif download_type == 'csv':
-            csv_buffer = io.StringIO()
-            writer = csv.writer(csv_buffer)
-            writer.writerow(fields)
-            for obj in qs:
-                writer.writerow([str(getattr(obj, field, '')) for field in fields])
-
-            csv_buffer.seek(0)
-            response = HttpResponse(csv_buffer.getvalue(), content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename=IMS_{user_part}_{date_part}.csv'
+            columns = export_columns(model_class, column_names)
+            response = StreamingHttpResponse(
+                stream_csv([header for header, _, _ in columns], iter_export_rows(qs, columns)),
+                content_type='text/csv',
+            )
+            response['Content-Disposition'] = f'attachment; filename={filename}'
             return response
 
+    columns = export_columns(preview_model_class, column_names)
+    rows, next_after, previous_before = preview_page(
+        preview_queryset, columns,
+        after=_cursor(request.GET.get('after')),
+        before=_cursor(request.GET.get('before')),
+    )
+    row_count, row_count_kind = estimate_row_count(preview_queryset, bool(filters or start_date or end_date))
+
+    # Pagination links keep every parameter except the cursors (and the token the form carries for its POST buttons).
+    page_query = request.GET.copy()
+    for key in ('after', 'before', 'download', 'csrfmiddlewaretoken'):
+        page_query.pop(key, None)
+
+    # The schedule form posts the report currently shown.
+    schedule_fields = [(key, value) for key, values in page_query.lists() for value in values]
+
+    filter_inputs = []
+    for name, (label, lookups) in REPORT_FILTERS.get(selected_model, {}).items():
+        field = preview_model_class._meta.get_field(lookups[0].split('__')[0])
+        filter_inputs.append({
+            'name': name,
+            'label': label,
+            'value': filters.get(name, ''),
+            'choices': field.choices if not field.is_relation else None,
+        })
+
     return render(request, 'analytics/download_report.html', {
         'models': MODEL_MAP.keys(),
         'selected_model': selected_model,
         'fields': preview_fields,
-        'data': preview_queryset,
+        'columns': [header for header, _, _ in columns],
+        'selected_columns': column_names,
+        'filter_inputs': filter_inputs,
+        'rows': rows,
+        'next_after': next_after,
+        'previous_before': previous_before,
+        'page_query': page_query.urlencode(),
+        'schedule_fields': schedule_fields,
+        'row_count': row_count,
+        'row_count_kind': row_count_kind,
         'start_date': start_date,
         'end_date': end_date,
     })
@@ -14,5 +14,11 @@ urlpatterns = [
         name="inventory_analysis_forecasting",
     ),
     path("reports/download/", views.download_report, name="download_report"),
+    path("reports/exports/queue/", views.queue_export, name="queue_export"),
+    path("reports/exports/", views.my_exports, name="my_exports"),
+    path("reports/exports/<int:job_id>/download/", views.download_export, name="download_export"),
+    path("reports/schedules/", views.report_schedules, name="report_schedules"),
+    path("reports/schedules/new/", views.create_schedule, name="create_schedule"),
+    path("reports/schedules/<int:schedule_id>/", views.update_schedule, name="update_schedule"),
     path("intelligence/", views.intelligence, name="intelligence"),
 ]
@@ -5,6 +5,7 @@ from django.shortcuts import render
 from django.utils.timezone import now
 
 from inventory.access_control import group_required
+from inventory.location_scope import resolve_location_scope
 from inventory.roles import (
     ROLE_INVENTORY_MANAGER,
     ROLE_STAFF,
@@ -15,7 +16,19 @@ from inventory.roles import (
 from services.analysis.analysis import (
     inventory_analysis_forecasting as _inventory_analysis_forecasting,
 )
-from services.data_storage.models import Product, ProductItem, Withdrawal, Location
+from services.data_storage.models import ForecastResult, Product, ProductItem, Withdrawal, Location
+from services.location_rollups.location_rollups import products_in_locations
+from services.reporting.export_jobs import (
+    download_export as _download_export,
+    my_exports as _my_exports,
+    queue_export as _queue_export,
+)
+from services.reporting.report_cache import (
+    cached_report_response,
+    create_schedule as _create_schedule,
+    report_schedules as _report_schedules,
+    update_schedule as _update_schedule,
+)
 from services.reporting.reporting import download_report as _download_report
 from django.db.models import Sum, F
 from decimal import Decimal
@@ -40,7 +53,44 @@ def inventory_analysis_forecasting(request):
 @login_required
 @user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
 def download_report(request):
-    return _download_report(request)
+    # Scheduled reports answer matching downloads from their cached file.
+    return cached_report_response(request) or _download_report(request)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def report_schedules(request):
+    return _report_schedules(request)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def create_schedule(request):
+    return _create_schedule(request)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def update_schedule(request, schedule_id):
+    return _update_schedule(request, schedule_id)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def queue_export(request):
+    return _queue_export(request)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def my_exports(request):
+    return _my_exports(request)
+
+
+@login_required
+@user_passes_test(is_inventory_admin, login_url="inventory:dashboard")
+def download_export(request, job_id):
+    return _download_export(request, job_id)
 
 
 @login_required
@@ -53,13 +103,18 @@ def track_withdrawals(request):
     staff_only = user_has_role(request.user, ROLE_STAFF) and not user_is_inventory_manager(request.user)
     if staff_only:
         withdrawals = withdrawals.filter(user=request.user)
+    location_scope = resolve_location_scope(request)
+    if location_scope.is_scoped:
+        withdrawals = withdrawals.filter(
+            product_item__product_id__in=products_in_locations(location_scope.location_ids)
+        )
     for withdrawal in withdrawals:
         withdrawal.full_items = withdrawal.get_full_items_withdrawn()
         withdrawal.partial_items = withdrawal.get_partial_items_withdrawn()
     return render(
         request,
         "analytics/track_withdrawals.html",
-        {"withdrawals": withdrawals, "staff_only": staff_only},
+        {"withdrawals": withdrawals, "staff_only": staff_only, "location_scope": location_scope},
     )
 
 
@@ -80,6 +135,13 @@ def track_low_lots(request):
                 }
             )
 
+    forecasts = ForecastResult.objects.filter(
+        product_id__in=[entry["product"].id for entry in low_lots]
+    ).only("product_id", "run_out_date", "reorder_date")
+    forecast_map = {forecast.product_id: forecast for forecast in forecasts}
+    for entry in low_lots:
+        entry["forecast"] = forecast_map.get(entry["product"].id)
+
     low_lots.sort(key=lambda entry: entry["total_stock"])
     return render(
         request,
@@ -5,3 +5,6 @@ class LocationTrackingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "solutions.location_tracking"
     verbose_name = "Location Tracking"
+
+    def ready(self):
+        from . import signals  # noqa: F401
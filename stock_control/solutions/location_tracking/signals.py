@@ -0,0 +1,46 @@
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.data_storage.models import ProductItem
+from services.live_feed.live_feed import publish_location_change
+from services.location_rollups.location_rollups import schedule_rollup_refresh
+
+from .models import LocationStock
+
+
+def _location_event_payload(location_id, product_item_id):
+    stock = (
+        LocationStock.objects.filter(location_id=location_id, product_item_id=product_item_id)
+        .values_list("quantity", flat=True)
+        .first()
+    )
+    location_total = LocationStock.objects.filter(location_id=location_id).aggregate(total=Sum("quantity"))["total"]
+    return {
+        "location_id": location_id,
+        "product_item_id": product_item_id,
+        "quantity": str(stock) if stock is not None else None,
+        "location_total": str(location_total or 0),
+    }
+
+
+@receiver(post_save, sender=LocationStock)
+@receiver(post_delete, sender=LocationStock)
+def refresh_rollups_on_location_stock_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        product_id = instance.product_item.product_id
+    except ProductItem.DoesNotExist:
+        # The lot itself is being deleted; its own signal refreshes the product.
+        return
+    schedule_rollup_refresh([product_id])
+
+
+@receiver(post_save, sender=LocationStock)
+@receiver(post_delete, sender=LocationStock)
+def publish_location_stock_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    location_id, product_item_id = instance.location_id, instance.product_item_id
+    publish_location_change(lambda: _location_event_payload(location_id, product_item_id))
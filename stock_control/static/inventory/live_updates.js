@@ -0,0 +1,62 @@
+// Patches stock numbers in place from the shared Server-Sent Events feed.
+// Elements opt in with data attributes:
+//   data-live-product-total / -full-items / -remaining-parts="<product id>"
+//   data-live-location-total="<location id>"
+//   data-live-location-stock="<location id>-<product item id>"
+//   data-live-alert="<alert type>"   (status indicator dot)
+// Other scripts can react via the "stock-event" DOM event.
+window.addEventListener("load", function () {
+    const feedUrl = document.body.dataset.liveFeedUrl;
+    if (!feedUrl || !window.EventSource) {
+        return;
+    }
+
+    function patch(selector, value) {
+        document.querySelectorAll(selector).forEach((el) => {
+            if (el.textContent === String(value)) {
+                return;
+            }
+            el.textContent = value;
+            el.classList.add("live-updated");
+            setTimeout(() => el.classList.remove("live-updated"), 1500);
+        });
+    }
+
+    function announce(type, data) {
+        document.dispatchEvent(new CustomEvent("stock-event", { detail: { type: type, data: data } }));
+    }
+
+    const source = new EventSource(feedUrl);
+
+    source.addEventListener("lot", function (event) {
+        const data = JSON.parse(event.data);
+        patch(`[data-live-product-total="${data.product_id}"]`, data.product_total_stock);
+        patch(`[data-live-product-full-items="${data.product_id}"]`, data.product_full_items);
+        patch(`[data-live-product-remaining-parts="${data.product_id}"]`, data.product_remaining_parts);
+        announce("lot", data);
+    });
+
+    source.addEventListener("location", function (event) {
+        const data = JSON.parse(event.data);
+        patch(`[data-live-location-total="${data.location_id}"]`, data.location_total);
+        if (data.quantity !== null) {
+            patch(`[data-live-location-stock="${data.location_id}-${data.product_item_id}"]`, data.quantity);
+        }
+        announce("location", data);
+    });
+
+    source.addEventListener("alert", function (event) {
+        const data = JSON.parse(event.data);
+        Object.entries(data.open_counts).forEach(([alertType, count]) => {
+            document.querySelectorAll(`[data-live-alert="${alertType}"]`).forEach((el) => {
+                el.classList.toggle("blinking-red", count > 0);
+                el.classList.toggle("green", count === 0);
+            });
+        });
+        document.querySelectorAll(".alert-badge").forEach((el) => {
+            el.textContent = data.unacknowledged;
+            el.hidden = data.unacknowledged === 0;
+        });
+        announce("alert", data);
+    });
+});
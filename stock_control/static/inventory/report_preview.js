@@ -1,3 +1,10 @@
 document.getElementById('modelSelect').addEventListener('change', function () {
+  // Columns and filters belong to the previous model; start the new one unfiltered.
+  document.querySelectorAll('#downloadForm input[name="columns"]').forEach(function (box) {
+    box.checked = false;
+  });
+  document.querySelectorAll('#downloadForm .report-filter').forEach(function (input) {
+    input.value = '';
+  });
   document.getElementById('downloadForm').submit();
 });
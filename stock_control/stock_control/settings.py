@@ -88,6 +88,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'inventory.context_processors.module_flags',
+                'inventory.context_processors.alert_summary',
             ],
         },
     },
@@ -207,3 +208,82 @@ DATA_OUTPUT_FUZZY_THRESHOLD = float(os.getenv("DATA_OUTPUT_FUZZY_THRESHOLD", "0.
 DATA_OUTPUT_RESPONSE_THRESHOLD = float(
     os.getenv("DATA_OUTPUT_RESPONSE_THRESHOLD", "0.6")
 )
+# Names sharing the most trigrams with a query that are scored in full
+DATA_OUTPUT_MATCH_CANDIDATES = int(os.getenv("DATA_OUTPUT_MATCH_CANDIDATES", "20"))
+# Ranked candidates returned per lookup (MQTT responses and the product search endpoint)
+DATA_OUTPUT_TOP_K = int(os.getenv("DATA_OUTPUT_TOP_K", "5"))
+# Recent lookups whose results are kept, keyed on the query with case, spacing and
+# punctuation folded; cleared by any product change (0 disables the cache)
+DATA_OUTPUT_MATCH_CACHE_SIZE = int(os.getenv("DATA_OUTPUT_MATCH_CACHE_SIZE", "4096"))
+# Listener threads answering checks, checks allowed to wait for one, and what happens
+# to a check arriving at a full queue ("busy" answers it with status busy, "drop" ignores it)
+DATA_OUTPUT_WORKERS = int(os.getenv("DATA_OUTPUT_WORKERS", "4"))
+DATA_OUTPUT_QUEUE_LIMIT = int(os.getenv("DATA_OUTPUT_QUEUE_LIMIT", "200"))
+DATA_OUTPUT_OVERFLOW = os.getenv("DATA_OUTPUT_OVERFLOW", "busy")
+# Most items one batch check message may carry
+DATA_OUTPUT_BATCH_LIMIT = int(os.getenv("DATA_OUTPUT_BATCH_LIMIT", "200"))
+# Listener metrics: seconds between stats log lines, local port serving /metrics (0 disables it),
+# file rewritten with the same text every stats interval (empty disables it), and the share of
+# messages whose per-message log lines are written
+DATA_OUTPUT_STATS_SECONDS = float(os.getenv("DATA_OUTPUT_STATS_SECONDS", "60"))
+DATA_OUTPUT_METRICS_PORT = int(os.getenv("DATA_OUTPUT_METRICS_PORT", "9108"))
+DATA_OUTPUT_METRICS_FILE = os.getenv("DATA_OUTPUT_METRICS_FILE", "")
+DATA_OUTPUT_LOG_SAMPLE_RATE = float(os.getenv("DATA_OUTPUT_LOG_SAMPLE_RATE", "0.01"))
+# Seconds between checks for product changes to apply to the in-memory name index
+DATA_OUTPUT_INDEX_REFRESH_SECONDS = float(os.getenv("DATA_OUTPUT_INDEX_REFRESH_SECONDS", "5"))
+# Outbound stock events (data_output_publisher): retained topics per lot, per low-stock product
+# and per expired lot, formatted with {product_id} and {product_item_id}, e.g.
+# "inventory/stock/{product_id}/{product_item_id}". They carry product names, lots and stock
+# levels, so all are empty (disabled) until set for a private broker, and the publisher refuses
+# to run against a public one. Changes to one lot within the coalesce window are published
+# once, with its latest state
+DATA_OUTPUT_STOCK_TOPIC = os.getenv("DATA_OUTPUT_STOCK_TOPIC", "")
+DATA_OUTPUT_LOW_STOCK_TOPIC = os.getenv("DATA_OUTPUT_LOW_STOCK_TOPIC", "")
+DATA_OUTPUT_EXPIRY_TOPIC = os.getenv("DATA_OUTPUT_EXPIRY_TOPIC", "")
+DATA_OUTPUT_PUBLISH_COALESCE_SECONDS = float(os.getenv("DATA_OUTPUT_PUBLISH_COALESCE_SECONDS", "2"))
+DATA_OUTPUT_PUBLISH_POLL_SECONDS = float(os.getenv("DATA_OUTPUT_PUBLISH_POLL_SECONDS", "1"))
+
+
+# Seconds a stock write waits before its alert types are swept, so bursts share one sweep
+ALERT_SWEEP_DEBOUNCE_SECONDS = float(os.getenv("ALERT_SWEEP_DEBOUNCE_SECONDS", "2"))
+# Seconds a stock write waits before its products' location rollups are refreshed
+LOCATION_ROLLUP_DEBOUNCE_SECONDS = float(os.getenv("LOCATION_ROLLUP_DEBOUNCE_SECONDS", "2"))
+
+# Dashboard widgets (seconds each widget payload stays cached when no per-widget TTL is set)
+DASHBOARD_WIDGET_CACHE_SECONDS = int(os.getenv("DASHBOARD_WIDGET_CACHE_SECONDS", "60"))
+
+# Live feed (Server-Sent Events of stock changes)
+LIVE_FEED_POLL_SECONDS = float(os.getenv("LIVE_FEED_POLL_SECONDS", "1.0"))
+LIVE_FEED_HEARTBEAT_SECONDS = int(os.getenv("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+LIVE_FEED_MAX_STREAM_SECONDS = int(os.getenv("LIVE_FEED_MAX_STREAM_SECONDS", "1800"))
+LIVE_FEED_RETENTION_HOURS = int(os.getenv("LIVE_FEED_RETENTION_HOURS", "24"))
+
+# Per-product forecasting (run_forecasts command)
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+FORECAST_HORIZON_DAYS = int(os.getenv("FORECAST_HORIZON_DAYS", "30"))
+# 0 uses one worker process per CPU core
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "0"))
+# Full refit when a cached fit is this old, or its recent error exceeds the fit error by this ratio
+FORECAST_REFIT_MAX_AGE_DAYS = int(os.getenv("FORECAST_REFIT_MAX_AGE_DAYS", "30"))
+FORECAST_DRIFT_RATIO = float(os.getenv("FORECAST_DRIFT_RATIO", "1.5"))
+# Target service level for safety stock in reorder planning (probability of not stocking out during lead time)
+FORECAST_SERVICE_LEVEL = float(os.getenv("FORECAST_SERVICE_LEVEL", "0.95"))
+# Backtesting: the cheapest model with MASE at or below this bar is selected per product
+FORECAST_MASE_BAR = float(os.getenv("FORECAST_MASE_BAR", "1.0"))
+
+# Start-up budget enforced by `manage.py check_startup_budget` (check, web worker, MQTT listener)
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+STARTUP_BUDGET_RSS_MB = float(os.getenv("STARTUP_BUDGET_RSS_MB", "80"))
+
+# Report exports: rows per Excel sheet before a large export continues on a new sheet
+EXPORT_EXCEL_ROWS_PER_SHEET = int(os.getenv("EXPORT_EXCEL_ROWS_PER_SHEET", "1000000"))
+# Background export jobs (process_export_jobs command): file directory, worker threads,
+# seconds before a running job whose worker died is requeued, and days finished exports are kept
+EXPORT_ROOT = os.getenv("EXPORT_ROOT", os.path.join(BASE_DIR, "exports"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_JOB_STALE_SECONDS = int(os.getenv("EXPORT_JOB_STALE_SECONDS", "3600"))
+EXPORT_RETENTION_DAYS = int(os.getenv("EXPORT_RETENTION_DAYS", "7"))
+# Delta exports (export_delta command): days change log entries are kept once every consumer
+# has read them, and seconds a change must age before a run includes it
+EXPORT_CHANGE_RETENTION_DAYS = int(os.getenv("EXPORT_CHANGE_RETENTION_DAYS", "30"))
+EXPORT_DELTA_SETTLE_SECONDS = int(os.getenv("EXPORT_DELTA_SETTLE_SECONDS", "5"))
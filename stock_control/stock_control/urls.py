@@ -10,6 +10,7 @@ urlpatterns = [
     path("", include("inventory.urls")),
     path("accounts/", include("django.contrib.auth.urls")),
     path("data/", include(("services.data_collection.urls", "data"), namespace="data")),
+    path("data-output/", include(("services.data_output.urls", "data_output"), namespace="data_output")),
     path("data2/", include("services.data_collection_2.urls", namespace="data_collection_2")),
     path("data3/", include("services.data_collection_3.urls", namespace="data_collection_3")),
     path("stock/", include(("services.data_collection_1.urls", "data_collection_1"), namespace="data_collection_1")),